@@ -1,22 +1,33 @@
 from os import path, system, getpid
-import yaml
 import argparse
 from subprocess import run
 
 from frosti.logging import log, setupLogging, handleException
-from frosti.core import EventBus, ServiceProvider
-from frosti.services import ApiDataBrokerService, \
-    GoGriddyPriceCheckService, OrmManagementService, ThermostatService, \
-    OrmStateCaptureService, UserInterfaceService, EnvironmentSamplingService, \
-    RelayManagementService, DashApplicationService
+from frosti.core import EventBus, AsyncEventBus, ServiceProvider, \
+    EventJournal, ServiceStartup, ExecutionTarget, ImportProfiler
 from frosti.core.events import SettingsChangedEvent
-from frosti.hardware import hardware_init
+
+# Services, hardware drivers and the libraries behind them are imported by
+# the startup phases that need them, so they load alongside the rest of
+# the boot instead of all before it
+
+# Startup phases the main loop waits for before it starts, the rest finish
+# in the background once the thermostat is running
+CONTROL_PHASES = ['thermostat', 'sensors', 'stateCapture']
+
+# Modules whose import times --diagnostics reports
+DIAGNOSTIC_IMPORTS = [
+    'frosti.__main__', 'frosti.core', 'frosti.services', 'frosti.hardware',
+    'sqlalchemy', 'yaml', 'requests', 'flask', 'dash',
+    'dash_bootstrap_components', 'PIL.Image', 'qrcode',
+]
 
 
 class RootDriver(ServiceProvider):
 
     def __init__(self):
         super().__init__()
+        self.__ormStateCaptureService = None
 
         parser = argparse.ArgumentParser(
             description='FROSTI main process')
@@ -25,10 +36,26 @@ class RootDriver(ServiceProvider):
             help='Pick the underlying hardware supporting operations')
         parser.add_argument(
             '--diagnostics', default=False, action='store_true',
-            help='Run hardware diagnostics and exit')
+            help='Run diagnostics, including an import time profile, and '
+            'exit')
         parser.add_argument(
             '--watchdog', default=None, type=int,
             help='Call systemd-notify every *n* seconds')
+        parser.add_argument(
+            '--tickless', default=False, action='store_true',
+            help='Only wake the main loop for timer deadlines and events')
+        parser.add_argument(
+            '--asyncio', default=False, action='store_true',
+            help='Run the main loop on asyncio instead of its own thread')
+        parser.add_argument(
+            '--profile', nargs='?', default=None, const=0.1, type=float,
+            metavar='THRESHOLD',
+            help='Time every event handler, flagging calls slower than '
+            'THRESHOLD seconds (default 0.1)')
+        parser.add_argument(
+            '--journal', default=None, metavar='DIRECTORY',
+            help='Record every dispatched event to a journal in DIRECTORY '
+            'for replay')
         self.__args = parser.parse_args()
 
     def __detectHardware(self):
@@ -44,6 +71,8 @@ class RootDriver(ServiceProvider):
         raise RuntimeError("We just don't support hardware older than v5")
 
     def __getYamlConfigData(self):
+        import yaml
+
         localPath = path.realpath(__file__)
 
         searchOrder = (
@@ -61,53 +90,170 @@ class RootDriver(ServiceProvider):
 
         raise RuntimeError("Couldn't not find a frosti.yaml config file")
 
+    def __addStartupPhases(self, startup: ServiceStartup):
+        """ Declares how the services depend on each other.  Hardware, the
+        database connection and the web servers are built concurrently on
+        the pool, then everything is wired to the EventBus on this thread,
+        the control path first """
+        built = dict()
+
+        def build(name, method):
+            def buildPhase():
+                built[name] = method()
+            return buildPhase
+
+        def detectHardware():
+            from frosti.hardware import hardware_factories
+
+            if self.__args.hardware == 'auto':
+                self.__args.hardware = self.__detectHardware()
+                log.info(f"Starting FROSTI on hardware {self.__args.hardware}")
+            built['hardware'] = hardware_factories(self.__args.hardware)
+
+        def buildDatabase():
+            from frosti.services import OrmManagementService
+            built['database'] = OrmManagementService()
+
+        def startDatabase():
+            from frosti.services import OrmManagementService
+
+            ormManagementService = built['database']
+            ormManagementService.setServiceProvider(self)
+            self.installService(
+                OrmManagementService, ormManagementService)
+
+        def buildApi():
+            from frosti.services import ApiDataBrokerService
+            built['api'] = ApiDataBrokerService()
+
+        def buildDash():
+            from frosti.services import DashApplicationService
+            built['dash'] = DashApplicationService()
+
+        startup.addPhase('hardware', detectHardware)
+        startup.addPhase('database.build', buildDatabase)
+        startup.addPhase('yaml', build('yaml', self.__getYamlConfigData))
+        startup.addPhase('api', buildApi)
+        startup.addPhase('dash', buildDash)
+
+        # Not every hardware version provides every service, so each build
+        # phase first checks whether it has anything to build
+        hardwarePhases = (
+            ('relays', 'RelayManagementService', []),
+            ('sensors', 'EnvironmentSamplingService', ['config']),
+            ('userInterface', 'UserInterfaceService',
+             ['thermostat', 'sensors']),
+        )
+        for name, serviceName, dependencies in hardwarePhases:
+            def buildHardware(name=name, serviceName=serviceName):
+                from frosti import services
+
+                serviceType = getattr(services, serviceName)
+                factory = built['hardware'].get(serviceType)
+                built[name] = None if factory is None else \
+                    (serviceType, factory())
+
+            def installHardware(name=name):
+                if built[name] is not None:
+                    serviceType, service = built[name]
+                    service.setServiceProvider(self)
+                    self.installService(serviceType, service)
+
+            startup.addPhase(
+                f"{name}.build", buildHardware, dependencies=['hardware'])
+            startup.addPhase(
+                name, installHardware,
+                dependencies=[f"{name}.build"] + dependencies,
+                target=ExecutionTarget.MAIN)
+
+        def applyConfig():
+            apiDataBrokerService = built['api']
+            apiDataBrokerService.setServiceProvider(self)
+            configData = built['yaml']
+            apiDataBrokerService.setConfig(configData['config'])
+            apiDataBrokerService.setPrograms(configData['programs'])
+            apiDataBrokerService.setSchedules(configData['schedules'])
+
+        def startThermostat():
+            from frosti.services import ThermostatService
+
+            thermostatService = ThermostatService()
+            thermostatService.setServiceProvider(self)
+            self.installService(ThermostatService, thermostatService)
+
+        def startStateCapture():
+            from frosti.services import OrmStateCaptureService
+
+            self.__ormStateCaptureService = OrmStateCaptureService()
+            self.__ormStateCaptureService.setServiceProvider(self)
+            self.installService(
+                OrmStateCaptureService, self.__ormStateCaptureService)
+
+        def startPriceCheck():
+            from frosti.services import GoGriddyPriceCheckService
+
+            try:
+                priceChecker = GoGriddyPriceCheckService()
+                priceChecker.setServiceProvider(self)
+            except ConnectionError:
+                log.warning("Unable to reach GoGriddy")
+
+        def startDash():
+            built['dash'].setServiceProvider(self)
+
+        startup.addPhase(
+            'database', startDatabase, dependencies=['database.build'],
+            target=ExecutionTarget.MAIN)
+        startup.addPhase(
+            'config', applyConfig, dependencies=['database', 'yaml', 'api'],
+            target=ExecutionTarget.MAIN)
+        startup.addPhase(
+            'thermostat', startThermostat, dependencies=['config', 'relays'],
+            target=ExecutionTarget.MAIN)
+        startup.addPhase(
+            'stateCapture', startStateCapture, dependencies=['config'],
+            target=ExecutionTarget.MAIN)
+        # The price checker goes after the other services so they are all
+        # listening by the time the first price arrives
+        startup.addPhase(
+            'priceCheck', startPriceCheck,
+            dependencies=['thermostat', 'stateCapture', 'userInterface'],
+            target=ExecutionTarget.MAIN)
+        startup.addPhase(
+            'dashboard', startDash, dependencies=['dash'],
+            target=ExecutionTarget.MAIN)
+
+    def __runDiagnostics(self):
+        """ Prints how long each subsystem takes to import """
+        print("Import times, each module in a fresh interpreter:")
+        report = ImportProfiler(DIAGNOSTIC_IMPORTS).profile()
+        for line in ImportProfiler.formatReport(report):
+            print(line)
+
     def start(self):
+        if self.__args.diagnostics:
+            self.__runDiagnostics()
+            return
+
         import RPi.GPIO as GPIO
 
         GPIO.setmode(GPIO.BCM)
         setupLogging()
 
-        self.__eventBus = EventBus()
+        eventBusClass = AsyncEventBus if self.__args.asyncio else EventBus
+        self.__eventBus = eventBusClass(tickless=self.__args.tickless)
         self.installService(EventBus, self.__eventBus)
-
-        ormManagementService = OrmManagementService()
-        ormManagementService.setServiceProvider(self)
-        self.installService(
-            OrmManagementService, ormManagementService)
-
-        ormStateCaptureService = OrmStateCaptureService()
-        ormStateCaptureService.setServiceProvider(self)
-        self.installService(
-            OrmStateCaptureService, ormStateCaptureService)
-
-        # Put all the event handlers together
-        configData = self.__getYamlConfigData()
-        apiDataBrokerService = ApiDataBrokerService()
-        apiDataBrokerService.setServiceProvider(self)
-        apiDataBrokerService.setConfig(configData['config'])
-        apiDataBrokerService.setPrograms(configData['programs'])
-        apiDataBrokerService.setSchedules(configData['schedules'])
-
-        thermostatService = ThermostatService()
-        thermostatService.setServiceProvider(self)
-        self.installService(ThermostatService, thermostatService)
-
-        if self.__args.hardware == 'auto':
-            self.__args.hardware = self.__detectHardware()
-            log.info(f"Starting FROSTI on hardware {self.__args.hardware}")
-
-        hardware_init(self, self.__args.hardware)
-
-        # Setup the power price handler after the other services have
-        # been created so they get the first power events
-        try:
-            priceChecker = GoGriddyPriceCheckService()
-            priceChecker.setServiceProvider(self)
-        except ConnectionError:
-            log.warning("Unable to reach GoGriddy")
-
-        dashApplicationService = DashApplicationService()
-        dashApplicationService.setServiceProvider(self)
+        if self.__args.profile is not None:
+            self.__eventBus.enableProfiling(self.__args.profile)
+        if self.__args.journal is not None:
+            self.__eventBus.enableJournal(EventJournal(self.__args.journal))
+
+        # The phases left once the control path is up carry on alongside
+        # the main loop, which runs their MAIN phases for them
+        startup = ServiceStartup(invoke=self.__eventBus.safeInvoke)
+        self.installService(ServiceStartup, startup)
+        self.__addStartupPhases(startup)
+        startup.run(until=CONTROL_PHASES)
 
         # If the watchdog has been requested and the binary exists, install a
         # recurring timer to 'pet the dog'
@@ -129,6 +275,14 @@ class RootDriver(ServiceProvider):
             self.__eventBus.fireEvent(SettingsChangedEvent())
             self.__eventBus.exec()
         finally:
+            # Write out the history still waiting to be batched, which
+            # needs the workers the loop shut down on the way out
+            if self.__ormStateCaptureService is not None:
+                self.__ormStateCaptureService.close()
+                self.__eventBus.shutdownWorkers()
+            journal = self.__eventBus.disableJournal()
+            if journal is not None:
+                journal.close()
             GPIO.cleanup()
 
 
@@ -0,0 +1,132 @@
+import asyncio
+from inspect import iscoroutinefunction
+from sys import maxsize as MAX_INT
+from time import time
+
+from .EventBus import EventBus
+from .CoalescePolicy import CoalescePolicy
+from .ExecutionTarget import ExecutionTarget
+from .EventFilter import EventFilter
+from frosti.logging import log, handleException
+
+
+class AsyncEventBus(EventBus):
+    """ EventBus whose main loop runs on asyncio rather than a dedicated
+    thread, so I/O-bound work can share the loop instead of each owning a
+    thread.  Timers and events are processed exactly as on EventBus, with
+    the loop sleeping until the next timer deadline via loop.call_at().
+
+    Handlers and timers may be coroutine functions.  They are started on
+    the loop as tasks when their event or deadline comes up, so a slow
+    await never holds up the rest of the bus """
+
+    def __init__(
+            self, now: float = time(), tickless: bool = False,
+            poolSize: int = 4, queueLimit: int = 10000):
+        """ Creates a new AsyncEventBus, see EventBus.__init__() """
+        self.__loop = None
+        self.__wakeupEvent = None
+        self.__tasks = set()
+        super().__init__(
+            now=now, tickless=tickless, poolSize=poolSize,
+            queueLimit=queueLimit)
+
+    def installEventHandler(
+            self, eventType: type, handler, coalesce: CoalescePolicy = None,
+            target: ExecutionTarget = ExecutionTarget.MAIN,
+            worker: str = None, eventFilter: EventFilter = None):
+        """ Installs the provided handler method, or coroutine function, as
+        a callback for when events of 'eventType' are fired on the event
+        bus.  See EventBus.installEventHandler() """
+        if iscoroutinefunction(handler):
+            coroutineHandler = handler
+
+            def handler(event):
+                self.__startTask(coroutineHandler(event))
+
+        super().installEventHandler(
+            eventType, handler, coalesce=coalesce, target=target,
+            worker=worker, eventFilter=eventFilter)
+
+    def installTimer(
+            self, frequency: float, handler, oneShot: bool = False):
+        """ Installs the provided handler method, or coroutine function, to
+        be called at the provided frequency.  See EventBus.installTimer() """
+        if iscoroutinefunction(handler):
+            coroutineHandler = handler
+
+            def handler():
+                self.__startTask(coroutineHandler())
+
+        return super().installTimer(frequency, handler, oneShot=oneShot)
+
+    def __startTask(self, coroutine):
+        """ Runs the coroutine as a task on the running loop, keeping a
+        reference until it completes """
+        task = asyncio.get_running_loop().create_task(coroutine)
+        self.__tasks.add(task)
+        task.add_done_callback(self.__taskDone)
+
+    def __taskDone(self, task: asyncio.Task):
+        self.__tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            try:
+                raise task.exception()
+            except:
+                handleException("processing asynchronous handler")
+
+    async def join(self):
+        """ Waits for every handler and timer task started so far, and any
+        they start in turn, to complete """
+        while self.__tasks:
+            await asyncio.wait(set(self.__tasks))
+
+    def _wakeup(self):
+        """ Signals the loop driving run() that there is work to do.  Safe
+        to call from any thread """
+        super()._wakeup()
+        loop = self.__loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self.__wakeupEvent.set)
+
+    async def run(self, iterations: int = MAX_INT):
+        """ Drive the main application loop on the running asyncio loop for
+        some number of iterations, using the system time() command to tell
+        processEvents the current time """
+        self.__wakeupEvent = asyncio.Event()
+        self.__loop = asyncio.get_running_loop()
+        iterationCount = 0
+
+        try:
+            while not self.isStopped and iterationCount < iterations:
+                try:
+                    self.__wakeupEvent.clear()
+                    timeout = self.processEvents(time())
+
+                    iterationCount += 1
+                    if iterationCount < iterations:
+                        handle = None
+                        if timeout is not None:
+                            handle = self.__loop.call_at(
+                                self.__loop.time() + timeout,
+                                self.__wakeupEvent.set)
+                        await self.__wakeupEvent.wait()
+                        if handle is not None:
+                            handle.cancel()
+                except asyncio.CancelledError:
+                    raise
+                except:
+                    handleException("executing main event loop")
+            await self.join()
+            if self.isStopped:
+                self.shutdownWorkers()
+        finally:
+            self.__loop = None
+
+    def exec(self, iterations: int = MAX_INT):
+        """ Runs the main application loop on a new asyncio loop owned by
+        the calling thread, see run() """
+        try:
+            asyncio.run(self.run(iterations))
+        except KeyboardInterrupt:
+            log.info("Keyboard interrupt received, shutting down")
@@ -0,0 +1,12 @@
+from enum import Enum
+
+
+class CoalescePolicy(Enum):
+    """ Describes what the EventBus does when an event is fired while
+    another of the same type is still waiting in the queue """
+    KEEP_ALL = 0
+    LATEST = 1
+    MERGE = 2
+
+    def __str__(self):
+        return super().__str__().replace('CoalescePolicy.', '')
@@ -1,14 +1,46 @@
+from types import MappingProxyType
+
+from .CoalescePolicy import CoalescePolicy
+from .EventPriority import EventPriority
+from .OverflowPolicy import OverflowPolicy
+
 
 class Event:
-    def __init__(self, name: str=None, data: dict={}):
-        self._data = data.copy()
-        self.__name = name
-        if name is None:
-            name = type(self).__name__
+    """ Base for everything fired on the EventBus.  Events are immutable
+    once built and are read by every handler without copying, so the data
+    passed in belongs to the event from then on.  Subclasses declare empty
+    __slots__ and read _data directly in their properties """
+    __slots__ = ('_name', '_data')
+
+    # How queued events of this type collapse, see CoalescePolicy
+    coalescePolicy = CoalescePolicy.KEEP_ALL
+    # How urgently queued events of this type are dispatched
+    priority = EventPriority.UI
+    # What happens when one is fired into a full queue, see OverflowPolicy
+    overflowPolicy = OverflowPolicy.DROP_OLDEST
+    # False for events that cannot be replayed from an EventJournal
+    journaled = True
+
+    def __init__(self, name: str=None, data: dict=None):
+        self._name = name or type(self).__name__
+        self._data = {} if data is None else data
 
     def __repr__(self):
-        return self.__name
+        return self._name
 
     @property
     def data(self):
-        return self._data.copy()
+        """ Read-only view of the event's data """
+        return MappingProxyType(self._data)
+
+    def merge(self, event):
+        """ Combines this queued event with a newer one of the same type,
+        returning the single event to dispatch in their place.  Only used
+        for types coalesced with CoalescePolicy.MERGE, and by default the
+        newer event wins """
+        return event
+
+    def dropped(self):
+        """ Called when this event is discarded from a full queue without
+        being dispatched, by default does nothing """
+        pass
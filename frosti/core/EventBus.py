@@ -1,9 +1,22 @@
-from queue import Queue
-from threading import Event as ThreadingEvent
+from threading import Event as ThreadingEvent, get_ident
+from concurrent.futures import Future, TimeoutError, ThreadPoolExecutor
+from collections import deque
+from heapq import heappush, heappop, heapify
+from functools import wraps
+from itertools import count
 from sys import maxsize as MAX_INT
-from time import time
+from time import time, perf_counter
 
 from .EventBusTimer import EventBusTimer
+from .EventQueue import EventQueue
+from .CoalescePolicy import CoalescePolicy
+from .EventPriority import EventPriority
+from .OverflowPolicy import OverflowPolicy
+from .ExecutionTarget import ExecutionTarget
+from .EventFilter import EventFilter
+from .EventJournal import EventJournal
+from .LatencyHistogram import LatencyHistogram
+from .EventBusProfiler import EventBusProfiler
 from frosti.logging import log, handleException
 from .Event import Event
 
@@ -12,62 +25,233 @@ class EventBus:
     """ Transceiver for all messaging, and owner of the main
     application thread """
 
+    # Timers due within this many seconds are fired early rather than
+    # waiting for another pass through the loop
+    TIMER_TOLERANCE = 0.2
+    # Longest the main loop sleeps between passes unless running tickless
+    MAX_TIMEOUT = 60.0
+
     class __SafeInvokeEvent(Event):
         """ Encapsulates a method call as an event to be fired and handled
         by the EventBus event loop processing thread. """
+        priority = EventPriority.CONTROL
+        overflowPolicy = OverflowPolicy.BLOCK
+        journaled = False
+        __slots__ = (
+            '__method', '__args', '__kwargs', '__future', '__deadline',
+            'queuedAt')
 
-        def __init__(self, method, *args, **kwargs):
+        def __init__(self, method, args, kwargs, deadline: float):
             super().__init__('SafeInvokeEvent')
             self.__method = method
-            self.__returnValue = None
-            self.__exception = None
             self.__args = args
             self.__kwargs = kwargs
-            self.__threadingEvent = ThreadingEvent()
+            self.__future = Future()
+            self.queuedAt = perf_counter()
+            self.__deadline = None if deadline is None \
+                else self.queuedAt + deadline
+
+        @property
+        def future(self):
+            """ Future receiving the outcome of the call """
+            return self.__future
 
         def execute(self):
             """ Calls the provided method on the appropriate thread, and then
-            signals that the call was completed """
+            signals that the call was completed.  Returns False without
+            calling the method if the call was cancelled or its deadline
+            passed while it was queued """
+            if not self.__future.set_running_or_notify_cancel():
+                return False
+            if self.__deadline is not None and \
+                    perf_counter() > self.__deadline:
+                self.__future.set_exception(TimeoutError(
+                    f"{self.__method} not started before its deadline"))
+                return False
+
             try:
-                self.__returnValue = \
-                    self.__method(*self.__args, **self.__kwargs)
+                self.__future.set_result(
+                    self.__method(*self.__args, **self.__kwargs))
             except Exception as e:
-                self.__exception = e
-            finally:
-                self.__threadingEvent.set()
-
-        def wait(self, timeout=None):
-            """ Waits for the execute() call to happen """
-            self.__threadingEvent.wait(timeout)
+                self.__future.set_exception(e)
+            return True
 
-            if self.__exception is not None:
-                raise self.__exception
+        def dropped(self):
+            """ Fails the call the same way as a missed deadline """
+            if self.__future.set_running_or_notify_cancel():
+                self.__future.set_exception(TimeoutError(
+                    f"{self.__method} dropped from a full event queue"))
 
-            return self.__returnValue
+    def __init__(
+            self, now: float = time(), tickless: bool = False,
+            poolSize: int = 4, queueLimit: int = 10000):
+        """ Creates a new EventBus
 
-    def __init__(self, now: float = time()):
+        now: float
+            Initial time for the bus, used until the first call to
+            processEvents() provides a new one
+        tickless: bool
+            If true, exec() sleeps until the next timer deadline or cross
+            thread event no matter how far away, rather than waking at
+            least every MAX_TIMEOUT seconds
+        poolSize: int
+            Number of threads shared by handlers installed with
+            ExecutionTarget.POOL
+        queueLimit: int
+            Most events allowed to wait for dispatch at once, after which
+            each event type's OverflowPolicy applies.  None for no limit """
         self.__threadingEvent = ThreadingEvent()
-        self.__timers = []
+        self.__timerHeap = []
+        self.__timerEntries = {}
+        self.__timerSequence = count()
+        self.__pendingTimers = deque()
+        self.__deadTimerEntries = 0
         self.__eventHandlers = {}
-        self.__eventQueue = Queue()
+        self.__coalescePolicies = {}
+        self.__overflowPolicies = {}
+        self.__eventFilters = []
+        self.__eventQueue = EventQueue(queueLimit)
+        self.__dispatchThread = None
         self.__now = now
         self.__stop = False
+        self.__tickless = tickless
+
+        self.__wakeups = 0
+        self.__spuriousWakeups = 0
+        self.__idleTime = 0.0
+        self.__timersFired = 0
+        self.__timersRescheduled = 0
+        self.__eventsDispatched = 0
+        self.__safeInvokeLatency = LatencyHistogram()
+        self.__safeInvokeExpired = 0
+        self.__profiler = None
+        self.__journal = None
+
+        self.__poolSize = poolSize
+        self.__workerPool = None
+        self.__serialWorkers = {}
+        self.__offloadedCalls = 0
 
         self.installEventHandler(
             EventBus.__SafeInvokeEvent, self.__safeInvoke)
 
-    def installEventHandler(self, eventType: type, handler):
+    def installEventHandler(
+            self, eventType: type, handler, coalesce: CoalescePolicy = None,
+            target: ExecutionTarget = ExecutionTarget.MAIN,
+            worker: str = None, eventFilter: EventFilter = None):
         """ Installs the provided handler method as a callback for when
         events of 'eventType' are fired on the event bus.
 
         eventType: typez
             Type of event to listen for
         handler: method
-            Method to register as a callback """
+            Method to register as a callback
+        coalesce: CoalescePolicy
+            How queued events of this type collapse on this bus, default is
+            the coalescePolicy declared by the event type.  Every handler
+            asking for a policy must agree on it
+        target: ExecutionTarget
+            Thread the handler runs on, default is the main loop.  Handlers
+            moved off the main loop must not touch state owned by it
+        worker: str
+            For ExecutionTarget.SERIAL, names the worker thread so several
+            handlers can share one and stay in order with each other.
+            Default is a worker dedicated to this handler
+        eventFilter: EventFilter
+            Skips calling the handler for events the filter rejects.  The
+            filter is always evaluated on the main loop """
+        if ExecutionTarget.MAIN != target:
+            handler = self.__offloadHandler(handler, target, worker)
+        if eventFilter is not None:
+            handler = self.__filterHandler(handler, eventFilter)
+        if coalesce is not None:
+            current = self.__coalescePolicies.get(eventType, coalesce)
+            if current != coalesce:
+                raise RuntimeError(
+                    f"{eventType.__name__} is already coalesced with "
+                    f"{current}, cannot also use {coalesce}")
+            self.__coalescePolicies[eventType] = coalesce
         if eventType not in self.__eventHandlers:
             self.__eventHandlers[eventType] = []
         self.__eventHandlers[eventType].append(handler)
 
+    def setOverflowPolicy(self, eventType: type, overflow: OverflowPolicy):
+        """ Overrides the overflowPolicy declared by an event type for
+        events of that type fired on this bus """
+        self.__overflowPolicies[eventType] = overflow
+
+    def __filterHandler(self, handler, eventFilter: EventFilter):
+        """ Wraps the handler so that it is only called for events the
+        filter accepts """
+        self.__eventFilters.append(eventFilter)
+
+        @wraps(handler)
+        def filteredHandler(event: Event):
+            if eventFilter(event):
+                handler(event)
+
+        return filteredHandler
+
+    def __offloadHandler(
+            self, handler, target: ExecutionTarget, worker: str):
+        """ Wraps the handler so that calling it on the main loop submits
+        the real call to the executor chosen by target """
+        if ExecutionTarget.SERIAL == target:
+            worker = worker or f"{handler}"
+        elif ExecutionTarget.POOL != target:
+            raise RuntimeError(f"Unknown execution target {target}")
+
+        @wraps(handler)
+        def offloadedHandler(event: Event):
+            self.__offloadedCalls += 1
+            self.__getWorker(target, worker).submit(
+                self.__runOffloaded, handler, event)
+
+        return offloadedHandler
+
+    def __getWorker(self, target: ExecutionTarget, worker: str):
+        """ Gets the executor for a target, starting it if needed """
+        if ExecutionTarget.POOL == target:
+            if self.__workerPool is None:
+                self.__workerPool = ThreadPoolExecutor(
+                    max_workers=self.__poolSize,
+                    thread_name_prefix='EventBus pool')
+            return self.__workerPool
+
+        executor = self.__serialWorkers.get(worker)
+        if executor is None:
+            executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix=f"EventBus {worker}")
+            self.__serialWorkers[worker] = executor
+        return executor
+
+    def submitToWorker(self, worker: str, method, *args, **kwargs):
+        """ Calls method(*args, **kwargs) on the named serial worker after
+        everything handed to it before, returning a
+        concurrent.futures.Future for the outcome.  Workers are shared with
+        handlers installed with ExecutionTarget.SERIAL """
+        return self.__getWorker(ExecutionTarget.SERIAL, worker).submit(
+            method, *args, **kwargs)
+
+    def __runOffloaded(self, handler, event: Event):
+        """ Runs a handler on a worker thread """
+        try:
+            handler(event)
+        except:
+            handleException("processing event on worker thread")
+
+    def shutdownWorkers(self, wait: bool = True):
+        """ Shuts down the worker threads used by handlers installed off
+        the main loop, by default waiting for every event already handed
+        to them.  Workers are started again if more events arrive """
+        executors = list(self.__serialWorkers.values())
+        if self.__workerPool is not None:
+            executors.append(self.__workerPool)
+        self.__workerPool = None
+        self.__serialWorkers = {}
+        for executor in executors:
+            executor.shutdown(wait=wait)
+
     def installTimer(
             self, frequency: float, handler, oneShot: bool = False):
         """ Installs the provided list of handlers as a series of callbacks
@@ -83,45 +267,216 @@ class EventBus:
             If true, timer is only fired once and not again until it receives
             a call to reset() """
         timer = EventBusTimer(
-            sync=self.__threadingEvent,
+            scheduler=self.__scheduleTimer,
             frequency=frequency,
             handler=handler,
             oneShot=oneShot)
-        self.__timers.append(timer)
+        self.__pendingTimers.append(timer)
+        if self.__tickless:
+            self._wakeup()
         return timer
 
-    def fireEvent(self, event: Event, immediately: bool = False):
+    def removeTimer(self, timer: EventBusTimer):
+        """ Removes a timer previously returned by installTimer() from the
+        schedule.  The bus keeps no reference to a removed timer, though a
+        later call to reset() on the timer installs it again """
+        timer.disable()
+
+    def __scheduleTimer(self, timer: EventBusTimer):
+        """ Queues a timer to have its place in the schedule recomputed at
+        the start of the next call to processEvents().  Safe to call from
+        any thread """
+        self.__pendingTimers.append(timer)
+        self._wakeup()
+
+    def __schedulePendingTimers(self):
+        """ Places timers installed, reset or disabled since they were last
+        scheduled, counting from now """
+        while self.__pendingTimers:
+            timer = self.__pendingTimers.popleft()
+            self.__timersRescheduled += 1
+            if timer.isQueued:
+                self.__pushTimer(timer, self.__now + timer.frequency)
+            else:
+                self.__cancelTimer(timer)
+
+    def __pushTimer(self, timer: EventBusTimer, deadline: float):
+        """ Places a timer in the schedule, invalidating any existing
+        entry for it """
+        self.__cancelTimer(timer)
+        entry = [deadline, next(self.__timerSequence), timer]
+        self.__timerEntries[timer] = entry
+        heappush(self.__timerHeap, entry)
+
+    def __cancelTimer(self, timer: EventBusTimer):
+        """ Lazily removes a timer from the schedule by marking its entry
+        dead, compacting the heap once dead entries dominate it """
+        entry = self.__timerEntries.pop(timer, None)
+        if entry is not None:
+            entry[-1] = None
+            self.__deadTimerEntries += 1
+            if self.__deadTimerEntries > 64 and \
+                    2 * self.__deadTimerEntries > len(self.__timerHeap):
+                self.__timerHeap = \
+                    [a for a in self.__timerHeap if a[-1] is not None]
+                heapify(self.__timerHeap)
+                self.__deadTimerEntries = 0
+
+    def __nextTimerDeadline(self):
+        """ Returns the earliest deadline in the schedule, or None """
+        timerHeap = self.__timerHeap
+        while timerHeap and timerHeap[0][-1] is None:
+            heappop(timerHeap)
+            self.__deadTimerEntries -= 1
+        return timerHeap[0][0] if timerHeap else None
+
+    def fireEvent(
+            self, event: Event, immediately: bool = False,
+            coalesce: CoalescePolicy = None):
         """ Fires the event to any subscribed listeners
 
         immediately: bool
             True if the event should be dispatched on this call, otherwise
             the event is queued and processed at the next call to
             processEvents()
+        coalesce: CoalescePolicy
+            Overrides how this event collapses into one of the same type
+            already waiting in the queue, default is the policy installed
+            for its type
         """
 
         if immediately:
+            journal = self.__journal
+            if journal is not None and event.journaled:
+                journal.record(self.__now, event)
             eventHandlers = self.__eventHandlers.get(type(event), [])
             for handler in eventHandlers:
                 handler(event)
         else:
-            self.__eventQueue.put(event)
-            self.__threadingEvent.set()
+            if coalesce is None:
+                coalesce = self.__coalescePolicies.get(
+                    type(event), event.coalescePolicy)
+            overflow = self.__overflowPolicies.get(
+                type(event), event.overflowPolicy)
+            # Only a push into an empty queue can find the loop asleep, as
+            # the loop always empties the queue before it waits
+            if self.__eventQueue.push(
+                    event, coalesce, event.priority, overflow,
+                    get_ident() != self.__dispatchThread):
+                self._wakeup()
 
     def __safeInvoke(self, event: __SafeInvokeEvent):
-        """ Executes the method but relies on the main loop for any exception
-        handling """
-        event.execute()
+        """ Executes the method, recording how long it sat in the queue """
+        self.__safeInvokeLatency.record(perf_counter() - event.queuedAt)
+        if not event.execute():
+            self.__safeInvokeExpired += 1
+
+    def safeInvokeAsync(
+            self, methodCall, *args, deadline: float = None, **kwargs):
+        """ Queue the provided method call onto the event loop thread
+        without waiting for it, returning a concurrent.futures.Future for
+        its return value or exception.
 
-    def safeInvoke(self, methodCall, *args, **kwargs):
+        deadline: float
+            Seconds the call may wait in the queue.  If the main loop has
+            not started it by then, it is never made and the future fails
+            with TimeoutError.  Default is to wait as long as it takes """
+        event = EventBus.__SafeInvokeEvent(methodCall, args, kwargs, deadline)
+        self.fireEvent(event)
+        return event.future
+
+    def safeInvoke(self, methodCall, *args, deadline: float = None, **kwargs):
         """ Invoke the provided method call onto the event loop thread and
         provide the return value.
 
         This scenario is very important when events
         are coming in from another thread but need to interact safely with
-        operations happening in the base event loop.  """
-        event = EventBus.__SafeInvokeEvent(methodCall, *args, **kwargs)
-        self.fireEvent(event)
-        return event.wait()
+        operations happening in the base event loop.
+
+        deadline: float
+            Seconds to wait for the main loop to start the call before
+            giving up on it and raising TimeoutError.  A call that has
+            already started is always waited on to completion """
+        future = self.safeInvokeAsync(
+            methodCall, *args, deadline=deadline, **kwargs)
+        try:
+            return future.result(deadline)
+        except TimeoutError:
+            if future.cancel():
+                raise
+            return future.result()
+
+    def enableProfiling(self, threshold: float = 0.1):
+        """ Starts timing every handler and timer call, discarding any
+        earlier profile.  Until this is called the only cost of profiling
+        is a check per dispatched event and fired timer
+
+        threshold: float
+            Seconds after which a single call is logged and counted as
+            slow """
+        self.__profiler = EventBusProfiler(threshold)
+
+    def disableProfiling(self):
+        """ Stops timing handler and timer calls """
+        self.__profiler = None
+
+    def enableJournal(self, journal: EventJournal):
+        """ Records every event dispatched from now on, with the bus time
+        it was dispatched at, to the journal """
+        self.__journal = journal
+
+    def disableJournal(self):
+        """ Stops recording events, returning the journal that was in use
+        so the caller can close it """
+        journal, self.__journal = self.__journal, None
+        return journal
+
+    @property
+    def profile(self):
+        """ Call counts and latencies per handler, timer and event type
+        collected since enableProfiling(), or None if not profiling """
+        profiler = self.__profiler
+        return None if profiler is None else profiler.asDict()
+
+    @property
+    def tickless(self):
+        """ True if exec() only wakes for timer deadlines and events """
+        return self.__tickless
+
+    @property
+    def metrics(self):
+        """ Snapshot of counters describing the work done by the main
+        loop.  A wakeup is any return from sleeping in exec(), and it is
+        spurious if the pass that follows finds nothing to do """
+        return {
+            'tickless': self.__tickless,
+            'wakeups': self.__wakeups,
+            'spuriousWakeups': self.__spuriousWakeups,
+            'idleTime': self.__idleTime,
+            'timersFired': self.__timersFired,
+            'timersScheduled': len(self.__timerEntries),
+            'eventsDispatched': self.__eventsDispatched,
+            'eventsCoalesced': self.__eventQueue.coalescedCount,
+            'queueDepth': len(self.__eventQueue),
+            'queueDepthByPriority': self.__eventQueue.depths,
+            'queueDepthPeakByPriority': self.__eventQueue.peakDepths,
+            'starvationPromotions': self.__eventQueue.starvationCount,
+            'queueLimit': self.__eventQueue.limit,
+            'queueOverflows': self.__eventQueue.overflowCount,
+            'eventsDropped': self.__eventQueue.droppedCounts,
+            'safeInvokeLatency': self.__safeInvokeLatency.asDict(),
+            'safeInvokeExpired': self.__safeInvokeExpired,
+            'offloadedCalls': self.__offloadedCalls,
+            'filteredCalls': sum(
+                eventFilter.rejectedCount
+                for eventFilter in self.__eventFilters),
+            'profile': self.profile,
+            'journal': None if self.__journal is None else {
+                'records': self.__journal.recordCount,
+                'bytes': self.__journal.byteCount,
+                'skipped': self.__journal.skippedCount,
+            },
+        }
 
     @property
     def now(self):
@@ -133,62 +488,146 @@ class EventBus:
     def stop(self):
         """ Stop all event processing, effectively initiating shutdown """
         self.__stop = True
+        self._wakeup()
+
+    @property
+    def isStopped(self):
+        """ True once stop() has been called """
+        return self.__stop
+
+    def _wakeup(self):
+        """ Signals the thread driving exec() that there is work to do.
+        Safe to call from any thread """
         self.__threadingEvent.set()
 
     def processEvents(self, now: float = None):
         """ Process any events that have been generated since the last call,
         compute and return the time to wait until call method should be
-        called again."""
+        called again.  When running tickless with no timers scheduled,
+        returns None to wait indefinitely for the next event """
 
+        self.__dispatchThread = get_ident()
         self.__now = now or self.__now
         if self.__now <= 0:
             raise RuntimeError(
                 f"EventBus.processEvents:  now must be >0, got {self.__now}")
 
         # log.debug(f"EventBus::processEvents(now={now})")
-        # Check if any timers need handling
-        timeout = 60.0
-        for timer in self.__timers:
-            nextInvoke = timer.getNextInvoke(self.__now) - self.__now
-            if nextInvoke < 0.2:
+        # Timers that were installed, reset or disabled since the last call
+        # start counting from now
+        self.__schedulePendingTimers()
+
+        # Fire timers in deadline order, only ever looking at those due.
+        # Recurring timers are put back once all due timers have fired so
+        # that each fires at most once per call
+        profiler = self.__profiler
+        journal = self.__journal
+        firedTimers = list()
+        deadline = self.__nextTimerDeadline()
+        while deadline is not None and \
+                deadline - self.__now < self.TIMER_TOLERANCE:
+            timer = heappop(self.__timerHeap)[-1]
+            del self.__timerEntries[timer]
+            if timer.isQueued:
                 try:
                     # log.debug(f"===> TIMER {timer}")
-                    timer.invoke(self.__now)
+                    timer.invoke(self.__now, profiler)
                 except:
                     handleException("processing timers")
-            timeout = min(timeout, nextInvoke)
+                self.__timersFired += 1
+                firedTimers.append(timer)
+            deadline = self.__nextTimerDeadline()
+
+        for timer in firedTimers:
+            if timer.isQueued:
+                self.__pushTimer(timer, self.__now + timer.frequency)
+        # Timers reset by the handlers just run count from now as well,
+        # rather than from whenever the next call comes
+        self.__schedulePendingTimers()
+        deadline = self.__nextTimerDeadline()
+
+        timeout = None if self.__tickless else self.MAX_TIMEOUT
+        if deadline is not None:
+            timeout = deadline - self.__now if timeout is None \
+                else min(timeout, deadline - self.__now)
 
         # Only deliver events to registered subscribers
-        while not self.__eventQueue.empty():
-            event = self.__eventQueue.get()
+        event = self.__eventQueue.pop()
+        while event is not None:
+            self.__eventsDispatched += 1
+            if journal is not None and event.journaled:
+                journal.record(self.__now, event)
             eventHandlers = self.__eventHandlers.get(type(event), [])
-            for handler in eventHandlers:
-                try:
-                    # log.debug(f"===> HANDLER {handler}")
-                    handler(event)
-                except:
-                    handleException("processing event queue")
+            if profiler is not None:
+                self.__profiledDispatch(profiler, event, eventHandlers)
+            else:
+                for handler in eventHandlers:
+                    try:
+                        # log.debug(f"===> HANDLER {handler}")
+                        handler(event)
+                    except:
+                        handleException("processing event queue")
+            event = self.__eventQueue.pop()
 
-        return max(0.0, timeout)
+        return None if timeout is None else max(0.0, timeout)
+
+    def __profiledDispatch(
+            self, profiler: EventBusProfiler, event: Event, eventHandlers):
+        """ Delivers an event to its handlers while timing each of them """
+        dispatchStart = perf_counter()
+        for handler in eventHandlers:
+            start = perf_counter()
+            try:
+                handler(event)
+            except:
+                handleException("processing event queue")
+            profiler.recordHandler(handler, perf_counter() - start)
+        profiler.recordEvent(type(event), perf_counter() - dispatchStart)
+
+    def advanceTo(self, until: float):
+        """ Moves the bus forward in virtual time to 'until', calling
+        processEvents() at every timer deadline on the way instead of
+        waiting for it.  Used to replay and simulate faster than real time
+        """
+        self.processEvents(self.__now)
+        deadline = self.__nextTimerDeadline()
+        while deadline is not None and deadline <= until:
+            self.processEvents(max(deadline, self.__now))
+            deadline = self.__nextTimerDeadline()
+        self.processEvents(max(until, self.__now))
 
     def exec(self, iterations: int = MAX_INT):
         """ Drive the main application loop for some number of iterations,
         using the system time() command to tell processEvents the current
-        time """
+        time.  The wakeup signal is cleared before each pass, so anything
+        fired or reset during the pass wakes the loop straight back up """
         iterationCount = 0
+        woke = False
 
         while not self.__stop and iterationCount < iterations:
             try:
+                self.__threadingEvent.clear()
+                workCount = self.__timersFired + self.__timersRescheduled + \
+                    self.__eventsDispatched
                 timeout = self.processEvents(time())
+                if woke and workCount == self.__timersFired + \
+                        self.__timersRescheduled + self.__eventsDispatched:
+                    self.__spuriousWakeups += 1
+                woke = False
 
                 iterationCount += 1
-                if iterationCount < iterations:
-                    if not self.__threadingEvent.is_set():
-                        self.__threadingEvent.wait(timeout)
-                    else:
-                        self.__threadingEvent.clear()
+                if iterationCount < iterations and \
+                        not self.__threadingEvent.is_set():
+                    start = perf_counter()
+                    self.__threadingEvent.wait(timeout)
+                    self.__idleTime += perf_counter() - start
+                    self.__wakeups += 1
+                    woke = True
             except KeyboardInterrupt:
                 log.info("Keyboard interrupt received, shutting down")
-                break
+                self.__stop = True
             except:
                 handleException("executing main event loop")
+
+        if self.__stop:
+            self.shutdownWorkers()
@@ -0,0 +1,91 @@
+from threading import Lock
+
+from .LatencyHistogram import LatencyHistogram
+from frosti.logging import log
+
+
+class EventBusProfiler:
+    """ Collects call counts and latencies of every event handler and timer
+    run by an EventBus, and of the full dispatch of each event type.  Calls
+    taking longer than the threshold are counted and logged as slow.
+    Handlers are reported by name, so several instances of a class share
+    one entry.  Recorded on the main loop and safe to read from any thread,
+    entries being added under a lock that asDict() copies them under """
+
+    def __init__(self, threshold: float):
+        """ threshold: float
+            Seconds after which a single handler call is flagged as slow """
+        self.__threshold = threshold
+        self.__names = {}
+        self.__handlers = {}
+        self.__timers = {}
+        self.__events = {}
+        self.__slowCalls = {}
+        self.__lock = Lock()
+
+    @property
+    def threshold(self):
+        return self.__threshold
+
+    def __name(self, handler):
+        """ Human readable name of a handler, e.g. 'module.Class.method' """
+        name = self.__names.get(handler)
+        if name is None:
+            qualname = getattr(handler, '__qualname__', None)
+            name = repr(handler) if qualname is None else \
+                f"{getattr(handler, '__module__', None)}.{qualname}"
+            self.__names[handler] = name
+        return name
+
+    def __histogram(self, statsMap: dict, name: str):
+        histogram = statsMap.get(name)
+        if histogram is None:
+            with self.__lock:
+                histogram = statsMap[name] = LatencyHistogram()
+        return histogram
+
+    def __record(self, statsMap: dict, name: str, elapsed: float):
+        self.__histogram(statsMap, name).record(elapsed)
+
+        if elapsed > self.__threshold:
+            with self.__lock:
+                self.__slowCalls[name] = self.__slowCalls.get(name, 0) + 1
+            log.warning(
+                f"{name} took {1000*elapsed:.1f}ms, over the "
+                f"{1000*self.__threshold:.1f}ms threshold")
+
+    def recordHandler(self, handler, elapsed: float):
+        """ Records one call of an event handler """
+        self.__record(self.__handlers, self.__name(handler), elapsed)
+
+    def recordTimer(self, handler, elapsed: float):
+        """ Records one call of a timer handler """
+        self.__record(self.__timers, self.__name(handler), elapsed)
+
+    def recordEvent(self, eventType: type, elapsed: float):
+        """ Records the time taken by all handlers of one event """
+        self.__histogram(self.__events, eventType.__name__).record(elapsed)
+
+    def asDict(self):
+        """ Summary of everything profiled, suitable for returning as JSON """
+
+        with self.__lock:
+            handlers = list(self.__handlers.items())
+            timers = list(self.__timers.items())
+            events = list(self.__events.items())
+            slowCalls = dict(self.__slowCalls)
+
+        def summarize(histograms: list):
+            summary = dict()
+            for name, histogram in histograms:
+                summary[name] = histogram.asDict()
+                summary[name]['slowCalls'] = slowCalls.get(name, 0)
+            return summary
+
+        return {
+            'threshold': self.__threshold,
+            'handlers': summarize(handlers),
+            'timers': summarize(timers),
+            'events': {
+                name: histogram.asDict() for name, histogram in events},
+        }
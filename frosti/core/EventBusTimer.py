@@ -1,17 +1,15 @@
-from threading import Event as ThreadingEvent
-from sys import maxsize
+from time import perf_counter
 
 
 class EventBusTimer:
     """ Invokes a handler based on a set number of ticks """
-    ONE_SHOT_COMPLETED = -1
 
     def __init__(
             self,
             frequency: float,
             handler,
             oneShot: bool,
-            sync: ThreadingEvent):
+            scheduler):
         """ Creates a new EventBusTimer
 
         frequency: float
@@ -21,45 +19,56 @@ class EventBusTimer:
         oneShot: bool
             True if this timer is intended on only firing once and not at a
             set frequency
-        sync: ThreadingEvent
-            Threading object, for internal use
+        scheduler: method
+            Called with this timer whenever it needs to be rescheduled by
+            the owning EventBus, for internal use
         """
         self.__frequency = frequency
         self.__handler = handler
-        self.__lastInvoke = None
-        self.__eventBusSync = sync
+        self.__scheduler = scheduler
         self.__oneShot = oneShot
+        self.__completed = False
 
     def __repr__(self):
         return f"{self.__handler}"
 
+    @property
+    def frequency(self):
+        """ Time in fractional seconds between invocations """
+        return self.__frequency
+
     @property
     def isQueued(self):
         """ True if this handler is active and will be run again"""
-        if self.__oneShot:
-            return self.__lastInvoke != self.ONE_SHOT_COMPLETED
-
-        return True
+        return not self.__completed
 
-    def getNextInvoke(self, now: float):
-        """ Compute the next time this invoker should execute """
-        self.__lastInvoke = self.__lastInvoke or now
-        if self.ONE_SHOT_COMPLETED == self.__lastInvoke:
-            return maxsize
-        return self.__lastInvoke + self.__frequency
+    def invoke(self, now: float, profiler=None):
+        """ Invoke the current handler, marking one-shot timers completed.
+        They are marked first, so one whose handler calls reset() to set
+        its next wake up stays armed
 
-    def invoke(self, now: float):
-        """ Invoke the current handler and mark the current time """
-        self.__handler()
-        self.__lastInvoke = now
+        profiler: EventBusProfiler
+            If provided, receives the time taken by the handler """
         if self.__oneShot:
-            self.__lastInvoke = self.ONE_SHOT_COMPLETED
+            self.__completed = True
+        if profiler is None:
+            self.__handler()
+        else:
+            start = perf_counter()
+            try:
+                self.__handler()
+            finally:
+                profiler.recordTimer(self.__handler, perf_counter() - start)
 
     def disable(self):
-        self.__lastInvoke = self.ONE_SHOT_COMPLETED
+        """ Stops this timer from firing until it receives a call to
+        reset() """
+        self.__completed = True
+        self.__scheduler(self)
 
     def reset(self, handler: int=None, frequency: float=None):
-        """ Resets this handler to a new state
+        """ Resets this handler to a new state, restarting the countdown to
+        the next invocation from the next time events are processed
 
         handler: int
             Integer offset in handler list to fire next, default is 0
@@ -67,5 +76,5 @@ class EventBusTimer:
             New frequency for this timer, default is no change
          """
         self.__frequency = frequency or self.__frequency
-        self.__lastInvoke = None
-        self.__eventBusSync.set()
+        self.__completed = False
+        self.__scheduler(self)
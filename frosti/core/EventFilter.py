@@ -0,0 +1,83 @@
+from operator import attrgetter
+
+from .Event import Event
+
+
+class EventFilter:
+    """ Decides, for one subscription, whether an event is worth calling
+    the handler for.  The EventBus evaluates the filter before dispatch and
+    counts the calls it saved.  Build one with deadband(), changed() or
+    predicate(); a filter keeps the state of the subscription it was
+    installed with, so each subscription needs its own """
+
+    def __init__(self, accept, description: str):
+        """ Wraps a function taking an event and returning True if the
+        handler should be called, prefer the factory methods """
+        self.__accept = accept
+        self.__description = description
+        self.__acceptedCount = 0
+        self.__rejectedCount = 0
+
+    def __repr__(self):
+        return self.__description
+
+    def __call__(self, event: Event):
+        if self.__accept(event):
+            self.__acceptedCount += 1
+            return True
+        self.__rejectedCount += 1
+        return False
+
+    @property
+    def acceptedCount(self):
+        """ Number of events passed on to the handler """
+        return self.__acceptedCount
+
+    @property
+    def rejectedCount(self):
+        """ Number of events, and so handler calls, filtered out """
+        return self.__rejectedCount
+
+    @staticmethod
+    def deadband(**bands: float):
+        """ Passes an event when any of the named properties has moved more
+        than its band away from the value it had when it last passed, e.g.
+        deadband(temperature=0.25, humidity=0.5).  The first event always
+        passes """
+        getters = [(attrgetter(name), band) for name, band in bands.items()]
+        last = [None] * len(getters)
+
+        def accept(event: Event):
+            passed = False
+            for index, (getter, band) in enumerate(getters):
+                value = getter(event)
+                if last[index] is None or abs(value - last[index]) > band:
+                    last[index] = value
+                    passed = True
+            return passed
+
+        return EventFilter(accept, f"deadband({bands})")
+
+    @staticmethod
+    def changed(*names: str):
+        """ Passes an event when any of the named properties differs from
+        the previous event, or when its data differs if no names are
+        given.  The first event always passes """
+        getter = attrgetter(*names) if names else attrgetter('data')
+        last = [object()]
+
+        def accept(event: Event):
+            value = getter(event)
+            if value == last[0]:
+                return False
+            last[0] = value
+            return True
+
+        return EventFilter(accept, f"changed({', '.join(names)})")
+
+    @staticmethod
+    def predicate(accept, description: str = None):
+        """ Passes an event when accept(event) returns True """
+        return EventFilter(
+            accept, description or
+            f"predicate({getattr(accept, '__qualname__', accept)})")
@@ -0,0 +1,227 @@
+import pickle
+from collections import deque
+from importlib import import_module
+from os import listdir, makedirs, path, remove
+from struct import Struct
+from threading import Condition, Thread
+
+from .Event import Event
+from frosti.logging import handleException
+
+
+class EventJournal:
+    """ Appends dispatched events, each with the EventBus time it was
+    dispatched at, to a binary journal of rotating segment files in a
+    directory.  record() only queues the event; serializing and writing
+    happen on a background thread, relying on events being immutable.
+
+    Each record is a 4 byte little-endian length, followed by the event
+    time as a double, the event's type as 'module:qualname' and its name
+    and data, pickled.  Records never span segments, so each segment can
+    be read on its own """
+
+    # Record header: payload length, then the event time
+    HEADER = Struct('<Id')
+    SEGMENT_PREFIX = 'events-'
+    SEGMENT_SUFFIX = '.journal'
+
+    def __init__(
+            self, directory: str, segmentSize: int = 4 * 1024 * 1024,
+            segmentCount: int = 16, flushInterval: float = 1.0):
+        """ Creates a new EventJournal, continuing after any segments
+        already in the directory
+
+        directory: str
+            Where to keep the segment files, created if needed
+        segmentSize: int
+            Bytes after which the current segment is closed and a new one
+            started
+        segmentCount: int
+            Most segments kept, the oldest are deleted beyond this.  None
+            keeps every segment
+        flushInterval: float
+            Longest a recorded event waits in memory before being written
+        """
+        makedirs(directory, exist_ok=True)
+        self.__directory = directory
+        self.__segmentSize = segmentSize
+        self.__segmentCount = segmentCount
+        self.__flushInterval = flushInterval
+        self.__condition = Condition()
+        self.__buffer = deque()
+        self.__closed = False
+        self.__queuedCount = 0
+        self.__recordCount = 0
+        self.__byteCount = 0
+        self.__skippedCount = 0
+        self.__typeNames = {}
+
+        segments = EventJournal.segments(directory)
+        self.__segmentIndex = 0 if not segments else \
+            EventJournal.__segmentNumber(segments[-1]) + 1
+        self.__file = None
+
+        self.__thread = Thread(
+            target=self.__writeLoop, name='EventJournal', daemon=True)
+        self.__thread.start()
+
+    @property
+    def recordCount(self):
+        """ Number of events written so far """
+        return self.__recordCount
+
+    @property
+    def skippedCount(self):
+        """ Number of events whose data could not be serialized """
+        return self.__skippedCount
+
+    @property
+    def byteCount(self):
+        """ Number of bytes written so far """
+        return self.__byteCount
+
+    def record(self, now: float, event: Event):
+        """ Queues the event to be written with the time it was dispatched,
+        safe to call from any thread """
+        self.__buffer.append((now, event))
+        self.__queuedCount += 1
+
+    def flush(self, timeout: float = 10.0):
+        """ Waits until every event recorded so far has been written """
+        queuedCount = self.__queuedCount
+        with self.__condition:
+            self.__condition.notify()
+            self.__condition.wait_for(
+                lambda: self.__recordCount + self.__skippedCount >=
+                queuedCount, timeout)
+
+    def close(self):
+        """ Writes any events still buffered and closes the journal """
+        with self.__condition:
+            self.__closed = True
+            self.__condition.notify()
+        self.__thread.join()
+
+    def __writeLoop(self):
+        while True:
+            with self.__condition:
+                if not self.__closed:
+                    self.__condition.wait(self.__flushInterval)
+                closed = self.__closed
+            try:
+                self.__writeBuffer()
+            except:
+                handleException("writing event journal")
+            with self.__condition:
+                self.__condition.notify_all()
+            if closed:
+                break
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+
+    def __writeBuffer(self):
+        """ Serializes and writes everything in the buffer """
+        if not self.__buffer:
+            return
+
+        recordCount = 0
+        while self.__buffer:
+            now, event = self.__buffer.popleft()
+            try:
+                payload = pickle.dumps(
+                    (self.__typeName(type(event)), repr(event), event._data),
+                    pickle.HIGHEST_PROTOCOL)
+            except Exception:
+                self.__skippedCount += 1
+                continue
+            # Writes go through the file's own buffer, so a record at a
+            # time costs little and lets segments rotate on any record
+            if self.__file is None or \
+                    self.__file.tell() >= self.__segmentSize:
+                self.__rotate()
+            self.__file.write(self.HEADER.pack(len(payload), now))
+            self.__file.write(payload)
+            self.__byteCount += self.HEADER.size + len(payload)
+            recordCount += 1
+
+        if recordCount:
+            self.__file.flush()
+        self.__recordCount += recordCount
+
+    def __rotate(self):
+        """ Starts a new segment, deleting the oldest beyond the limit """
+        if self.__file is not None:
+            self.__file.close()
+        fileName = path.join(
+            self.__directory,
+            f"{self.SEGMENT_PREFIX}{self.__segmentIndex:08d}"
+            f"{self.SEGMENT_SUFFIX}")
+        self.__segmentIndex += 1
+        self.__file = open(fileName, 'ab')
+
+        if self.__segmentCount is not None:
+            segments = EventJournal.segments(self.__directory)
+            for segment in segments[:-self.__segmentCount]:
+                remove(segment)
+
+    def __typeName(self, eventType: type):
+        typeName = self.__typeNames.get(eventType)
+        if typeName is None:
+            typeName = f"{eventType.__module__}:{eventType.__qualname__}"
+            self.__typeNames[eventType] = typeName
+        return typeName
+
+    @staticmethod
+    def __segmentNumber(fileName: str):
+        name = path.basename(fileName)
+        start = len(EventJournal.SEGMENT_PREFIX)
+        end = len(name) - len(EventJournal.SEGMENT_SUFFIX)
+        return int(name[start:end])
+
+    @staticmethod
+    def segments(directory: str):
+        """ Paths of the segment files in a journal directory, oldest
+        first """
+        names = [
+            name for name in listdir(directory)
+            if name.startswith(EventJournal.SEGMENT_PREFIX) and
+            name.endswith(EventJournal.SEGMENT_SUFFIX)]
+        names.sort(key=EventJournal.__segmentNumber)
+        return [path.join(directory, name) for name in names]
+
+    @staticmethod
+    def read(directory: str):
+        """ Yields (time, event) for every record in a journal directory,
+        oldest first.  Events are rebuilt without calling their
+        constructors, so they carry exactly the data they were fired
+        with """
+        types = {}
+        header = EventJournal.HEADER
+        for segment in EventJournal.segments(directory):
+            with open(segment, 'rb') as segmentFile:
+                while True:
+                    head = segmentFile.read(header.size)
+                    if len(head) < header.size:
+                        break
+                    length, now = header.unpack(head)
+                    payload = segmentFile.read(length)
+                    if len(payload) < length:
+                        break
+
+                    typeName, name, data = pickle.loads(payload)
+                    eventType = types.get(typeName)
+                    if eventType is None:
+                        eventType = EventJournal.__resolveType(typeName)
+                        types[typeName] = eventType
+                    event = eventType.__new__(eventType)
+                    Event.__init__(event, name, data)
+                    yield now, event
+
+    @staticmethod
+    def __resolveType(typeName: str):
+        moduleName, qualname = typeName.split(':')
+        value = import_module(moduleName)
+        for part in qualname.split('.'):
+            value = getattr(value, part)
+        return value
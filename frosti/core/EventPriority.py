@@ -0,0 +1,16 @@
+from enum import Enum
+
+
+class EventPriority(Enum):
+    """ Describes how urgently the EventBus dispatches queued events of a
+    type.  Lower values go first, see EventQueue for how lower priority
+    classes are kept from starving """
+    # Events on the path from a sensor reading to a relay change
+    CONTROL = 0
+    # Events that update what the user sees
+    UI = 1
+    # Events that only record or report state
+    TELEMETRY = 2
+
+    def __str__(self):
+        return super().__str__().replace('EventPriority.', '')
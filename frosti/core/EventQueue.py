@@ -0,0 +1,226 @@
+from collections import deque
+from threading import Condition
+
+from .CoalescePolicy import CoalescePolicy
+from .EventPriority import EventPriority
+from .OverflowPolicy import OverflowPolicy
+from .Event import Event
+
+
+class EventQueue:
+    """ Events waiting to be dispatched by the EventBus, held in one FIFO
+    per EventPriority and collapsing events of the same type while they
+    wait according to their CoalescePolicy.  A coalesced event keeps the
+    place in line of the first event it replaced.
+
+    The highest priority non-empty class is always served next, unless a
+    lower class has been passed over STARVATION_LIMIT times in a row, in
+    which case its oldest event goes first.
+
+    If a limit is given, no more than that many events wait at once and an
+    event fired into a full queue is handled by its OverflowPolicy.  Safe
+    to use from any thread """
+
+    # Times a waiting priority class may be passed over before it is served
+    STARVATION_LIMIT = 8
+    # Seconds OverflowPolicy.BLOCK waits for room before dropping the event
+    BLOCK_TIMEOUT = 1.0
+
+    def __init__(self, limit: int = None):
+        """ Creates a new EventQueue
+
+        limit: int
+            Most events allowed to wait at once, default is no limit """
+        self.__lock = Condition()
+        self.__limit = limit
+        self.__queues = [deque() for _ in EventPriority]
+        self.__passedOver = [0 for _ in EventPriority]
+        self.__peakDepths = [0 for _ in EventPriority]
+        self.__length = 0
+        self.__pending = {}
+        self.__coalescedCount = 0
+        self.__starvationCount = 0
+        self.__overflowCount = 0
+        self.__droppedCounts = {}
+
+    def __len__(self):
+        return self.__length
+
+    @property
+    def limit(self):
+        """ Most events allowed to wait at once, or None if unbounded """
+        return self.__limit
+
+    @property
+    def coalescedCount(self):
+        """ Total number of events absorbed into one already queued """
+        return self.__coalescedCount
+
+    @property
+    def starvationCount(self):
+        """ Total number of events served ahead of a higher priority class
+        because their own class had waited too long """
+        return self.__starvationCount
+
+    @property
+    def overflowCount(self):
+        """ Total number of events fired while the queue was full """
+        return self.__overflowCount
+
+    @property
+    def droppedCounts(self):
+        """ Number of events discarded because the queue was full, by
+        event type name.  A copy taken under the lock, as the queue is
+        read from other threads for metrics """
+        with self.__lock:
+            return dict(self.__droppedCounts)
+
+    @property
+    def depths(self):
+        """ Number of events currently waiting in each priority class """
+        with self.__lock:
+            return {
+                str(priority): len(self.__queues[priority.value])
+                for priority in EventPriority}
+
+    @property
+    def peakDepths(self):
+        """ Most events ever waiting at once in each priority class """
+        with self.__lock:
+            return {
+                str(priority): self.__peakDepths[priority.value]
+                for priority in EventPriority}
+
+    def push(
+            self, event: Event, policy: CoalescePolicy,
+            priority: EventPriority = EventPriority.UI,
+            overflow: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+            block: bool = True):
+        """ Queues the event in its priority class, or folds it into a
+        queued event of the same type if the policy allows.  Returns True
+        if the queue was empty, meaning the consumer may need waking
+
+        overflow: OverflowPolicy
+            What to do if the queue is full
+        block: bool
+            False if the caller must not wait for room, such as the thread
+            consuming the queue.  OverflowPolicy.BLOCK then lets the event
+            in over the limit """
+        dropped = None
+        with self.__lock:
+            eventType = type(event)
+            coalesce = CoalescePolicy.KEEP_ALL != policy
+            if OverflowPolicy.BLOCK == overflow and block and \
+                    self.__isFull() and \
+                    not (coalesce and eventType in self.__pending):
+                self.__lock.wait_for(
+                    lambda: not self.__isFull(), self.BLOCK_TIMEOUT)
+
+            wasEmpty = 0 == self.__length
+            slot = self.__pending.get(eventType) if coalesce else None
+            if slot is not None:
+                if CoalescePolicy.MERGE == policy:
+                    slot[0] = slot[0].merge(event)
+                else:
+                    slot[0] = event
+                self.__coalescedCount += 1
+                return wasEmpty
+
+            admit = True
+            if self.__isFull():
+                self.__overflowCount += 1
+                dropped, admit = self.__overflow(
+                    event, priority, overflow, block)
+
+            if admit:
+                slot = [event, eventType if coalesce else None]
+                if coalesce:
+                    self.__pending[eventType] = slot
+                self.__append(priority, slot)
+
+        if dropped is not None:
+            dropped.dropped()
+        return wasEmpty and admit
+
+    def __isFull(self):
+        return self.__limit is not None and self.__length >= self.__limit
+
+    def __overflow(
+            self, event: Event, priority: EventPriority,
+            overflow: OverflowPolicy, block: bool):
+        """ Applies the overflow policy to an event fired into the full
+        queue, returning the event dropped, if any, and whether the event
+        still needs to be queued.  Called with the lock held """
+        if OverflowPolicy.BLOCK == overflow and not block:
+            return None, True
+        elif OverflowPolicy.COALESCE == overflow:
+            queue = self.__queues[priority.value]
+            for index in range(len(queue) - 1, -1, -1):
+                if type(queue[index][0]) is type(event):
+                    replaced = queue[index][0]
+                    queue[index][0] = event
+                    self.__countDropped(replaced)
+                    return replaced, False
+            return self.__dropOldest(event, priority)
+        elif OverflowPolicy.DROP_OLDEST == overflow:
+            return self.__dropOldest(event, priority)
+
+        self.__countDropped(event)
+        return event, False
+
+    def __dropOldest(self, event: Event, priority: EventPriority):
+        """ Discards the oldest event in the lowest priority class no more
+        important than the event, or the event itself if every queued
+        event is more important.  Returns as __overflow() """
+        for index in range(len(self.__queues) - 1, priority.value - 1, -1):
+            queue = self.__queues[index]
+            if queue:
+                oldest, eventType = queue.popleft()
+                self.__length -= 1
+                if eventType is not None:
+                    del self.__pending[eventType]
+                self.__countDropped(oldest)
+                return oldest, True
+
+        self.__countDropped(event)
+        return event, False
+
+    def __countDropped(self, event: Event):
+        name = type(event).__name__
+        self.__droppedCounts[name] = self.__droppedCounts.get(name, 0) + 1
+
+    def __append(self, priority: EventPriority, slot: list):
+        queue = self.__queues[priority.value]
+        queue.append(slot)
+        self.__length += 1
+        if len(queue) > self.__peakDepths[priority.value]:
+            self.__peakDepths[priority.value] = len(queue)
+
+    def pop(self):
+        """ Removes and returns the next event, or None if empty """
+        with self.__lock:
+            if not self.__length:
+                return None
+
+            chosen = None
+            for index, queue in enumerate(self.__queues):
+                if not queue:
+                    continue
+                if chosen is None:
+                    chosen = index
+                elif self.__passedOver[index] >= self.STARVATION_LIMIT:
+                    self.__passedOver[chosen] += 1
+                    chosen = index
+                    self.__starvationCount += 1
+                    break
+                else:
+                    self.__passedOver[index] += 1
+            self.__passedOver[chosen] = 0
+
+            event, eventType = self.__queues[chosen].popleft()
+            self.__length -= 1
+            if eventType is not None:
+                del self.__pending[eventType]
+            if self.__limit is not None:
+                self.__lock.notify()
+            return event
@@ -0,0 +1,63 @@
+from time import perf_counter, sleep
+
+from .EventBus import EventBus
+from .EventJournal import EventJournal
+
+
+class EventReplayDriver:
+    """ Feeds the events recorded in an EventJournal back into an EventBus,
+    moving the bus through the same virtual times so its timers fire as
+    they did when the journal was recorded """
+
+    def __init__(
+            self, eventBus: EventBus, directory: str,
+            eventTypes: list = None, speed: float = None):
+        """ Creates a new EventReplayDriver
+
+        eventBus: EventBus
+            Bus to replay into, normally a fresh one with the services
+            under test installed
+        directory: str
+            Journal directory to read from
+        eventTypes: list
+            Only replay events of these types, default is all of them.
+            Events the services under test fire themselves, such as
+            ThermostatStateChangedEvent, are normally left out so they are
+            not delivered twice
+        speed: float
+            Replay at this multiple of real time, default is as fast as
+            possible
+        """
+        self.__eventBus = eventBus
+        self.__directory = directory
+        self.__eventTypes = None if eventTypes is None else set(eventTypes)
+        self.__speed = speed
+        self.__eventCount = 0
+
+    @property
+    def eventCount(self):
+        """ Number of events replayed so far """
+        return self.__eventCount
+
+    def run(self):
+        """ Replays the whole journal, returning the number of events """
+        wallStart = None
+        for now, event in EventJournal.read(self.__directory):
+            if self.__eventTypes is not None and \
+                    type(event) not in self.__eventTypes:
+                continue
+
+            if self.__speed is not None:
+                if wallStart is None:
+                    wallStart, journalStart = perf_counter(), now
+                delay = (now - journalStart) / self.__speed - \
+                    (perf_counter() - wallStart)
+                if delay > 0:
+                    sleep(delay)
+
+            self.__eventBus.advanceTo(now)
+            self.__eventBus.fireEvent(event)
+            self.__eventBus.processEvents(now)
+            self.__eventCount += 1
+
+        return self.__eventCount
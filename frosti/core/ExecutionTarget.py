@@ -0,0 +1,14 @@
+from enum import Enum
+
+
+class ExecutionTarget(Enum):
+    """ Describes which thread an EventBus event handler runs on """
+    # The thread driving the EventBus, in order with everything else
+    MAIN = 0
+    # Any thread of a pool shared by the whole EventBus, in no set order
+    POOL = 1
+    # A dedicated worker thread, in the order the events were fired
+    SERIAL = 2
+
+    def __str__(self):
+        return super().__str__().replace('ExecutionTarget.', '')
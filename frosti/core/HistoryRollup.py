@@ -0,0 +1,141 @@
+from datetime import datetime, timezone
+
+
+class HistoryRollup:
+    """ Summarizes sensor readings, prices and HVAC states into buckets of
+    time at several resolutions as they arrive, so charts over long spans
+    read a handful of rows rather than every sample.  Times are seconds
+    since the epoch and buckets are aligned to the epoch, so a bucket
+    starts on the minute, quarter hour or hour in UTC.
+
+    drain() hands back a row for every bucket touched since the last
+    drain, including ones still filling.  Rows for the same bucket from
+    successive drains are partial summaries of it, meant to be merged by
+    whoever stores them """
+
+    RESOLUTIONS = (60, 900, 3600)
+
+    def __init__(self, resolutions: tuple = RESOLUTIONS):
+        """ Creates a new HistoryRollup
+
+        resolutions: tuple
+            Lengths of the buckets to keep, in seconds
+        """
+        self.__resolutions = tuple(resolutions)
+        self.__sensors = dict()
+        self.__prices = dict()
+        self.__dutyCycles = dict()
+        self.__state = None
+
+    def addSensorReading(
+            self, time: float, temperature: float, humidity: float):
+        """ Adds a temperature and humidity reading taken at a time """
+        for bucket in self.__buckets(time):
+            summary = self.__sensors.get(bucket)
+            if summary is None:
+                self.__sensors[bucket] = [
+                    1, temperature, temperature, temperature,
+                    humidity, humidity, humidity]
+                continue
+            summary[0] += 1
+            summary[1] = min(summary[1], temperature)
+            summary[2] = max(summary[2], temperature)
+            summary[3] += temperature
+            summary[4] = min(summary[4], humidity)
+            summary[5] = max(summary[5], humidity)
+            summary[6] += humidity
+
+    def addPrice(self, time: float, price: float):
+        """ Adds a power price that arrived at a time """
+        for bucket in self.__buckets(time):
+            summary = self.__prices.get(bucket)
+            if summary is None:
+                self.__prices[bucket] = [
+                    1, time, price, price, price, time, price, price]
+                continue
+            summary[0] += 1
+            if time < summary[1]:
+                summary[1], summary[2] = time, price
+            summary[3] = max(summary[3], price)
+            summary[4] = min(summary[4], price)
+            if time >= summary[5]:
+                summary[5], summary[6] = time, price
+            summary[7] += price
+
+    def addState(self, time: float, cooling: bool, heating: bool, fan: bool):
+        """ Records the HVAC state from a time on, crediting the one before
+        it with the time it was in effect """
+        self.advance(time)
+        self.__state = (time, bool(cooling), bool(heating), bool(fan))
+
+    def advance(self, time: float):
+        """ Credits the HVAC state in effect with the time up until a time,
+        so buckets can be drained before the state next changes """
+        if self.__state is None:
+            return
+        start, cooling, heating, fan = self.__state
+        if time <= start:
+            return
+        self.__state = (time, cooling, heating, fan)
+        if not (cooling or heating or fan):
+            return
+
+        for resolution in self.__resolutions:
+            bucketStart = start // resolution * resolution
+            while bucketStart < time:
+                bucketEnd = bucketStart + resolution
+                seconds = min(time, bucketEnd) - max(start, bucketStart)
+                summary = self.__dutyCycles.setdefault(
+                    (resolution, bucketStart), [0.0, 0.0, 0.0])
+                summary[0] += seconds if cooling else 0.0
+                summary[1] += seconds if heating else 0.0
+                summary[2] += seconds if fan else 0.0
+                bucketStart = bucketEnd
+
+    def drain(self):
+        """ Rows for the sensor, price and duty cycle rollups touched since
+        the last drain, as three lists of dicts keyed by column name """
+        sensorRows = [{
+            'resolution': resolution,
+            'time': HistoryRollup.__datetime(bucketStart),
+            'samples': summary[0],
+            'temperature_min': summary[1],
+            'temperature_max': summary[2],
+            'temperature_avg': summary[3] / summary[0],
+            'humidity_min': summary[4],
+            'humidity_max': summary[5],
+            'humidity_avg': summary[6] / summary[0],
+        } for (resolution, bucketStart), summary in self.__sensors.items()]
+        priceRows = [{
+            'resolution': resolution,
+            'time': HistoryRollup.__datetime(bucketStart),
+            'samples': summary[0],
+            'open': summary[2],
+            'high': summary[3],
+            'low': summary[4],
+            'close': summary[6],
+            'average': summary[7] / summary[0],
+            'open_time': HistoryRollup.__datetime(summary[1]),
+            'close_time': HistoryRollup.__datetime(summary[5]),
+        } for (resolution, bucketStart), summary in self.__prices.items()]
+        dutyCycleRows = [{
+            'resolution': resolution,
+            'time': HistoryRollup.__datetime(bucketStart),
+            'cooling': summary[0],
+            'heating': summary[1],
+            'fan': summary[2],
+        } for (resolution, bucketStart), summary in self.__dutyCycles.items()]
+
+        self.__sensors = dict()
+        self.__prices = dict()
+        self.__dutyCycles = dict()
+        return sensorRows, priceRows, dutyCycleRows
+
+    def __buckets(self, time: float):
+        return [
+            (resolution, time // resolution * resolution)
+            for resolution in self.__resolutions]
+
+    @staticmethod
+    def __datetime(time: float):
+        return datetime.fromtimestamp(time, timezone.utc)
@@ -0,0 +1,98 @@
+import sys
+from subprocess import run
+
+
+class ImportProfiler:
+    """ Measures what importing modules costs, the way python -X importtime
+    does, with each module imported on its own in a fresh interpreter so
+    the results do not depend on what happened to be loaded already.
+
+    The report gives, for each module profiled, the total time to import
+    it, that time broken down by top-level package, and the slowest
+    individual modules it pulled in by their own (self) time """
+
+    # Number of slowest packages and modules listed for each module
+    # profiled
+    SLOWEST_COUNT = 10
+
+    def __init__(self, modules: list):
+        """ Creates a new ImportProfiler
+
+        modules: list
+            Dotted names of the modules to profile """
+        self.__modules = list(modules)
+
+    @staticmethod
+    def parse(output: str):
+        """ Parses -X importtime output into a list of (module, self
+        seconds, cumulative seconds, depth), in the order they finished """
+        imports = list()
+        for line in output.splitlines():
+            if not line.startswith('import time:'):
+                continue
+            fields = line[len('import time:'):].split('|')
+            if len(fields) != 3 or not fields[0].strip().isdigit():
+                continue
+            name = fields[2].rstrip()
+            depth = (len(name) - len(name.lstrip())) // 2
+            imports.append((
+                name.strip(), int(fields[0]) / 1e6, int(fields[1]) / 1e6,
+                depth))
+        return imports
+
+    def profileModule(self, module: str):
+        """ Imports one module in a new interpreter and summarizes the
+        time it took """
+        result = run(
+            [sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+            capture_output=True, text=True)
+        imports = ImportProfiler.parse(result.stderr)
+
+        packages = dict()
+        for name, selfTime, _, _ in imports:
+            package = name.split('.')[0]
+            packages[package] = packages.get(package, 0.0) + selfTime
+
+        slowest = sorted(imports, key=lambda entry: entry[1], reverse=True)
+        return {
+            'error': None if 0 == result.returncode else
+            result.stderr.strip().splitlines()[-1],
+            'total': sum(entry[1] for entry in imports),
+            'moduleCount': len(imports),
+            'packages': dict(sorted(
+                packages.items(), key=lambda item: item[1], reverse=True)),
+            'slowest': [
+                {'module': name, 'self': selfTime, 'cumulative': cumulative}
+                for name, selfTime, cumulative, _ in
+                slowest[:self.SLOWEST_COUNT]],
+        }
+
+    def profile(self):
+        """ Profiles every module, returning the reports keyed by module """
+        return {module: self.profileModule(module)
+                for module in self.__modules}
+
+    @staticmethod
+    def formatReport(report: dict):
+        """ Lines of text describing a report from profile() """
+        lines = list()
+        for module, entry in report.items():
+            lines.append(
+                f"{module}: {1000 * entry['total']:.1f}ms over "
+                f"{entry['moduleCount']} modules")
+            if entry['error'] is not None:
+                lines.append(f"  failed: {entry['error']}")
+                continue
+            packages = list(entry['packages'].items())
+            for package, packageTime in \
+                    packages[:ImportProfiler.SLOWEST_COUNT]:
+                if packageTime < 0.001:
+                    break
+                lines.append(f"  {package:<40} {1000 * packageTime:8.1f}ms")
+            lines.append("  slowest modules (self / cumulative):")
+            for slow in entry['slowest']:
+                lines.append(
+                    f"    {slow['module']:<38} "
+                    f"{1000 * slow['self']:8.1f}ms "
+                    f"{1000 * slow['cumulative']:8.1f}ms")
+        return lines
@@ -0,0 +1,78 @@
+from bisect import bisect_left
+from threading import Lock
+
+
+class LatencyHistogram:
+    """ Fixed-bucket histogram of durations in seconds.  Recording is a
+    bisect and an increment, and percentiles are estimated as the upper
+    bound of the bucket they fall in.  Safe to read from one thread while
+    another records """
+
+    # Upper bound of each bucket in seconds, doubling from 50us up to ~26s.
+    # Anything slower lands in a final overflow bucket
+    BOUNDS = tuple(0.00005 * 2**i for i in range(20))
+
+    def __init__(self):
+        self.__counts = [0] * (len(self.BOUNDS) + 1)
+        self.__count = 0
+        self.__total = 0.0
+        self.__max = 0.0
+        self.__lock = Lock()
+
+    @property
+    def count(self):
+        """ Number of durations recorded """
+        return self.__count
+
+    @property
+    def max(self):
+        """ Longest duration recorded """
+        return self.__max
+
+    @property
+    def mean(self):
+        """ Average duration recorded, or 0.0 if none have been """
+        return self.__total / self.__count if self.__count else 0.0
+
+    def record(self, value: float):
+        """ Adds a duration in seconds to the histogram """
+        index = bisect_left(self.BOUNDS, value)
+        with self.__lock:
+            self.__counts[index] += 1
+            self.__count += 1
+            self.__total += value
+            self.__max = max(self.__max, value)
+
+    def percentile(self, fraction: float):
+        """ Estimates the duration below which the given fraction [0-1] of
+        recorded durations fall, never more than the max recorded """
+        with self.__lock:
+            counts, maximum = list(self.__counts), self.__max
+        return LatencyHistogram.__percentile(counts, maximum, fraction)
+
+    def asDict(self):
+        """ Summary of the histogram suitable for returning as JSON, taken
+        from a consistent copy """
+        with self.__lock:
+            counts, count, total, maximum = \
+                list(self.__counts), self.__count, self.__total, self.__max
+        return {
+            'count': count,
+            'mean': total / count if count else 0.0,
+            'max': maximum,
+            'p50': LatencyHistogram.__percentile(counts, maximum, 0.50),
+            'p95': LatencyHistogram.__percentile(counts, maximum, 0.95),
+            'p99': LatencyHistogram.__percentile(counts, maximum, 0.99),
+            'buckets': {
+                f"{bound:g}": count for bound, count in
+                zip(self.BOUNDS + ('inf',), counts) if count},
+        }
+
+    @staticmethod
+    def __percentile(counts: list, maximum: float, fraction: float):
+        target, seen = fraction * sum(counts), 0
+        for bound, count in zip(LatencyHistogram.BOUNDS, counts):
+            seen += count
+            if seen and seen >= target:
+                return min(bound, maximum)
+        return maximum
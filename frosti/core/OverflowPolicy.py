@@ -0,0 +1,17 @@
+from enum import Enum
+
+
+class OverflowPolicy(Enum):
+    """ Describes what the EventBus does when an event of a type is fired
+    while its queue is already holding as many events as it is allowed """
+    # Wait for room when fired from another thread, giving up after a while
+    BLOCK = 0
+    # Make room by discarding the oldest event of the same or lower priority
+    DROP_OLDEST = 1
+    # Discard the event being fired
+    DROP_NEWEST = 2
+    # Replace the newest queued event of the same type, if there is one
+    COALESCE = 3
+
+    def __str__(self):
+        return super().__str__().replace('OverflowPolicy.', '')
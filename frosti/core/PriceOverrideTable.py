@@ -0,0 +1,30 @@
+from bisect import bisect_right
+
+
+class PriceOverrideTable:
+    """ A program's price overrides compiled into an array sorted by price,
+    so the override for a price, the one with the highest threshold at or
+    below it, is found by bisection """
+
+    def __init__(self, overrides: list = ()):
+        """ Creates a new PriceOverrideTable
+
+        overrides: list
+            Tuples of price threshold, comfort minimum and comfort maximum,
+            in any order.  Either comfort target may be None to leave the
+            current one alone """
+        self.__overrides = sorted(overrides, key=lambda entry: entry[0])
+        self.__prices = [entry[0] for entry in self.__overrides]
+
+    def __len__(self):
+        return len(self.__overrides)
+
+    def __eq__(self, other):
+        return isinstance(other, PriceOverrideTable) and \
+            self.__overrides == other.__overrides
+
+    def lookup(self, price: float):
+        """ The (price, comfortMin, comfortMax) override in effect at a
+        price, or None if the price is below every threshold """
+        index = bisect_right(self.__prices, price)
+        return self.__overrides[index - 1] if index else None
@@ -0,0 +1,272 @@
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from threading import Thread, current_thread
+from time import perf_counter
+
+from .ExecutionTarget import ExecutionTarget
+from frosti.logging import log, handleException
+
+
+class ServiceStartup:
+    """ Brings services up as a set of named phases with declared
+    dependencies, starting each phase as soon as every phase it depends on
+    has finished, so independent services initialize concurrently.
+
+    ExecutionTarget.POOL phases run on a thread pool and should only build
+    things, such as opening hardware or connecting to the database.
+    ExecutionTarget.MAIN phases run one at a time on the thread calling
+    run(), which is where anything touching the EventBus or the shared
+    database session belongs.  Ready MAIN phases run in the order they were
+    added, so adding the control path first brings it up first.
+
+    run() can return once the phases the main loop needs are up, leaving
+    the rest to finish in the background.  Every phase is timed, and the
+    report gives when each phase started and how long it took relative to
+    the start of the boot """
+
+    class __Phase:
+
+        def __init__(self, name, method, dependencies, target):
+            self.name = name
+            self.method = method
+            self.dependencies = tuple(dependencies)
+            self.target = target
+            self.thread = None
+            self.start = None
+            self.duration = None
+
+    def __init__(self, poolSize: int = 4, invoke=None):
+        """ Creates a new ServiceStartup
+
+        poolSize: int
+            Most POOL phases allowed to run at once
+        invoke: callable
+            Runs a MAIN phase left to finish after run() has returned on
+            the main thread and waits for it, normally EventBus.safeInvoke.
+            Only needed when run() is given phases to wait for """
+        self.__poolSize = poolSize
+        self.__invoke = invoke
+        self.__phases = {}
+        self.__bootStart = None
+        self.__ready = None
+        self.__total = None
+
+    def addPhase(
+            self, name: str, method, dependencies: list = (),
+            target: ExecutionTarget = ExecutionTarget.POOL):
+        """ Adds a phase calling method() once every phase named in
+        dependencies has finished """
+        if name in self.__phases:
+            raise RuntimeError(f"Startup phase {name} already added")
+        if ExecutionTarget.SERIAL == target:
+            raise RuntimeError("Startup phases run on MAIN or POOL")
+        self.__phases[name] = ServiceStartup.__Phase(
+            name, method, dependencies, target)
+
+    @property
+    def report(self):
+        """ Timings of every phase run so far, or None before run().
+        'ready' is how long run() took to return and 'total' how long
+        every phase took, or None while some are still running """
+        if self.__bootStart is None:
+            return None
+        return self.__buildReport()
+
+    def __checkDependencies(self):
+        """ Raises if a dependency is unknown or phases depend on each
+        other in a cycle """
+        for phase in self.__phases.values():
+            for dependency in phase.dependencies:
+                if dependency not in self.__phases:
+                    raise RuntimeError(
+                        f"Startup phase {phase.name} depends on unknown "
+                        f"phase {dependency}")
+
+        visited, visiting = set(), set()
+
+        def visit(name):
+            if name in visiting:
+                raise RuntimeError(
+                    f"Startup phases depend on each other through {name}")
+            if name not in visited:
+                visiting.add(name)
+                for dependency in self.__phases[name].dependencies:
+                    visit(dependency)
+                visiting.discard(name)
+                visited.add(name)
+
+        for name in self.__phases:
+            visit(name)
+
+    def __required(self, names: list):
+        """ The named phases and every phase they depend on """
+        required = set()
+        pending = list(names)
+        while pending:
+            name = pending.pop()
+            if name not in required:
+                required.add(name)
+                pending.extend(self.__phases[name].dependencies)
+        return required
+
+    def __runPhase(self, phase):
+        phase.thread = current_thread().name
+        phase.start = perf_counter() - self.__bootStart
+        try:
+            phase.method()
+        finally:
+            phase.duration = perf_counter() - self.__bootStart - phase.start
+
+    def run(self, until: list = None):
+        """ Runs the phases, returning the boot report once every phase
+        named in until, and everything they depend on, has finished.  Any
+        other phases carry on in the background, see invoke in
+        __init__().  The default is to wait for every phase.
+
+        If a phase raises, phases already running are allowed to finish,
+        nothing new is started and the exception is raised from here, or
+        logged if it happens in the background """
+        self.__checkDependencies()
+        for name in until or ():
+            if name not in self.__phases:
+                raise RuntimeError(f"Unknown startup phase {name}")
+        if until is not None and self.__invoke is None:
+            raise RuntimeError(
+                "Finishing startup in the background needs invoke")
+
+        required = self.__required(until) if until is not None \
+            else set(self.__phases)
+        waiting = list(self.__phases.values())
+        finished = set()
+        running = {}
+        self.__bootStart = perf_counter()
+        executor = ThreadPoolExecutor(
+            max_workers=self.__poolSize, thread_name_prefix='ServiceStartup')
+
+        try:
+            self.__drive(
+                executor, waiting, running, finished, self.__runPhase,
+                lambda: finished.issuperset(required))
+        except Exception:
+            wait(running)
+            executor.shutdown()
+            self.__ready = perf_counter() - self.__bootStart
+            self.logReport()
+            raise
+        self.__ready = perf_counter() - self.__bootStart
+
+        if waiting or running:
+            def finish():
+                try:
+                    self.__drive(
+                        executor, waiting, running, finished,
+                        lambda phase: self.__invoke(self.__runPhase, phase),
+                        lambda: False)
+                except Exception:
+                    handleException("starting services in the background")
+                finally:
+                    wait(running)
+                    executor.shutdown()
+                self.__total = perf_counter() - self.__bootStart
+                log.info(
+                    f"Background startup finished after {self.__total:.3f}s")
+                self.logReport()
+
+            Thread(target=finish, name='ServiceStartup', daemon=True).start()
+        else:
+            executor.shutdown()
+            self.__total = self.__ready
+
+        self.logReport()
+        return self.report
+
+    def __drive(
+            self, executor, waiting: list, running: dict, finished: set,
+            runMain, done):
+        """ Starts phases as their dependencies finish until done() or
+        every phase has run, raising the first phase failure """
+        while (waiting or running) and not done():
+            ready = [
+                phase for phase in waiting
+                if finished.issuperset(phase.dependencies)]
+            for phase in ready:
+                if ExecutionTarget.POOL == phase.target:
+                    waiting.remove(phase)
+                    running[executor.submit(self.__runPhase, phase)] = phase
+
+            mainReady = [
+                phase for phase in ready
+                if ExecutionTarget.MAIN == phase.target]
+            if mainReady:
+                phase = mainReady[0]
+                waiting.remove(phase)
+                try:
+                    runMain(phase)
+                except Exception as e:
+                    raise RuntimeError(
+                        f"Startup phase {phase.name} failed") from e
+                finished.add(phase.name)
+                timeout = 0
+            elif running:
+                timeout = None
+            else:
+                break
+
+            if running:
+                completed, _ = wait(
+                    running, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in completed:
+                    phase = running.pop(future)
+                    if future.exception() is not None:
+                        raise RuntimeError(
+                            f"Startup phase {phase.name} failed") \
+                            from future.exception()
+                    finished.add(phase.name)
+
+    def __buildReport(self):
+        phases = dict()
+        for phase in self.__phases.values():
+            phases[phase.name] = {
+                'target': str(phase.target),
+                'thread': phase.thread,
+                'dependencies': list(phase.dependencies),
+                'start': phase.start,
+                'duration': phase.duration,
+            }
+
+        # The critical path is the chain of phases, each the last
+        # dependency of the next to finish, ending with the last phase
+        criticalPath = list()
+        ran = [p for p in self.__phases.values() if p.duration is not None]
+        phase = max(
+            ran, key=lambda p: p.start + p.duration, default=None)
+        while phase is not None:
+            criticalPath.insert(0, phase.name)
+            phase = max(
+                (self.__phases[name] for name in phase.dependencies
+                 if self.__phases[name].duration is not None),
+                key=lambda p: p.start + p.duration, default=None)
+
+        return {
+            'ready': self.__ready,
+            'total': self.__total,
+            'phases': phases,
+            'criticalPath': criticalPath,
+        }
+
+    def logReport(self):
+        """ Logs the report so far, one finished phase per line in the
+        order they started """
+        report = self.report
+        if report is None:
+            return
+        log.info(f"Services ready after {report['ready']:.3f}s, critical "
+                 f"path {' > '.join(report['criticalPath'])}")
+        phases = sorted(
+            ((name, phase) for name, phase in report['phases'].items()
+             if phase['duration'] is not None),
+            key=lambda item: item[1]['start'])
+        for name, phase in phases:
+            log.info(
+                f"  {name:<16} {phase['target']:<5} "
+                f"start {phase['start']:7.3f}s "
+                f"took {phase['duration']:7.3f}s")
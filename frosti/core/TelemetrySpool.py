@@ -0,0 +1,149 @@
+import pickle
+from os import fsync, listdir, makedirs, path, remove, rename
+from struct import Struct
+
+from frosti.logging import log
+
+
+class TelemetrySpool:
+    """ Durable, append-only store of rows waiting to be written to the
+    database, for keeping history while the database is unreachable.  Each
+    append() is on disk before it returns, and a batch of rows is only
+    removed once replay() has handed it off successfully.
+
+    Rows are kept in segment files, each record a 4 byte little-endian
+    length followed by the pickled table name and list of row dicts.  A
+    record cut short by a crash is ignored.  Not safe to share between
+    threads; the owner appends and replays from a single thread """
+
+    HEADER = Struct('<I')
+    SEGMENT_PREFIX = 'spool-'
+    SEGMENT_SUFFIX = '.rows'
+    REJECTED_SUFFIX = '.rejected'
+
+    def __init__(
+            self, directory: str, segmentSize: int = 1024 * 1024,
+            maxBytes: int = 64 * 1024 * 1024):
+        """ Creates a new TelemetrySpool, picking up any rows left in the
+        directory by an earlier run
+
+        directory: str
+            Where to keep the segment files, created if needed
+        segmentSize: int
+            Bytes after which a new segment is started
+        maxBytes: int
+            Most bytes kept.  Beyond this, the oldest segments are deleted,
+            so a long outage cannot fill the disk
+        """
+        makedirs(directory, exist_ok=True)
+        self.__directory = directory
+        self.__segmentSize = segmentSize
+        self.__maxBytes = maxBytes
+        self.__file = None
+        self.__droppedSegments = 0
+
+        segments = self.segments()
+        self.__segmentIndex = 0 if not segments else \
+            TelemetrySpool.__segmentNumber(segments[-1]) + 1
+
+    def __len__(self):
+        """ Number of segment files waiting to be replayed """
+        return len(self.segments())
+
+    @property
+    def droppedSegments(self):
+        """ Number of segments deleted unreplayed to stay under maxBytes """
+        return self.__droppedSegments
+
+    @property
+    def byteCount(self):
+        """ Bytes currently waiting to be replayed """
+        return sum(path.getsize(segment) for segment in self.segments())
+
+    def segments(self):
+        """ Paths of the segment files waiting to be replayed, oldest
+        first """
+        names = [
+            name for name in listdir(self.__directory)
+            if name.startswith(self.SEGMENT_PREFIX) and
+            name.endswith(self.SEGMENT_SUFFIX)]
+        names.sort(key=TelemetrySpool.__segmentNumber)
+        return [path.join(self.__directory, name) for name in names]
+
+    def append(self, tableName: str, rows: list):
+        """ Stores rows for a table, returning once they are on disk """
+        payload = pickle.dumps((tableName, rows), pickle.HIGHEST_PROTOCOL)
+        if self.__file is None or self.__file.tell() >= self.__segmentSize:
+            self.__rotate()
+        self.__file.write(self.HEADER.pack(len(payload)))
+        self.__file.write(payload)
+        self.__file.flush()
+        fsync(self.__file.fileno())
+
+    def replay(self, write):
+        """ Calls write(tables) for each segment, oldest first, where tables
+        maps each table name to every row spooled for it in that segment.
+        A segment is deleted once write() returns and kept if it raises,
+        which stops the replay and is raised from here.  Returns the
+        number of rows replayed """
+        self.__close()
+        rowCount = 0
+        for segment in self.segments():
+            tables = dict()
+            for tableName, rows in TelemetrySpool.__read(segment):
+                tables.setdefault(tableName, list()).extend(rows)
+            write(tables)
+            remove(segment)
+            rowCount += sum(len(rows) for rows in tables.values())
+        return rowCount
+
+    def reject(self, segment: str):
+        """ Sets a segment aside so it is never replayed again, for rows the
+        database refuses outright """
+        rename(segment, segment + self.REJECTED_SUFFIX)
+
+    def __close(self):
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+
+    def __rotate(self):
+        """ Starts a new segment, deleting the oldest beyond maxBytes """
+        self.__close()
+        fileName = path.join(
+            self.__directory,
+            f"{self.SEGMENT_PREFIX}{self.__segmentIndex:08d}"
+            f"{self.SEGMENT_SUFFIX}")
+        self.__segmentIndex += 1
+        self.__file = open(fileName, 'ab')
+
+        segments = self.segments()
+        total = sum(path.getsize(segment) for segment in segments)
+        for segment in segments[:-1]:
+            if total <= self.__maxBytes:
+                break
+            total -= path.getsize(segment)
+            remove(segment)
+            self.__droppedSegments += 1
+            log.warning(f"Telemetry spool full, dropped {segment}")
+
+    @staticmethod
+    def __segmentNumber(fileName: str):
+        name = path.basename(fileName)
+        start = len(TelemetrySpool.SEGMENT_PREFIX)
+        end = len(name) - len(TelemetrySpool.SEGMENT_SUFFIX)
+        return int(name[start:end])
+
+    @staticmethod
+    def __read(segment: str):
+        header = TelemetrySpool.HEADER
+        with open(segment, 'rb') as segmentFile:
+            while True:
+                head = segmentFile.read(header.size)
+                if len(head) < header.size:
+                    break
+                length, = header.unpack(head)
+                payload = segmentFile.read(length)
+                if len(payload) < length:
+                    break
+                yield pickle.loads(payload)
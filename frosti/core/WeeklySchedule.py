@@ -0,0 +1,82 @@
+from bisect import bisect_right
+from datetime import datetime, timedelta
+
+
+class WeeklySchedule:
+    """ A week of transitions, each a minute of the week and whatever
+    applies from then until the next, compiled into a sorted array so the
+    one in effect and the next to come are found by bisection.  The week
+    starts at midnight on Sunday, the first transition carrying on from
+    the last one of the week before """
+
+    MINUTES_PER_WEEK = 7 * 24 * 60
+
+    def __init__(self, transitions: list = ()):
+        """ Creates a new WeeklySchedule
+
+        transitions: list
+            Pairs of minute of the week [0-10079] and the value taking
+            effect then, in any order.  A later pair for the same minute
+            replaces an earlier one """
+        merged = dict(transitions)
+        self.__minutes = sorted(merged)
+        self.__values = [merged[minute] for minute in self.__minutes]
+
+    def __len__(self):
+        return len(self.__minutes)
+
+    @staticmethod
+    def minuteOfWeek(localTime: datetime):
+        """ Minute of the week for a local time, with seconds as the
+        fraction """
+        day = (localTime.weekday() + 1) % 7
+        return localTime.second / 60 + localTime.minute + \
+            60 * (localTime.hour + 24 * day)
+
+    @staticmethod
+    def startOfWeek(localTime: datetime):
+        """ Naive local midnight on the Sunday starting the week holding a
+        local time """
+        day = (localTime.weekday() + 1) % 7
+        return localTime.replace(
+            tzinfo=None, hour=0, minute=0, second=0, microsecond=0) - \
+            timedelta(days=day)
+
+    def at(self, minute: float):
+        """ The value in effect at a minute of the week, or None if there
+        are no transitions """
+        if not self.__minutes:
+            return None
+        return self.__values[bisect_right(self.__minutes, minute) - 1]
+
+    def nextTransition(self, minute: float):
+        """ Minute of the week of the first transition after a minute of
+        the week, past the end of the week if it comes in the next one, or
+        None if there are no transitions """
+        if not self.__minutes:
+            return None
+        index = bisect_right(self.__minutes, minute)
+        if index < len(self.__minutes):
+            return self.__minutes[index]
+        return self.__minutes[0] + self.MINUTES_PER_WEEK
+
+    def secondsUntilNext(self, now: float, localTimeZone):
+        """ Seconds from a time since the epoch until the next transition,
+        transitions being in wall clock time for a pytz time zone, or None
+        if there are no transitions.  Across a DST change a wall clock
+        time can come twice or not at all, in which case this is the
+        earliest instant it could mean, so a caller may find itself early
+        and should check again """
+        localNow = datetime.fromtimestamp(now, localTimeZone)
+        minute = self.nextTransition(WeeklySchedule.minuteOfWeek(localNow))
+        if minute is None:
+            return None
+
+        wallClock = WeeklySchedule.startOfWeek(localNow) + \
+            timedelta(minutes=minute)
+        candidates = [
+            localTimeZone.localize(wallClock, is_dst=isDst).timestamp() - now
+            for isDst in (True, False)]
+        return min(
+            (candidate for candidate in candidates if candidate > 0),
+            default=None)
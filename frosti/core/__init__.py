@@ -9,8 +9,24 @@ somewhere there is a component that provides them (ServiceProvider).
 
 from .ServiceConsumer import ServiceConsumer
 from .ServiceProvider import ServiceProvider
+from .CoalescePolicy import CoalescePolicy
+from .EventPriority import EventPriority
+from .OverflowPolicy import OverflowPolicy
+from .ExecutionTarget import ExecutionTarget
 from .Event import Event
+from .EventFilter import EventFilter
+from .EventJournal import EventJournal
+from .TelemetrySpool import TelemetrySpool
 from .EventBus import EventBus
+from .AsyncEventBus import AsyncEventBus
+from .EventReplayDriver import EventReplayDriver
+from .ServiceStartup import ServiceStartup
 from .EventBusTimer import EventBusTimer
+from .EventBusProfiler import EventBusProfiler
+from .LatencyHistogram import LatencyHistogram
+from .ImportProfiler import ImportProfiler
+from .WeeklySchedule import WeeklySchedule
+from .PriceOverrideTable import PriceOverrideTable
+from .HistoryRollup import HistoryRollup
 from .ThermostatState import ThermostatState
 from .ThermostatMode import ThermostatMode
@@ -0,0 +1,29 @@
+from frosti.core import Event, CoalescePolicy, EventPriority, OverflowPolicy
+
+
+class ConfigChangedEvent(Event):
+    """ Fired when configuration values are added, changed or removed, so
+    services can apply them without a restart.  Queued events merge,
+    carrying every key changed since the first was fired.  Config holds
+    control parameters such as comfort limits and delays, so changes are
+    dispatched ahead of any backlog of telemetry """
+    coalescePolicy = CoalescePolicy.MERGE
+    priority = EventPriority.CONTROL
+    overflowPolicy = OverflowPolicy.BLOCK
+    __slots__ = ()
+
+    def __init__(self, names: frozenset):
+        super().__init__(
+            name='ConfigChangedEvent', data={'names': frozenset(names)})
+
+    @property
+    def names(self):
+        """ Names of the configuration values that changed """
+        return self._data['names']
+
+    def changed(self, *prefixes: str):
+        """ True if any changed name starts with one of the prefixes """
+        return any(name.startswith(prefixes) for name in self.names)
+
+    def merge(self, event):
+        return ConfigChangedEvent(self.names | event.names)
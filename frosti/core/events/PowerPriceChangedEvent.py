@@ -1,8 +1,11 @@
-from frosti.core import Event
+from frosti.core import Event, EventPriority
 
 
 class PowerPriceChangedEvent(Event):
     """ Signals the start of a new power price in $/kW*h """
+    priority = EventPriority.TELEMETRY
+    __slots__ = ()
+
     def __init__(self, price: float, nextUpdate: float):
         super().__init__(
             name='PowerPriceChangedEvent',
@@ -11,9 +14,9 @@ class PowerPriceChangedEvent(Event):
     @property
     def price(self):
         """ Current price """
-        return super().data['price']
+        return self._data['price']
 
     @property
     def nextUpdate(self):
         """ Seconds between this event and next price update """
-        return super().data['nextUpdate']
+        return self._data['nextUpdate']
@@ -0,0 +1,11 @@
+from frosti.core import Event, CoalescePolicy
+
+
+class ScheduleChangedEvent(Event):
+    """ Fired when programs or schedules are written, so anything compiled
+    from them can be rebuilt """
+    coalescePolicy = CoalescePolicy.LATEST
+    __slots__ = ()
+
+    def __init__(self):
+        super().__init__('ScheduleChangedEvent')
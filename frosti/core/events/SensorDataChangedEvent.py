@@ -1,22 +1,32 @@
-from frosti.core import Event
+from frosti.core import Event, CoalescePolicy, EventPriority
 
 
 class SensorDataChangedEvent(Event):
+    coalescePolicy = CoalescePolicy.LATEST
+    priority = EventPriority.CONTROL
+    __slots__ = ()
+
     def __init__(self, temperature: float, pressure: float, humidity: float):
-        super().__init__(data={
-            'temperature': temperature,
-            'pressure': pressure,
-            'humidity': humidity
+        """ Readings are converted to float once here.  A sensor that gave
+        no reading leaves it None, for consumers to handle """
+        super().__init__('SensorDataChangedEvent', {
+            'temperature': SensorDataChangedEvent.__reading(temperature),
+            'pressure': SensorDataChangedEvent.__reading(pressure),
+            'humidity': SensorDataChangedEvent.__reading(humidity)
         })
 
+    @staticmethod
+    def __reading(value):
+        return None if value is None else float(value)
+
     @property
     def temperature(self):
-        return float(self._data['temperature'])
+        return self._data['temperature']
 
     @property
     def pressure(self):
-        return float(self._data['pressure'])
+        return self._data['pressure']
 
     @property
     def humidity(self):
-        return float(self._data['humidity'])
+        return self._data['humidity']
@@ -1,8 +1,11 @@
-from frosti.core import Event
+from frosti.core import Event, CoalescePolicy, EventPriority
 
 
 class SettingsChangedEvent(Event):
     """ Fired when any property of ThermostatSerivce changes """
+    coalescePolicy = CoalescePolicy.LATEST
+    priority = EventPriority.TELEMETRY
+    __slots__ = ()
 
     def __init__(self):
         super().__init__('SettingsChangedEvent')
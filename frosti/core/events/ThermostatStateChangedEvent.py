@@ -1,7 +1,11 @@
-from .. import ThermostatState, Event
+from .. import ThermostatState, Event, EventPriority, OverflowPolicy
 
 
 class ThermostatStateChangedEvent(Event):
+    priority = EventPriority.CONTROL
+    overflowPolicy = OverflowPolicy.BLOCK
+    __slots__ = ()
+
     def __init__(self, value: ThermostatState):
         super().__init__('ThermostatStateChangedEvent', {'state': value})
 
@@ -12,3 +12,5 @@ from .ThermostatStateChangedEvent import ThermostatStateChangedEvent
 from .PowerPriceChangedEvent import PowerPriceChangedEvent
 from .SensorDataChangedEvent import SensorDataChangedEvent
 from .SettingsChangedEvent import SettingsChangedEvent
+from .ConfigChangedEvent import ConfigChangedEvent
+from .ScheduleChangedEvent import ScheduleChangedEvent
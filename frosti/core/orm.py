@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Float, DateTime, Integer, String, ForeignKey
+from sqlalchemy import Column, Float, DateTime, Integer, String, ForeignKey, \
+    REAL, SmallInteger
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
@@ -32,6 +33,20 @@ class OrmConfig(Base):
     # Columns
     value = Column(String, nullable=False)
 
+
+class OrmContentHash(Base):
+    ''' Hash of the last whole document of programs, schedules or config
+    written, so writing the same one again can be skipped '''
+    __tablename__ = 'content_hash'
+
+    # Primary Key
+    ''' Which document, e.g. 'programs' '''
+    name = Column(String, primary_key=True)
+
+    # Columns
+    ''' SHA-256 of the document as canonical JSON '''
+    hash = Column(String, nullable=False)
+
 # endregion
 
 # region Programming
@@ -85,8 +100,7 @@ class OrmPriceOverride(Base):
 
     # Relationships
     ''' associated program record '''
-    program = relationship(
-        "OrmProgram", back_populates="overrides", cascade="all, delete")
+    program = relationship("OrmProgram", back_populates="overrides")
 
 
 class OrmSchedule(Base):
@@ -131,8 +145,7 @@ class OrmScheduleDay(Base):
 
     # Relationships
     ''' associated schedule record '''
-    schedule = relationship(
-        "OrmSchedule", back_populates="days", cascade="all, delete")
+    schedule = relationship("OrmSchedule", back_populates="days")
 
 
 class OrmScheduleTime(Base):
@@ -157,20 +170,24 @@ class OrmScheduleTime(Base):
 
     # Relationships
     ''' associated program record '''
-    program = relationship(
-        "OrmProgram", back_populates="times", cascade="all, delete")
+    program = relationship("OrmProgram", back_populates="times")
     ''' associated schedule record '''
-    schedule = relationship(
-        "OrmSchedule", back_populates="times", cascade="all, delete")
+    schedule = relationship("OrmSchedule", back_populates="times")
 
 
 # endregion
 
 # region State Capture
 
+# History tables are partitioned by month of their time, see
+# OrmManagementService for how partitions are created and retired.  Values
+# are kept as 4 byte REALs, which hold the few significant digits a sensor
+# or price has, and flags are packed into small integers
+
 
 class OrmGriddyUpdate(Base):
     __tablename__ = 'griddy_update'
+    __table_args__ = {'postgresql_partition_by': 'RANGE (time)'}
 
     # Primary Key
     ''' Time of the event '''
@@ -179,12 +196,13 @@ class OrmGriddyUpdate(Base):
 
     # Columns
     ''' Current price '''
-    price = Column(Float)
+    price = Column(REAL)
 
 
 class OrmSensorReading(Base):
     ''' All sensor readings at a specific date/time '''
     __tablename__ = 'sensor_reading'
+    __table_args__ = {'postgresql_partition_by': 'RANGE (time)'}
 
     # Primary Key
     ''' Time of the reading '''
@@ -193,15 +211,24 @@ class OrmSensorReading(Base):
 
     # Columns
     ''' Temperature in degF '''
-    temperature = Column(Float)
+    temperature = Column(REAL)
     ''' Pressure in hPa(100 Pascals) '''
-    pressure = Column(Float)
+    pressure = Column(REAL)
     ''' Humidity in relative percentage 0-99 '''
-    humidity = Column(Float)
+    humidity = Column(REAL)
 
 
 class OrmThermostatState(Base):
-    __tablename__ = 'thermostat_state'
+    ''' What the HVAC was doing from a specific date/time on.  Queries
+    wanting separate fan, cooling and heating columns can use the
+    thermostat_state view '''
+    __tablename__ = 'hvac_state'
+    __table_args__ = {'postgresql_partition_by': 'RANGE (time)'}
+
+    # Bits of the state column
+    FAN = 0x01
+    COOLING = 0x02
+    HEATING = 0x04
 
     # Primary Key
     ''' Time of the event '''
@@ -209,13 +236,13 @@ class OrmThermostatState(Base):
         DateTime(timezone=True), primary_key=True, default=func.now())
 
     # Columns
-    fan = Column(Integer)
-    cooling = Column(Integer)
-    heating = Column(Integer)
+    ''' FAN, COOLING and HEATING bits of whatever was running '''
+    state = Column(SmallInteger, nullable=False)
 
 
 class OrmThermostatTargets(Base):
     __tablename__ = 'thermostat_targets'
+    __table_args__ = {'postgresql_partition_by': 'RANGE (time)'}
 
     # Primary Key
     ''' Time of the event '''
@@ -223,10 +250,95 @@ class OrmThermostatTargets(Base):
         DateTime(timezone=True), primary_key=True, default=func.now())
 
     # Columns
-    mode = Column(Integer)
     ''' Minimum temperature before heat is engaged '''
-    comfort_min = Column(Float)
+    comfort_min = Column(REAL)
     ''' Maximum temperature before air conditioning is engaged '''
-    comfort_max = Column(Float)
+    comfort_max = Column(REAL)
+    ''' Mode code, see OrmStateCaptureService.MODE_CODES.  Last, so the
+    REALs before it need no alignment padding '''
+    mode = Column(SmallInteger)
+
+# endregion
+
+# region Rollups
+
+
+class OrmSensorRollup(Base):
+    ''' Sensor readings summarized over a bucket of time '''
+    __tablename__ = 'sensor_rollup'
+
+    # Primary Key
+    ''' Length of the bucket in seconds, 60, 900 or 3600 '''
+    resolution = Column(Integer, primary_key=True)
+    ''' Start of the bucket '''
+    time = Column(DateTime(timezone=True), primary_key=True)
+
+    # Columns
+    ''' Number of readings in the bucket '''
+    samples = Column(Integer, nullable=False)
+    temperature_min = Column(REAL)
+    temperature_max = Column(REAL)
+    temperature_avg = Column(REAL)
+    humidity_min = Column(REAL)
+    humidity_max = Column(REAL)
+    humidity_avg = Column(REAL)
+
+
+class OrmPriceRollup(Base):
+    ''' Power prices summarized over a bucket of time '''
+    __tablename__ = 'price_rollup'
+
+    # Primary Key
+    ''' Length of the bucket in seconds, 60, 900 or 3600 '''
+    resolution = Column(Integer, primary_key=True)
+    ''' Start of the bucket '''
+    time = Column(DateTime(timezone=True), primary_key=True)
+
+    # Columns
+    ''' Number of prices in the bucket '''
+    samples = Column(Integer, nullable=False)
+    ''' First, highest, lowest and last price in the bucket '''
+    open = Column(REAL)
+    high = Column(REAL)
+    low = Column(REAL)
+    close = Column(REAL)
+    average = Column(REAL)
+    ''' Times of the first and last price, for merging partial buckets '''
+    open_time = Column(DateTime(timezone=True))
+    close_time = Column(DateTime(timezone=True))
+
+
+class OrmDutyCycleRollup(Base):
+    ''' Seconds the HVAC spent in each state over a bucket of time.  Buckets
+    where everything was off have no row '''
+    __tablename__ = 'duty_cycle_rollup'
+
+    # Primary Key
+    ''' Length of the bucket in seconds, 60, 900 or 3600 '''
+    resolution = Column(Integer, primary_key=True)
+    ''' Start of the bucket '''
+    time = Column(DateTime(timezone=True), primary_key=True)
+
+    # Columns
+    cooling = Column(REAL, nullable=False)
+    heating = Column(REAL, nullable=False)
+    fan = Column(REAL, nullable=False)
+
+# endregion
+
+# region Views
+
+
+# Views over the compact tables giving the columns of earlier schemas, which
+# the Grafana dashboards and ad hoc queries are written against.  Created
+# along with the tables
+VIEWS = {
+    'thermostat_state':
+        f"SELECT time, "
+        f"(state & {OrmThermostatState.FAN} > 0)::integer AS fan, "
+        f"(state & {OrmThermostatState.COOLING} > 0)::integer AS cooling, "
+        f"(state & {OrmThermostatState.HEATING} > 0)::integer AS heating "
+        f"FROM {OrmThermostatState.__tablename__}",
+}
 
 # endregion
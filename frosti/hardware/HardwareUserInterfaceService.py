@@ -24,10 +24,11 @@ class HardwareUserInterfaceService(BaseUserInterfaceService):
         epdconfig.gpio_setup(rstPin=scrnRstPin, dcPin=scrnDcPin,
                              csPin=scrnCsPin, busyPin=scrnBusyPin)
         self._epd = EPD(epdconfig)
-        self._epd.init(self._epd.lut_partial_update)
-        self._epd.Clear(0xFF)
-        self._epd.Clear(0x00)
+        # One clear with the full update waveform removes any ghosting the
+        # same as alternating white/black/white clears with the partial one
+        self._epd.init(self._epd.lut_full_update)
         self._epd.Clear(0xFF)
+        self._epd.init(self._epd.lut_partial_update)
 
         self._ledRingDriver = LedRingDriver(enable=True)
         # self._ledRingDriver.setup(enable=False)
@@ -117,13 +118,20 @@ class HardwareUserInterfaceService(BaseUserInterfaceService):
 
     def _buttonPressHandler(self, channel: int):
         # This happens on the GPIO interrupt thread, so to isolate threads,
-        # we keep this local and safeInvoke() the actual base class
-        # buttonPressed method call
+        # we keep this local and queue the actual base class buttonPressed
+        # method call without waiting around for the main loop to run it
         sleep(0.025)
         if not GPIO.input(channel):
             button = self._buttonMap.get(channel)
             if button is not None:
-                self._eventBus.safeInvoke(self.buttonPressed, button)
+                future = self._eventBus.safeInvokeAsync(
+                    self.buttonPressed, button)
+                future.add_done_callback(self._buttonPressDone)
+
+    def _buttonPressDone(self, future):
+        if future.exception() is not None:
+            log.warning(
+                f"Button press handling failed: {future.exception()}")
 
     def _updateDisplayBuf(self, bbox):
         (x1, y1, x2, y2) = bbox
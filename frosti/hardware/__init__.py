@@ -8,13 +8,6 @@ from frosti.core import ThermostatState, ServiceProvider
 from frosti.services import \
     RelayManagementService, UserInterfaceService, EnvironmentSamplingService
 
-from .Bme280EnvironmentSamplingService \
-    import Bme280EnvironmentSamplingService
-from .PanasonicAgqRelayManagementService \
-    import PanasonicAgqRelayManagementService
-from .HardwareUserInterfaceService \
-    import HardwareUserInterfaceService
-
 
 # class RelayManagementService(PanasonicAgqRelayManagementService):
 
@@ -35,16 +28,27 @@ from .HardwareUserInterfaceService \
 #         )
 
 
-def hardware_init(serviceProvider: ServiceProvider, hardwareName: str):
+def hardware_factories(hardwareName: str):
+    """ Returns, for the given hardware, a function building each service
+    it provides keyed by the service type, in the order they should be
+    installed.  Building a service only opens its hardware; it still needs
+    setServiceProvider() and installing.  Each driver module is imported
+    by its own function, so only the drivers in use are ever loaded """
 
     if hardwareName == 'v5':
-        service = PanasonicAgqRelayManagementService()
-        service._configState(ThermostatState.FAN, 12, 26, 16)
-        service._configState(ThermostatState.HEATING, 6, 13, 21)
-        service._configState(ThermostatState.COOLING, 5, 19, 20)
+        def createRelayManagementService():
+            from .PanasonicAgqRelayManagementService \
+                import PanasonicAgqRelayManagementService
 
-        service.setServiceProvider(serviceProvider)
-        serviceProvider.installService(RelayManagementService, service)
+            service = PanasonicAgqRelayManagementService()
+            service._configState(ThermostatState.FAN, 12, 26, 16)
+            service._configState(ThermostatState.HEATING, 6, 13, 21)
+            service._configState(ThermostatState.COOLING, 5, 19, 20)
+            return service
+
+        return {
+            RelayManagementService: createRelayManagementService,
+        }
 
         # service = Bme280EnvironmentSamplingService()
         # service.setServiceProvider(self)
@@ -56,12 +60,15 @@ def hardware_init(serviceProvider: ServiceProvider, hardwareName: str):
         # service.setServiceProvider(self)
         # self.installService(UserInterfaceService, service)
     elif hardwareName == 'v6':
-        service = PanasonicAgqRelayManagementService()
-        service._configState(ThermostatState.FAN, 25, 14, 22)
-        service._configState(ThermostatState.HEATING, 23, 18, 17)
-        service._configState(ThermostatState.COOLING, 24, 15, 27)
-        service.setServiceProvider(serviceProvider)
-        serviceProvider.installService(RelayManagementService, service)
+        def createRelayManagementService():
+            from .PanasonicAgqRelayManagementService \
+                import PanasonicAgqRelayManagementService
+
+            service = PanasonicAgqRelayManagementService()
+            service._configState(ThermostatState.FAN, 25, 14, 22)
+            service._configState(ThermostatState.HEATING, 23, 18, 17)
+            service._configState(ThermostatState.COOLING, 24, 15, 27)
+            return service
 
         # from time import sleep
         # print("Relays should all be closed, start testing!!")
@@ -81,18 +88,37 @@ def hardware_init(serviceProvider: ServiceProvider, hardwareName: str):
         #             print(f"STATE {service.isRelayOpen(state)}")
         #         sleep(2)
 
-        service = Bme280EnvironmentSamplingService()
-        service.setServiceProvider(serviceProvider)
-        serviceProvider.installService(EnvironmentSamplingService, service)
-
-        service = HardwareUserInterfaceService(
-            scrnRstPin=20, scrnDcPin=21, scrnCsPin=12, scrnBusyPin=16,
-            btnUpPin=13, btnDownPin=1, btnEnterPin=26
-            # btnUpPin=13, btnDownPin=19, btnEnterPin=26
-            # btnUpPin=8, btnDownPin=1, btnEnterPin=7
-        )
-        service.setServiceProvider(serviceProvider)
-        serviceProvider.installService(UserInterfaceService, service)
+        def createEnvironmentSamplingService():
+            from .Bme280EnvironmentSamplingService \
+                import Bme280EnvironmentSamplingService
+
+            return Bme280EnvironmentSamplingService()
+
+        def createUserInterfaceService():
+            from .HardwareUserInterfaceService \
+                import HardwareUserInterfaceService
+
+            return HardwareUserInterfaceService(
+                scrnRstPin=20, scrnDcPin=21, scrnCsPin=12, scrnBusyPin=16,
+                btnUpPin=13, btnDownPin=1, btnEnterPin=26
+                # btnUpPin=13, btnDownPin=19, btnEnterPin=26
+                # btnUpPin=8, btnDownPin=1, btnEnterPin=7
+            )
+
+        return {
+            RelayManagementService: createRelayManagementService,
+            EnvironmentSamplingService: createEnvironmentSamplingService,
+            UserInterfaceService: createUserInterfaceService,
+        }
     else:
         raise RuntimeError(
             f'Hardware option {hardwareName} not supported')
+
+
+def hardware_init(serviceProvider: ServiceProvider, hardwareName: str):
+    """ Builds and installs every service the given hardware provides, one
+    after the other """
+    for serviceType, factory in hardware_factories(hardwareName).items():
+        service = factory()
+        service.setServiceProvider(serviceProvider)
+        serviceProvider.installService(serviceType, service)
@@ -1,25 +1,30 @@
-from flask import Flask, Response, request, abort, send_file
-from flask_restx import Resource, Api, fields
-from flask_cors import CORS
 from functools import wraps
+from concurrent.futures import TimeoutError
 from threading import Thread
 from random import getrandbits
-import uuid
+from hashlib import sha256
 import json
 from io import BytesIO
+from sqlalchemy.orm import selectinload
 
 from .ThermostatService import ThermostatService
-from .OrmManagementService import OrmManagementService
+from .OrmManagementService import OrmManagementService, INTERNAL_CONFIG
+from .OrmStateCaptureService import OrmStateCaptureService
 from frosti.logging import log, handleException
 from frosti.core import ServiceProvider, ServiceConsumer, EventBus, \
-    ThermostatState
-from frosti.core.events import ThermostatStateChangedEvent, SensorDataChangedEvent
-from frosti.core.orm import OrmConfig, OrmProgram, OrmSchedule, \
-    OrmPriceOverride, OrmScheduleDay, OrmScheduleTime
+    ThermostatState, ServiceStartup
+from frosti.core.events import ThermostatStateChangedEvent, \
+    SensorDataChangedEvent, ConfigChangedEvent, ScheduleChangedEvent
+from frosti.core.orm import OrmConfig, OrmContentHash, OrmProgram, \
+    OrmSchedule, OrmPriceOverride, OrmScheduleDay, OrmScheduleTime
 from frosti.services.UserInterfaceService import UserInterfaceService
 
 VALID_API_KEYS = list()
 
+# Seconds an API request waits for the main loop to pick it up before
+# giving up and answering 503
+API_INVOKE_DEADLINE = 5.0
+
 # FLASK_APP = Flask(__name__, static_url_path='')
 # FLASK_RESTX_API = Api(FLASK_APP)
 # FLASK_RESTX_NS = FLASK_RESTX_API.namespace(
@@ -37,6 +42,8 @@ def require_appkey(method):
     """ Decorator for identifying an API method that requets a key """
     @wraps(method)
     def decoratedMethod(*args, **kwargs):
+        from flask import request, abort
+
         if request.args.get('key', 'none') in VALID_API_KEYS:
             return method(*args, **kwargs)
         abort(401)
@@ -71,61 +78,21 @@ class ApiDataBrokerService(ServiceConsumer):
     """
 
     def __init__(self):
-        self.__flaskApp = Flask(__name__, static_url_path='')
-        self.__flaskApp.add_url_rule(
-            '/api/v1/status', view_func=self.__apiStatus, methods=['GET'])
-
-        self.__flaskApp.add_url_rule(
-            '/api/v1/config', view_func=self.__apiConfig,
-            methods=['GET', 'POST', 'PUT', 'PATCH', 'DELETE'])
-        self.__flaskApp.add_url_rule(
-            '/api/v1/config/<name>', view_func=self.__apiConfig,
-            methods=['GET', 'PUT', 'PATCH', 'DELETE'])
-        self.__flaskApp.add_url_rule(
-            '/api/v1/programs', view_func=self.__apiPrograms,
-            methods=['GET', 'POST', 'PUT', 'PATCH', 'DELETE'])
-        self.__flaskApp.add_url_rule(
-            '/api/v1/programs/<name>', view_func=self.__apiPrograms,
-            methods=['GET', 'PUT', 'PATCH', 'DELETE'])
-        self.__flaskApp.add_url_rule(
-            '/api/v1/schedules', view_func=self.__apiSchedules,
-            methods=['GET', 'POST', 'PUT', 'PATCH', 'DELETE'])
-        self.__flaskApp.add_url_rule(
-            '/api/v1/schedules/<name>', view_func=self.__apiSchedules,
-            methods=['GET', 'PUT', 'PATCH', 'DELETE'])
-        self.__flaskApp.add_url_rule(
-            '/api/v1/actions', view_func=self.__apiActions,
-            methods=['GET'])
-        self.__flaskApp.add_url_rule(
-            '/api/v1/actions/<name>', view_func=self.__apiActions,
-            methods=['POST'])
-        self.__flaskApp.add_url_rule(
-            '/api/v1/display', view_func=self.__apiCurrentDisplay,
-            methods=['GET'])
-
-        self.__flaskApp.add_url_rule(
-            '/api/v1/action/stop',
-            view_func=self.__apiActionStop, methods=['POST'])
-        self.__flaskApp.add_url_rule(
-            '/api/v1/action/nextMode',
-            view_func=self.__apiActionNextMode, methods=['POST'])
-        self.__flaskApp.add_url_rule(
-            '/api/v1/action/changeComfort',
-            view_func=self.__apiActionChangeComfort, methods=['POST'])
-
-        self.__cors = CORS(self.__flaskApp)
+        self.__lastState = ThermostatState.OFF
+        self.__lastSensorData = None
+        self.__sessionApiKey = f"{getrandbits(256):x}"
+        VALID_API_KEYS.append(self.__sessionApiKey)
 
+        # Flask is imported and the app built on its own thread, so web
+        # requests are served as soon as it is ready without holding up
+        # anything else
+        self.__flaskApp = None
         self.__flaskThread = Thread(
             target=self.__flaskEntryPoint,
             name='Flask Driver')
         self.__flaskThread.daemon = True
         self.__flaskThread.start()
 
-        self.__lastState = ThermostatState.OFF
-        self.__lastSensorData = None
-        self.__sessionApiKey = f"{getrandbits(256):x}"
-        VALID_API_KEYS.append(self.__sessionApiKey)
-
     def setServiceProvider(self, provider: ServiceProvider):
         super().setServiceProvider(provider)
 
@@ -170,33 +137,72 @@ class ApiDataBrokerService(ServiceConsumer):
     def getConfig(self):
         ormManagementService = self._getService(OrmManagementService)
 
-        results = ormManagementService.session.query(OrmConfig)
-        return {a.name: a.value for a in results}
+        return dict(ormManagementService.config)
+
+    def __upsertDocument(self, name: str, diffMethod, data: dict, patch):
+        """ Writes a document of programs, schedules or config by calling
+        diffMethod(data, patch), which changes only the rows that differ
+        from it, all in one transaction.  A whole document (not a patch)
+        that hashes the same as the last one written is skipped entirely.
+        Returns True if the document was written """
+        session = self._getService(OrmManagementService).session
+        digest = sha256(json.dumps(
+            data, sort_keys=True, default=str).encode()).hexdigest()
+        contentHash = session.query(OrmContentHash).get(name)
+        if not patch and contentHash is not None and \
+                contentHash.hash == digest:
+            return False
 
-    def __upsertEntities(
-            self, entityClass, updateMethod, data: dict, patch: bool):
-        ormManagementService = self._getService(OrmManagementService)
-
-        if not patch:
-            ormManagementService.session.query(entityClass).delete()
-        results = ormManagementService.session.query(entityClass) \
-            .filter(entityClass.name.in_(data.keys()))
-        for entity in results:
-            updateMethod(entity, entity.name, data[entity.name])
-            data.pop(entity.name)
+        try:
+            diffMethod(data, patch)
+
+            # A patch leaves the stored state matching no whole document
+            if patch:
+                if contentHash is not None:
+                    session.delete(contentHash)
+            else:
+                if contentHash is None:
+                    contentHash = OrmContentHash(name=name)
+                    session.add(contentHash)
+                contentHash.hash = digest
+            session.commit()
+        except:
+            session.rollback()
+            raise
+        return True
+
+    def __diffConfig(self, data: dict, patch: bool):
+        session = self._getService(OrmManagementService).session
+        stored = {
+            entry.name: entry for entry in session.query(OrmConfig)
+            if entry.name not in INTERNAL_CONFIG}
         for name, value in data.items():
-            entity = entityClass()
-            updateMethod(entity, name, value)
-            ormManagementService.session.add(entity)
-
-        ormManagementService.session.commit()
+            entry = stored.pop(name, None)
+            if entry is None:
+                entry = OrmConfig(name=name)
+                session.add(entry)
+            if entry.value != str(value):
+                entry.value = str(value)
+        if not patch:
+            for entry in stored.values():
+                session.delete(entry)
 
     def setConfig(self, data: dict, patch: bool = False):
-        def updateOrmConfig(ormConfig: OrmConfig, name: str, update: dict):
-            ormConfig.name = name
-            ormConfig.value = data[name]
-
-        self.__upsertEntities(OrmConfig, updateOrmConfig, data, patch)
+        """ Writes config.  Internal config such as db.version is left out,
+        so it neither changes the hash nor is removed by a whole document
+        lacking it """
+        data = {
+            name: value for name, value in data.items()
+            if name not in INTERNAL_CONFIG}
+        if not self.__upsertDocument('config', self.__diffConfig, data, patch):
+            return
+
+        # Refresh the cached config and let services apply what changed
+        ormManagementService = self._getService(OrmManagementService)
+        changed = ormManagementService.reloadConfig()
+        if changed:
+            eventBus = self._getService(EventBus)
+            eventBus.fireEvent(ConfigChangedEvent(changed))
 
     def getPrograms(self):
         ormManagementService = self._getService(OrmManagementService)
@@ -210,28 +216,44 @@ class ApiDataBrokerService(ServiceConsumer):
                 'price': override.price,
                 'comfortMin': override.comfort_min,
                 'comfortMax': override.comfort_max,
-            } for override in program.overrides)
+            } for override in sorted(
+                program.overrides, key=lambda override: override.price))
         } for program in results}
 
-    def setPrograms(self, data: dict, patch: bool = False):
-        ormManagementService = self._getService(OrmManagementService)
+    def __diffPrograms(self, data: dict, patch: bool):
+        """ Matches programs by name and their overrides by price, so
+        programs keep their GUIDs and only what differs is written """
+        session = self._getService(OrmManagementService).session
+        stored = {
+            program.name: program for program in session.query(OrmProgram)
+            .options(selectinload(OrmProgram.overrides))}
+        for name, update in data.items():
+            program = stored.pop(name, None)
+            if program is None:
+                program = OrmProgram(name=name)
+                session.add(program)
+            program.comfort_min = update.get('comfortMin')
+            program.comfort_max = update.get('comfortMax')
+
+            overrides = {
+                override.price: override for override in program.overrides}
+            for overrideUpdate in update.get('priceOverrides', list()):
+                override = overrides.pop(overrideUpdate['price'], None)
+                if override is None:
+                    override = OrmPriceOverride(price=overrideUpdate['price'])
+                    program.overrides.append(override)
+                override.comfort_min = overrideUpdate.get('comfortMin')
+                override.comfort_max = overrideUpdate.get('comfortMax')
+            for override in overrides.values():
+                session.delete(override)
+        if not patch:
+            for program in stored.values():
+                session.delete(program)
 
-        def updateOrmProgram(ormProgram: OrmProgram, name: str, update: dict):
-            ormProgram.name = name
-            ormProgram.guid = uuid.uuid4()
-            ormProgram.comfort_min = update.get('comfortMin')
-            ormProgram.comfort_max = update.get('comfortMax')
-            for child in ormProgram.overrides:
-                ormManagementService.session.delete(child)
-            for override in update.get('priceOverrides', list()):
-                ormPriceOverride = OrmPriceOverride()
-                ormPriceOverride.program_guid = ormProgram.guid
-                ormPriceOverride.price = override['price']
-                ormPriceOverride.comfort_min = override.get('comfortMin')
-                ormPriceOverride.comfort_max = override.get('comfortMax')
-                ormManagementService.session.add(ormPriceOverride)
-
-        self.__upsertEntities(OrmProgram, updateOrmProgram, data, patch)
+    def setPrograms(self, data: dict, patch: bool = False):
+        if self.__upsertDocument(
+                'programs', self.__diffPrograms, data, patch):
+            self._getService(EventBus).fireEvent(ScheduleChangedEvent())
 
     def getSchedules(self):
         ormManagementService = self._getService(OrmManagementService)
@@ -239,44 +261,69 @@ class ApiDataBrokerService(ServiceConsumer):
         results = ormManagementService.session.query(OrmSchedule)
         return {schedule.name: {
             'guid': str(schedule.guid),
-            'days': list(day.day for day in schedule.days),
+            'days': sorted(day.day for day in schedule.days),
             'times': list({
                 'hour': time.hour,
                 'minute': time.minute,
                 'program': time.program.name,
-            } for time in schedule.times)
+            } for time in sorted(
+                schedule.times, key=lambda time: (time.hour, time.minute)))
         } for schedule in results}
 
-    def setSchedules(self, data: dict, patch: bool = False):
-        ormManagementService = self._getService(OrmManagementService)
+    def __diffSchedules(self, data: dict, patch: bool):
+        """ Matches schedules by name and their times by hour and minute,
+        so schedules keep their GUIDs and only what differs is written.
+        Days belong to one schedule at a time and are moved rather than
+        deleted and added again """
+        session = self._getService(OrmManagementService).session
+        programs = {
+            program.name: program
+            for program in session.query(OrmProgram)}
+        stored = {
+            schedule.name: schedule for schedule in session.query(OrmSchedule)
+            .options(selectinload(OrmSchedule.days),
+                     selectinload(OrmSchedule.times))}
+        days = {day.day: day for day in session.query(OrmScheduleDay)}
+
+        for name, update in data.items():
+            schedule = stored.pop(name, None)
+            if schedule is None:
+                schedule = OrmSchedule(name=name)
+                session.add(schedule)
+
+            dayNumbers = set(update.get('days', list()))
+            for day in list(schedule.days):
+                if day.day not in dayNumbers:
+                    session.delete(day)
+                    days.pop(day.day)
+            for dayNumber in dayNumbers:
+                day = days.get(dayNumber)
+                if day is None:
+                    day = days[dayNumber] = OrmScheduleDay(day=dayNumber)
+                if day.schedule is not schedule:
+                    day.schedule = schedule
+
+            times = {(time.hour, time.minute): time for time in schedule.times}
+            for timeUpdate in update.get('times', list()):
+                key = (timeUpdate['hour'], timeUpdate['minute'])
+                time = times.pop(key, None)
+                if time is None:
+                    time = OrmScheduleTime(hour=key[0], minute=key[1])
+                    schedule.times.append(time)
+                program = programs[timeUpdate['program']]
+                if time.program is not program:
+                    time.program = program
+            for time in times.values():
+                session.delete(time)
 
-        def updateOrmSchedule(
-                ormSchedule: OrmSchedule, name: str, update: dict):
-            programNameMap = {
-                a.name: a.guid for a in
-                ormManagementService.session.query(OrmProgram)}
-
-            ormSchedule.name = name
-            ormSchedule.guid = uuid.uuid4()
-            for child in ormSchedule.days:
-                ormManagementService.session.delete(child)
-            for child in ormSchedule.times:
-                ormManagementService.session.delete(child)
-            for day in update.get('days', list()):
-                ormScheduleDay = OrmScheduleDay()
-                ormScheduleDay.schedule_guid = ormSchedule.guid
-                ormScheduleDay.day = day
-                ormManagementService.session.add(ormScheduleDay)
-            for time in update.get('times', list()):
-                ormScheduleTime = OrmScheduleTime()
-                ormScheduleTime.schedule_guid = ormSchedule.guid
-                ormScheduleTime.program_guid = \
-                    programNameMap[time['program']]
-                ormScheduleTime.hour = time['hour']
-                ormScheduleTime.minute = time['minute']
-                ormManagementService.session.add(ormScheduleTime)
-
-        self.__upsertEntities(OrmSchedule, updateOrmSchedule, data, patch)
+        if not patch:
+            for schedule in stored.values():
+                session.delete(schedule)
+
+    def setSchedules(self, data: dict, patch: bool = False):
+        if self.__upsertDocument(
+                'schedules', self.__diffSchedules, data, patch):
+            self._getService(EventBus).fireEvent(ScheduleChangedEvent())
 
     def modifyComfortSettings(self, offset: int = 0, value: int = -1):
         thermostatService = self._getService(ThermostatService)
@@ -287,16 +334,46 @@ class ApiDataBrokerService(ServiceConsumer):
         thermostatService.nextMode()
 
     def __apiResponse(self, data, status=200):
+        from flask import Response
+
         mimeType = 'application/json'
         jsonText = json.dumps(data, indent=4)
         response = Response(jsonText, status=status, mimetype=mimeType)
         return response
 
     def __apiStatus(self):
-        data = self.__eventBus.safeInvoke(self.getStatus)
+        data = self.__safeInvoke(self.getStatus)
         return self.__apiResponse(data)
 
+    def __safeInvoke(self, methodCall, *args, **kwargs):
+        """ Runs the method call on the main loop for a web request,
+        raising TimeoutError if the loop is too busy to get to it in time """
+        return self.__eventBus.safeInvoke(
+            methodCall, *args, deadline=API_INVOKE_DEADLINE, **kwargs)
+
+    def __apiTimeout(self, error: TimeoutError):
+        log.warning(f"API request timed out: {error}")
+        response = {'ErrorText': 'Thermostat is busy, try again shortly'}
+        return self.__apiResponse(response, 503)
+
+    def __apiEventBusMetrics(self):
+        # Read straight from this thread so polling the metrics doesn't
+        # itself wake the main loop
+        return self.__apiResponse(self.__eventBus.metrics)
+
+    def __apiBootMetrics(self):
+        # The report is complete before the main loop starts and never
+        # changes after, so this too reads it from this thread
+        startup = self._getService(ServiceStartup)
+        return self.__apiResponse(startup.report)
+
+    def __apiCaptureMetrics(self):
+        ormStateCaptureService = self._getService(OrmStateCaptureService)
+        return self.__apiResponse(ormStateCaptureService.metrics)
+
     def __apiCurrentDisplay(self):
+        from flask import send_file
+
         userInterfaceService = self._getService(UserInterfaceService)
         img_io = BytesIO()
         userInterfaceService.image.save(img_io, 'JPEG', quality=70)
@@ -307,8 +384,10 @@ class ApiDataBrokerService(ServiceConsumer):
         """ If name is not null, use it as the dictionary key value,
         otherwise assume the request is the contents of the entire config
         """
+        from flask import request
+
         if 'GET' == request.method:
-            data = self.__eventBus.safeInvoke(getMethod)
+            data = self.__safeInvoke(getMethod)
             if name is None:
                 return self.__apiResponse(data)
             if name not in data:
@@ -323,21 +402,21 @@ class ApiDataBrokerService(ServiceConsumer):
                 response = {'ErrorText': 'POST not supported for named entity'}
                 return self.__apiResponse(response, 400)
             dataMap = {data['name']: data}
-            self.__eventBus.safeInvoke(setMethod, dataMap, patch=True)
+            self.__safeInvoke(setMethod, dataMap, patch=True)
             return self.__apiResponse(data)
 
         if 'PUT' == request.method:
             data = request.get_json()
             if name is not None:
                 data = {name: data}
-            self.__eventBus.safeInvoke(setMethod, data)
+            self.__safeInvoke(setMethod, data)
             return self.__apiResponse(data)
 
         if 'PATCH' == request.method:
             data = request.get_json()
             if name is not None:
                 data = {name: data}
-            self.__eventBus.safeInvoke(setMethod, data, patch=True)
+            self.__safeInvoke(setMethod, data, patch=True)
             return self.__apiResponse(data)
 
         if 'DELETE' == request.method:
@@ -345,7 +424,7 @@ class ApiDataBrokerService(ServiceConsumer):
             if name is None:
                 response = {'ErrorText': 'A name must be provided'}
                 return self.__apiResponse(response, 400)
-            self.__eventBus.safeInvoke(setMethod, data)
+            self.__safeInvoke(setMethod, data)
             return self.__apiResponse(data)
 
     def __apiConfig(self, name: str = None):
@@ -361,6 +440,8 @@ class ApiDataBrokerService(ServiceConsumer):
             name, self.getSchedules, self.setSchedules)
 
     def __apiActions(self, name: str = None):
+        from flask import request
+
         actions = ['nextMode', 'changeComfort']
 
         if 'GET' == request.method:
@@ -370,35 +451,99 @@ class ApiDataBrokerService(ServiceConsumer):
             if name not in actions:
                 return self.__apiResponse("Unsupport action", 400)
             if 'nextMode' == name:
-                self.__eventBus.safeInvoke(self.nextMode)
+                self.__safeInvoke(self.nextMode)
             elif 'changeComfort' == name:
                 offset = float(request.args.get('offset', 0.0))
                 value = float(request.args.get('value', -1.0))
-                self.__eventBus.safeInvoke(
+                self.__safeInvoke(
                     self.modifyComfortSettings, offset=offset, value=value)
             return self.__apiStatus()
 
     def __apiActionNextMode(self):
-        self.__eventBus.safeInvoke(self.nextMode)
+        self.__safeInvoke(self.nextMode)
         return self.__apiStatus()
 
     def __apiActionChangeComfort(self):
+        from flask import request
+
         offset = float(request.args.get('offset', 0.0))
         value = float(request.args.get('value', -1.0))
-        self.__eventBus.safeInvoke(
+        self.__safeInvoke(
             self.modifyComfortSettings, offset=offset, value=value)
         return self.__apiStatus()
 
     @ require_appkey
     def __apiActionStop(self):
         VALID_API_KEYS.remove(self.__sessionApiKey)
-        data = self.__eventBus.safeInvoke(self.getStatus)
+        data = self.__safeInvoke(self.getStatus)
         response = self.__apiResponse(data)
         self.__eventBus.stop()
         return response
 
+    def __createFlaskApp(self):
+        from flask import Flask
+        from flask_cors import CORS
+
+        flaskApp = Flask(__name__, static_url_path='')
+        flaskApp.add_url_rule(
+            '/api/v1/status', view_func=self.__apiStatus, methods=['GET'])
+
+        flaskApp.add_url_rule(
+            '/api/v1/config', view_func=self.__apiConfig,
+            methods=['GET', 'POST', 'PUT', 'PATCH', 'DELETE'])
+        flaskApp.add_url_rule(
+            '/api/v1/config/<name>', view_func=self.__apiConfig,
+            methods=['GET', 'PUT', 'PATCH', 'DELETE'])
+        flaskApp.add_url_rule(
+            '/api/v1/programs', view_func=self.__apiPrograms,
+            methods=['GET', 'POST', 'PUT', 'PATCH', 'DELETE'])
+        flaskApp.add_url_rule(
+            '/api/v1/programs/<name>', view_func=self.__apiPrograms,
+            methods=['GET', 'PUT', 'PATCH', 'DELETE'])
+        flaskApp.add_url_rule(
+            '/api/v1/schedules', view_func=self.__apiSchedules,
+            methods=['GET', 'POST', 'PUT', 'PATCH', 'DELETE'])
+        flaskApp.add_url_rule(
+            '/api/v1/schedules/<name>', view_func=self.__apiSchedules,
+            methods=['GET', 'PUT', 'PATCH', 'DELETE'])
+        flaskApp.add_url_rule(
+            '/api/v1/actions', view_func=self.__apiActions,
+            methods=['GET'])
+        flaskApp.add_url_rule(
+            '/api/v1/actions/<name>', view_func=self.__apiActions,
+            methods=['POST'])
+        flaskApp.add_url_rule(
+            '/api/v1/display', view_func=self.__apiCurrentDisplay,
+            methods=['GET'])
+        flaskApp.add_url_rule(
+            '/api/v1/metrics/eventbus', view_func=self.__apiEventBusMetrics,
+            methods=['GET'])
+        flaskApp.add_url_rule(
+            '/api/v1/metrics/boot', view_func=self.__apiBootMetrics,
+            methods=['GET'])
+        flaskApp.add_url_rule(
+            '/api/v1/metrics/capture', view_func=self.__apiCaptureMetrics,
+            methods=['GET'])
+
+        flaskApp.add_url_rule(
+            '/api/v1/action/stop',
+            view_func=self.__apiActionStop, methods=['POST'])
+        flaskApp.add_url_rule(
+            '/api/v1/action/nextMode',
+            view_func=self.__apiActionNextMode, methods=['POST'])
+        flaskApp.add_url_rule(
+            '/api/v1/action/changeComfort',
+            view_func=self.__apiActionChangeComfort, methods=['POST'])
+
+        flaskApp.register_error_handler(
+            TimeoutError, self.__apiTimeout)
+
+        CORS(flaskApp)
+        return flaskApp
+
     def __flaskEntryPoint(self):
         try:
+            self.__flaskApp = self.__createFlaskApp()
             self.__flaskApp.run("0.0.0.0", 5000)
             log.error("Somehow we exited the Flask thread")
         except:
@@ -1,9 +1,3 @@
-import dash
-import dash_core_components as dcc
-import dash_html_components as html
-import dash_bootstrap_components as dbc
-from dash.dependencies import Input, Output
-
 from threading import Thread
 
 from frosti.logging import log, handleException
@@ -13,6 +7,29 @@ from frosti.core import ServiceProvider, ServiceConsumer, EventBus
 class DashApplicationService(ServiceConsumer):
 
     def __init__(self):
+        # Dash is imported and the app built on its own thread, as nothing
+        # else depends on it and it is slow to load
+        self._app = None
+        self._server = None
+
+        self.__dashThread = Thread(
+            target=self.__dashEntryPoint,
+            name='Dash Driver')
+        self.__dashThread.daemon = True
+        self.__dashThread.start()
+
+    def setServiceProvider(self, provider: ServiceProvider):
+        super().setServiceProvider(provider)
+
+        self.__eventBus = self._getService(EventBus)
+
+    def __createDashApp(self):
+        import dash
+        import dash_core_components as dcc
+        import dash_html_components as html
+        import dash_bootstrap_components as dbc
+        from dash.dependencies import Input, Output
+
         self._app = dash.Dash(
             __name__,
             external_stylesheets=[dbc.themes.CERULEAN],
@@ -78,19 +95,9 @@ class DashApplicationService(ServiceConsumer):
             dbc.Container(id="page-content", className="pt-4"),
         ], style=dict(width='100%'))
 
-        self.__dashThread = Thread(
-            target=self.__dashEntryPoint,
-            name='Dash Driver')
-        self.__dashThread.daemon = True
-        self.__dashThread.start()
-
-    def setServiceProvider(self, provider: ServiceProvider):
-        super().setServiceProvider(provider)
-
-        self.__eventBus = self._getService(EventBus)
-
     def __dashEntryPoint(self):
         try:
+            self.__createDashApp()
             self._app.run_server("0.0.0.0", port=8050)
             log.error("Somehow we exited the Flask thread")
         except:
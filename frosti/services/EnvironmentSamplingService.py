@@ -1,35 +1,50 @@
 from .OrmManagementService import OrmManagementService
 from frosti.core import ServiceConsumer, ServiceProvider, EventBus
-from frosti.core.events import SensorDataChangedEvent, SettingsChangedEvent
+from frosti.core.events import SensorDataChangedEvent, \
+    SettingsChangedEvent, ConfigChangedEvent
 
 
 class EnvironmentSamplingService(ServiceConsumer):
     """ Holds a GenericEnvironmentSensor and at a specified frequency
     takes a sampling and fires a SensorDataChangedEvent """
 
+    # Calibration, required in the config until first loaded
+    __temperatureScale = None
+    __temperatureTranslate = None
+    __pressureScale = None
+    __pressureTranslate = None
+    __humidityScale = None
+    __humidityTranslate = None
+
     def setServiceProvider(self, provider: ServiceProvider):
         super().setServiceProvider(provider)
+        self.__loadCalibration()
+
+        eventBus = self._getService(EventBus)
+        eventBus.installEventHandler(
+            SettingsChangedEvent, self.__settingsChanged)
+        eventBus.installEventHandler(
+            ConfigChangedEvent, self.__configChanged)
+        self.__sampleSensorsInvoker = eventBus.installTimer(
+            frequency=5.0, handler=self.__sampleSensors)
+        self.__sampleSensors()
 
+    def __loadCalibration(self):
+        """ Reads the scale and translation for each sensor, keeping the
+        current ones if they have since been removed from the config """
         ormManagementService = self._getService(OrmManagementService)
         self.__temperatureScale = ormManagementService.getConfigFloat(
-            'environment.temperature.scale')
+            'environment.temperature.scale', self.__temperatureScale)
         self.__temperatureTranslate = ormManagementService.getConfigFloat(
-            'environment.temperature.translate')
+            'environment.temperature.translate', self.__temperatureTranslate)
         self.__pressureScale = ormManagementService.getConfigFloat(
-            'environment.pressure.scale')
+            'environment.pressure.scale', self.__pressureScale)
         self.__pressureTranslate = ormManagementService.getConfigFloat(
-            'environment.pressure.translate')
+            'environment.pressure.translate', self.__pressureTranslate)
         self.__humidityScale = ormManagementService.getConfigFloat(
-            'environment.humidity.scale')
+            'environment.humidity.scale', self.__humidityScale)
         self.__humidityTranslate = ormManagementService.getConfigFloat(
-            'environment.humidity.translate')
-
-        eventBus = self._getService(EventBus)
-        eventBus.installEventHandler(
-            SettingsChangedEvent, self.__settingsChanged)
-        self.__sampleSensorsInvoker = eventBus.installTimer(
-            frequency=5.0, handler=self.__sampleSensors)
-        self.__sampleSensors()
+            'environment.humidity.translate', self.__humidityTranslate)
 
     @property
     def temperature(self):
@@ -61,6 +76,11 @@ class EnvironmentSamplingService(ServiceConsumer):
         changing settings from causing the thermostat to change states """
         self.__sampleSensorsInvoker.reset()
 
+    def __configChanged(self, event: ConfigChangedEvent):
+        """ Applies new calibration from the next reading on """
+        if event.changed('environment.'):
+            self.__loadCalibration()
+
     def __sampleSensors(self):
         eventBus = self._getService(EventBus)
         eventBus.fireEvent(SensorDataChangedEvent(
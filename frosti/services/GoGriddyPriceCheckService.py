@@ -1,4 +1,3 @@
-import requests
 import json
 from threading import Thread
 
@@ -47,9 +46,12 @@ class GoGriddyPriceCheckService(ServiceConsumer):
                 self.__apiPostData['meterID'] != '' and \
                 self.__apiPostData['memberID'] != '' and \
                 self.__apiPostData['settlement_point'] != '':
+            # Fetch the first price right away rather than on the first
+            # timer, which then stands as the retry if the fetch hangs
             eventBus = self._getService(EventBus)
             self.__startUpdatePriceHandler = eventBus.installTimer(
-                5.0, handler=self.__startUpdatePrice, oneShot=True)
+                60.0, handler=self.__startUpdatePrice, oneShot=True)
+            self.__startUpdatePrice()
 
     def __startUpdatePrice(self):
         """ Kickoff a 2nd thread to get the actual power price """
@@ -58,6 +60,8 @@ class GoGriddyPriceCheckService(ServiceConsumer):
     def __updatePrice(self):
         """ Gets the current price info and fires a PowerPriceChangedEvent.
         Designed to be called on another thread to not block execution """
+        import requests
+
         eventBus = self._getService(EventBus)
 
         try:
@@ -1,16 +1,66 @@
+import csv
 from datetime import datetime
+from io import StringIO
+from os import path
+from time import perf_counter
+from sqlalchemy import case, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
 
 from .ThermostatService import ThermostatService
 from .OrmManagementService import OrmManagementService
 from frosti.core import ServiceProvider, ServiceConsumer, EventBus, \
-    ThermostatState, ThermostatMode
+    ThermostatState, ThermostatMode, LatencyHistogram, TelemetrySpool, \
+    HistoryRollup
 from frosti.core.events import ThermostatStateChangedEvent, \
-    SensorDataChangedEvent, PowerPriceChangedEvent, SettingsChangedEvent
+    SensorDataChangedEvent, PowerPriceChangedEvent, SettingsChangedEvent, \
+    ConfigChangedEvent
 from frosti.core.orm import OrmSensorReading, OrmThermostatState, \
-    OrmThermostatTargets, OrmGriddyUpdate
+    OrmThermostatTargets, OrmGriddyUpdate, OrmSensorRollup, OrmPriceRollup, \
+    OrmDutyCycleRollup, Base
+from frosti.logging import log, handleException
 
 
 class OrmStateCaptureService(ServiceConsumer):
+    """ Records thermostat state to the database.  Rows are built on the
+    main loop, stamped with the event bus time, and held in a write-behind
+    buffer shared by every table.  The buffer is handed to a dedicated
+    worker thread, with its own session, and bulk inserted in a single
+    transaction once it holds capture.batchSize rows or its oldest row is
+    capture.maxLossWindow seconds old, so a slow database never holds up
+    the main loop and no more than that window of history is ever only in
+    memory.
+
+    While the database is unreachable, batches go to a TelemetrySpool on
+    local disk instead.  Once a write succeeds again, the spool is copied
+    back into the database in bulk before the next batch.
+
+    Readings, prices and states also feed a HistoryRollup, drained into
+    each batch, so the 1 minute, 15 minute and hourly rollup tables are
+    kept current as data arrives.  Rollup rows are merged into whatever is
+    already stored for their bucket """
+    WORKER = 'OrmStateCaptureService'
+
+    # Defaults for the capture.batchSize, capture.maxLossWindow and
+    # capture.spoolDirectory config
+    BATCH_SIZE = 100
+    MAX_LOSS_WINDOW = 60.0
+    SPOOL_DIRECTORY = '~/.frosti/spool'
+
+    # Seconds after losing the database before trying it again, batches
+    # in between going straight to the spool
+    RETRY_INTERVAL = 30.0
+
+    # Rollup tables, in the order HistoryRollup.drain() returns their rows
+    ROLLUPS = (OrmSensorRollup, OrmPriceRollup, OrmDutyCycleRollup)
+
+    STATE_CODES = {
+        ThermostatState.OFF: 0x00,
+        ThermostatState.FAN: OrmThermostatState.FAN,
+        ThermostatState.COOLING: OrmThermostatState.COOLING,
+        ThermostatState.HEATING: OrmThermostatState.HEATING
+    }
+
     MODE_CODES = {
         ThermostatMode.OFF: 0x00,
         ThermostatMode.FAN: 0x01,
@@ -19,10 +69,49 @@ class OrmStateCaptureService(ServiceConsumer):
         ThermostatMode.AUTO: 0x07
     }
 
+    def __init__(self):
+        super().__init__()
+        self.__buffer = dict()
+        self.__bufferCount = 0
+        self.__batchCount = 0
+        self.__rowsWritten = 0
+        self.__rowsFailed = 0
+        self.__lastBatchRows = 0
+        self.__maxBatchRows = 0
+        self.__rowsSpooled = 0
+        self.__rowsReplayed = 0
+        self.__spoolBytes = 0
+        self.__retryAt = None
+        self.__flushLatency = LatencyHistogram()
+        self.__rollup = HistoryRollup()
+
     def setServiceProvider(self, provider: ServiceProvider):
         super().setServiceProvider(provider)
 
+        ormManagementService = self._getService(OrmManagementService)
+        self.__session = ormManagementService.createSession()
+        self.__batchSize = ormManagementService.getConfigInt(
+            'capture.batchSize', self.BATCH_SIZE)
+        self.__maxLossWindow = ormManagementService.getConfigFloat(
+            'capture.maxLossWindow', self.MAX_LOSS_WINDOW)
+
+        # Pick up anything spooled by an earlier run, to be replayed with
+        # the first batch.  Without a usable spool directory, batches that
+        # cannot be written are lost as before
+        spoolDirectory = ormManagementService.getConfigString(
+            'capture.spoolDirectory', self.SPOOL_DIRECTORY)
+        try:
+            self.__spool = TelemetrySpool(path.expanduser(spoolDirectory))
+            self.__spoolBytes = self.__spool.byteCount
+        except OSError:
+            self.__spool = None
+            handleException(f"opening telemetry spool {spoolDirectory}")
+
         eventBus = self._getService(EventBus)
+        self.__flushInvoker = eventBus.installTimer(
+            frequency=self.__maxLossWindow, handler=self.flush, oneShot=True)
+        self.__flushInvoker.disable()
+
         eventBus.installEventHandler(
             SensorDataChangedEvent, self.__sensorDataChanged)
         eventBus.installEventHandler(
@@ -31,50 +120,307 @@ class OrmStateCaptureService(ServiceConsumer):
             PowerPriceChangedEvent, self.__powerPriceChanged)
         eventBus.installEventHandler(
             SettingsChangedEvent, self.__processSettingsChanged)
+        eventBus.installEventHandler(
+            ConfigChangedEvent, self.__configChanged)
 
-    def __powerPriceChanged(self, event: PowerPriceChangedEvent):
-        ormManagementService = self._getService(OrmManagementService)
+    @property
+    def metrics(self):
+        """ Counters describing the batches written so far """
+        return {
+            'batchSize': self.__batchSize,
+            'maxLossWindow': self.__maxLossWindow,
+            'buffered': self.__bufferCount,
+            'batches': self.__batchCount,
+            'rowsWritten': self.__rowsWritten,
+            'rowsFailed': self.__rowsFailed,
+            'rowsSpooled': self.__rowsSpooled,
+            'rowsReplayed': self.__rowsReplayed,
+            'spoolBytes': self.__spoolBytes,
+            'databaseAvailable': self.__retryAt is None,
+            'batchRows': {
+                'last': self.__lastBatchRows,
+                'mean': (self.__rowsWritten + self.__rowsFailed +
+                         self.__rowsSpooled) / max(1, self.__batchCount),
+                'max': self.__maxBatchRows,
+            },
+            'flushLatency': self.__flushLatency.asDict(),
+        }
 
-        entity = OrmGriddyUpdate()
-        entity.time = datetime.now().astimezone()
-        entity.price = event.price
+    def flush(self):
+        """ Hands every buffered row to the worker thread to be written,
+        returning a concurrent.futures.Future for the write, or None if
+        nothing was buffered.  Call on the main loop """
+        if not self.__bufferCount:
+            return None
 
-        ormManagementService.session.add(entity)
-        ormManagementService.session.commit()
+        self.__flushInvoker.disable()
+        batch, count = self.__buffer, self.__bufferCount
+        self.__buffer = dict()
+        self.__bufferCount = 0
 
-    def __processSettingsChanged(self, event: SettingsChangedEvent):
-        ormManagementService = self._getService(OrmManagementService)
-        thermostatService = self._getService(ThermostatService)
+        eventBus = self._getService(EventBus)
+        self.__rollup.advance(eventBus.now)
+        for entityClass, rows in zip(self.ROLLUPS, self.__rollup.drain()):
+            if rows:
+                batch[entityClass] = rows
+        return eventBus.submitToWorker(self.WORKER, self.__write, batch, count)
 
-        entity = OrmThermostatTargets()
-        entity.time = datetime.now().astimezone()
-        entity.mode = self.MODE_CODES[thermostatService.mode]
-        entity.comfort_max = thermostatService.comfortMax
-        entity.comfort_min = thermostatService.comfortMin
+    @staticmethod
+    def rollupInsert(entityClass):
+        """ An insert statement for a rollup table that merges each row
+        into the one already stored for its bucket, if any: extremes are
+        kept, averages weighted by their samples, the prices opening and
+        closing the bucket taken by time and duty cycle seconds added """
+        statement = insert(entityClass.__table__)
+        stored, new = entityClass.__table__.c, statement.excluded
 
-        ormManagementService.session.add(entity)
-        ormManagementService.session.commit()
+        if entityClass is OrmDutyCycleRollup:
+            merge = {
+                column: stored[column] + new[column]
+                for column in ('cooling', 'heating', 'fan')}
+        else:
+            samples = stored.samples + new.samples
+            merge = {'samples': samples}
+            averages = ('average',) if entityClass is OrmPriceRollup else \
+                ('temperature_avg', 'humidity_avg')
+            for column in averages:
+                merge[column] = (
+                    stored[column] * stored.samples +
+                    new[column] * new.samples) / samples
+            if entityClass is OrmPriceRollup:
+                merge.update({
+                    'high': func.greatest(stored.high, new.high),
+                    'low': func.least(stored.low, new.low),
+                    'open': case(
+                        (new.open_time < stored.open_time, new.open),
+                        else_=stored.open),
+                    'open_time': func.least(stored.open_time, new.open_time),
+                    'close': case(
+                        (new.close_time >= stored.close_time, new.close),
+                        else_=stored.close),
+                    'close_time': func.greatest(
+                        stored.close_time, new.close_time),
+                })
+            else:
+                for name in ('temperature', 'humidity'):
+                    merge[f"{name}_min"] = func.least(
+                        stored[f"{name}_min"], new[f"{name}_min"])
+                    merge[f"{name}_max"] = func.greatest(
+                        stored[f"{name}_max"], new[f"{name}_max"])
 
-    def __thermostatStateChanged(self, event: ThermostatStateChangedEvent):
-        ormManagementService = self._getService(OrmManagementService)
+        return statement.on_conflict_do_update(
+            index_elements=[stored.resolution, stored.time], set_=merge)
 
-        entity = OrmThermostatState()
-        entity.time = datetime.now().astimezone()
-        entity.cooling = 1 if ThermostatState.COOLING == event.state else 0
-        entity.heating = 1 if ThermostatState.HEATING == event.state else 0
-        entity.fan = 1 if ThermostatState.FAN == event.state else 0
+    def close(self):
+        """ Writes everything still buffered and waits for it, for use once
+        the main loop has stopped """
+        future = self.flush()
+        if future is not None:
+            future.result()
 
-        ormManagementService.session.add(entity)
-        ormManagementService.session.commit()
+    def __now(self):
+        eventBus = self._getService(EventBus)
+        return datetime.fromtimestamp(eventBus.now).astimezone()
+
+    def __record(self, entityClass, row: dict):
+        """ Buffers a row for the entity's table, flushing if the buffer is
+        full """
+        if not self.__bufferCount:
+            self.__flushInvoker.reset()
+        self.__buffer.setdefault(entityClass, list()).append(row)
+        self.__bufferCount += 1
+        if self.__bufferCount >= self.__batchSize:
+            self.flush()
+
+    def __write(self, batch: dict, count: int):
+        """ Inserts a batch of rows in one transaction on the worker thread,
+        after replaying anything spooled.  Rows whose time is already
+        recorded are skipped, as a single row at a time insert would have
+        failed on them without losing the rest.  If the database cannot be
+        reached, the batch is spooled and the database left alone for
+        RETRY_INTERVAL seconds """
+        start = perf_counter()
+        try:
+            if self.__retryAt is not None and start < self.__retryAt:
+                self.__spoolBatch(batch, count)
+            else:
+                self.__replaySpool()
+                for entityClass, rows in batch.items():
+                    self.__session.execute(
+                        self.__insertStatement(entityClass.__table__), rows)
+                self.__session.commit()
+                self.__rowsWritten += count
+                if self.__retryAt is not None:
+                    log.info("Database reachable again, capture resumed")
+                self.__retryAt = None
+        except Exception as exc:
+            self.__rollback()
+            if self.__spool is not None and \
+                    OrmStateCaptureService.__isUnreachable(exc):
+                if self.__retryAt is None:
+                    log.warning(
+                        f"Database unreachable, spooling history: {exc}")
+                self.__retryAt = perf_counter() + self.RETRY_INTERVAL
+                self.__spoolBatch(batch, count)
+            else:
+                self.__rowsFailed += count
+                handleException("capturing thermostat state")
+        self.__flushLatency.record(perf_counter() - start)
+        self.__batchCount += 1
+        self.__lastBatchRows = count
+        self.__maxBatchRows = max(self.__maxBatchRows, count)
+
+    def __insertStatement(self, table):
+        """ Insert for a batch of rows, merging rollups and skipping rows
+        already recorded everywhere else """
+        for entityClass in self.ROLLUPS:
+            if entityClass.__table__ is table:
+                return OrmStateCaptureService.rollupInsert(entityClass)
+        return insert(table).on_conflict_do_nothing()
+
+    def __spoolBatch(self, batch: dict, count: int):
+        try:
+            for entityClass, rows in batch.items():
+                self.__spool.append(entityClass.__tablename__, rows)
+            self.__rowsSpooled += count
+        except:
+            self.__rowsFailed += count
+            handleException("spooling thermostat state")
+        self.__spoolBytes = self.__spool.byteCount
+
+    def __replaySpool(self):
+        """ Copies every spooled segment into the database, setting aside
+        any the database refuses for reasons other than being
+        unreachable, which is raised """
+        if self.__spool is None or not self.__spoolBytes:
+            return
+        while True:
+            try:
+                self.__rowsReplayed += self.__spool.replay(self.__copyTables)
+                break
+            except Exception as exc:
+                self.__rollback()
+                if OrmStateCaptureService.__isUnreachable(exc):
+                    raise
+                segment = self.__spool.segments()[0]
+                self.__spool.reject(segment)
+                handleException(f"replaying {segment}, set aside")
+            finally:
+                self.__spoolBytes = self.__spool.byteCount
+        log.info(f"Replayed spooled history, {self.__rowsReplayed} rows")
+
+    def __copyTables(self, tables: dict):
+        """ Writes one spooled segment in a single transaction.  Each
+        table's rows are streamed with COPY into a temporary table and
+        inserted from there, as COPY alone cannot skip rows already
+        recorded.  Rollups are few and may repeat a bucket within a
+        segment, so they are merged row by row instead """
+        cursor = self.__session.connection().connection.cursor()
+        try:
+            for tableName, rows in tables.items():
+                table = Base.metadata.tables[tableName]
+                if any(table is rollup.__table__ for rollup in self.ROLLUPS):
+                    self.__session.execute(
+                        self.__insertStatement(table), rows)
+                    continue
+                columns = list(rows[0].keys())
+                columnList = ', '.join(columns)
+                buffer = StringIO()
+                writer = csv.writer(buffer)
+                for row in rows:
+                    writer.writerow(
+                        '' if row.get(column) is None else row[column]
+                        for column in columns)
+                buffer.seek(0)
+
+                cursor.execute(
+                    f"CREATE TEMPORARY TABLE spool_{table.name} "
+                    f"(LIKE {table.name}) ON COMMIT DROP")
+                cursor.copy_expert(
+                    f"COPY spool_{table.name} ({columnList}) FROM STDIN "
+                    f"WITH (FORMAT csv)", buffer)
+                cursor.execute(
+                    f"INSERT INTO {table.name} ({columnList}) "
+                    f"SELECT {columnList} FROM spool_{table.name} "
+                    f"ON CONFLICT DO NOTHING")
+        finally:
+            cursor.close()
+        self.__session.commit()
+
+    def __rollback(self):
+        """ Rolls back the worker session, which with the connection lost
+        may itself fail, leaving the next use to reconnect """
+        try:
+            self.__session.rollback()
+        except:
+            pass
+
+    @staticmethod
+    def __isUnreachable(exc: Exception):
+        """ Whether an error means the database could not be reached or
+        did not answer in time, rather than refused the rows """
+        return isinstance(exc, (OperationalError, InterfaceError)) or \
+            (isinstance(exc, DBAPIError) and exc.connection_invalidated)
+
+    def __configChanged(self, event: ConfigChangedEvent):
+        """ Applies new batching limits, restarting the countdown for rows
+        already buffered """
+        if not event.changed('capture.batchSize', 'capture.maxLossWindow'):
+            return
 
-    def __sensorDataChanged(self, event: SensorDataChangedEvent):
         ormManagementService = self._getService(OrmManagementService)
+        self.__batchSize = ormManagementService.getConfigInt(
+            'capture.batchSize', self.BATCH_SIZE)
+        self.__maxLossWindow = ormManagementService.getConfigFloat(
+            'capture.maxLossWindow', self.MAX_LOSS_WINDOW)
 
-        entity = OrmSensorReading()
-        entity.time = datetime.now().astimezone()
-        entity.temperature = event.temperature
-        entity.pressure = event.pressure
-        entity.humidity = event.humidity
+        self.__flushInvoker.reset(frequency=self.__maxLossWindow)
+        if not self.__bufferCount:
+            self.__flushInvoker.disable()
+        elif self.__bufferCount >= self.__batchSize:
+            self.flush()
 
-        ormManagementService.session.add(entity)
-        ormManagementService.session.commit()
+    def __powerPriceChanged(self, event: PowerPriceChangedEvent):
+        eventBus = self._getService(EventBus)
+        self.__rollup.addPrice(eventBus.now, event.price)
+        self.__record(OrmGriddyUpdate, {
+            'time': self.__now(),
+            'price': event.price,
+        })
+
+    def __processSettingsChanged(self, event: SettingsChangedEvent):
+        """ Records the thermostat targets.  They are read here on the main
+        loop, as ThermostatService is not safe to read from the worker
+        thread, and only the copied values are handed on in the batch """
+        thermostatService = self._getService(ThermostatService)
+
+        self.__record(OrmThermostatTargets, {
+            'time': self.__now(),
+            'mode': self.MODE_CODES[thermostatService.mode],
+            'comfort_max': thermostatService.comfortMax,
+            'comfort_min': thermostatService.comfortMin,
+        })
+
+    def __thermostatStateChanged(self, event: ThermostatStateChangedEvent):
+        eventBus = self._getService(EventBus)
+        self.__rollup.addState(
+            eventBus.now,
+            cooling=ThermostatState.COOLING == event.state,
+            heating=ThermostatState.HEATING == event.state,
+            fan=ThermostatState.FAN == event.state)
+        self.__record(OrmThermostatState, {
+            'time': self.__now(),
+            'state': self.STATE_CODES[event.state],
+        })
+
+    def __sensorDataChanged(self, event: SensorDataChangedEvent):
+        if event.temperature is not None and event.humidity is not None:
+            eventBus = self._getService(EventBus)
+            self.__rollup.addSensorReading(
+                eventBus.now, event.temperature, event.humidity)
+        self.__record(OrmSensorReading, {
+            'time': self.__now(),
+            'temperature': event.temperature,
+            'pressure': event.pressure,
+            'humidity': event.humidity,
+        })
@@ -1,28 +1,36 @@
-from frosti.core.orm import OrmProgram, OrmScheduleDay, OrmPriceOverride
-from time import gmtime
+from frosti.core.orm import OrmProgram, OrmSchedule, OrmScheduleDay, \
+    OrmScheduleTime
 from datetime import datetime
-from sqlalchemy import desc
+from sqlalchemy.orm import joinedload
 from pytz import timezone
 
 from .RelayManagementService import RelayManagementService
 from .OrmManagementService import OrmManagementService
 from frosti.logging import log
 from frosti.core import EventBus, ServiceConsumer, ServiceProvider, \
-    ThermostatState, ThermostatMode
+    ThermostatState, ThermostatMode, WeeklySchedule, PriceOverrideTable
 from frosti.core.events import ThermostatStateChangedEvent, \
     SensorDataChangedEvent, ThermostatStateChangingEvent, \
-    PowerPriceChangedEvent, SettingsChangedEvent
+    PowerPriceChangedEvent, SettingsChangedEvent, ConfigChangedEvent, \
+    ScheduleChangedEvent
 
 
 class ThermostatService(ServiceConsumer):
 
+    # Longest to go without checking the schedule, so a change to the
+    # clock itself, like the first NTP sync after boot, is caught without
+    # waiting for the next transition
+    SCHEDULE_CHECK_INTERVAL = 60.0
+
     def __init__(self):
         self.__lastOverridePrice = None
         self.__isInPriceOverride = False
-        self.__priceWindowHistory = []
+        self.__priceWindowTotal = 0.0
+        self.__priceWindowCount = 0
         self.__priceWindow = None
 
-        self.__currentProgramGuid = None
+        self.__schedule = WeeklySchedule()
+        self.__currentProgram = None
         self.__comfortMin = 68.0
         self.__comfortMax = 78.0
         self.__state = ThermostatState.OFF
@@ -42,7 +50,8 @@ class ThermostatService(ServiceConsumer):
 
         eventBus = self._getService(EventBus)
         self.__checkScheduleInvoker = eventBus.installTimer(
-            frequency=60.0, handler=self.__checkSchedule)
+            frequency=self.SCHEDULE_CHECK_INTERVAL,
+            handler=self.__checkSchedule, oneShot=True)
         self.__fanRunoutInvoker = eventBus.installTimer(
             frequency=self.__fanRunoutDuration, handler=self.__fanRunout,
             oneShot=True)
@@ -52,15 +61,18 @@ class ThermostatService(ServiceConsumer):
             SensorDataChangedEvent, self.__sensorDataChanged)
         eventBus.installEventHandler(
             PowerPriceChangedEvent, self.__powerPriceChanged)
+        eventBus.installEventHandler(
+            ConfigChangedEvent, self.__configChanged)
+        eventBus.installEventHandler(
+            ScheduleChangedEvent, self.__scheduleChanged)
 
+        self.__compileSchedule()
         self.__checkSchedule()
 
     @property
     def currentProgramName(self):
-        ormManagementService = self._getService(OrmManagementService)
-        results = list(ormManagementService.session.query(OrmProgram)
-                       .filter(OrmProgram.guid == self.__currentProgramGuid))
-        return results[0].name if len(results) else None
+        return None if self.__currentProgram is None else \
+            self.__currentProgram['name']
 
     @property
     def isInPriceOverride(self):
@@ -112,52 +124,103 @@ class ThermostatService(ServiceConsumer):
         self.__mode = value
         eventBus.fireEvent(SettingsChangedEvent())
 
-    def __checkSchedule(self):
-        ''' Every so often, thermostat should re-check the database and see
-        whether a new program is applicable '''
+    def __configChanged(self, event: ConfigChangedEvent):
+        """ Applies thermostat configuration changed while running, keeping
+        the current value of anything removed.  A new delta applies from
+        the next sensor reading and a new fan runout duration from the next
+        runout, restarting one already underway """
+        ormManagementService = self._getService(OrmManagementService)
+
+        if event.changed('thermostat.delta'):
+            self.__delta = ormManagementService.getConfigFloat(
+                'thermostat.delta', self.__delta)
+
+        if event.changed('thermostat.fanRunoutDuration'):
+            self.__fanRunoutDuration = ormManagementService.getConfigInt(
+                'thermostat.fanRunoutDuration', self.__fanRunoutDuration)
+            isQueued = self.__fanRunoutInvoker.isQueued
+            self.__fanRunoutInvoker.reset(frequency=self.__fanRunoutDuration)
+            if not isQueued:
+                self.__fanRunoutInvoker.disable()
+
+        if event.changed('thermostat.timezone'):
+            self.__timezone = ormManagementService.getConfigString(
+                'thermostat.timezone', self.__timezone)
+            self.__localTimeZone = timezone(self.__timezone)
+            self.__checkSchedule()
+
+    def __compileSchedule(self):
+        """ Builds the weekly schedule, with the targets and price override
+        table of each program, from the database in a single query """
         ormManagementService = self._getService(OrmManagementService)
-        eventBus = self._getService(EventBus)
 
-        # Get the entire set of days and times so we can look across the
-        # entire weekly schedule
-        scheduleTimesList = list()
-        for scheduleDay in ormManagementService.session.query(OrmScheduleDay):
+        programs = dict()
+        transitions = list()
+        for scheduleDay in ormManagementService.session.query(OrmScheduleDay) \
+                .options(joinedload(OrmScheduleDay.schedule)
+                         .joinedload(OrmSchedule.times)
+                         .joinedload(OrmScheduleTime.program)
+                         .joinedload(OrmProgram.overrides)):
             for scheduleTime in scheduleDay.schedule.times:
-                timeInMinutes = scheduleTime.minute + 60 * \
-                    (scheduleTime.hour + 24*scheduleDay.day)
-                scheduleTimesList.append((timeInMinutes, scheduleTime))
-
-        if len(scheduleTimesList):
-            # Now order the list in day/hour/minute order but in reverse so
-            # we can apply 'now > instance' logic, then search the list...
-            scheduleTimesList.sort(key=lambda a: a[0])
-            scheduleTimesList.reverse()
-
-            # If we match nothing below, then assume we carry in the
-            # configured schedule from the last entry from last week
-            currentScheduleTime = scheduleTimesList[0][1]
-            tm = gmtime(eventBus.now)
-            localNow = self.__localTimeZone.fromutc(datetime(
-                tm.tm_year, tm.tm_mon, tm.tm_mday, tm.tm_hour, tm.tm_min))
-            now = localNow.minute + 60 * \
-                (localNow.hour + 24*((localNow.weekday()+1) % 7))
-            for entry in scheduleTimesList:
-                if now > entry[0]:
-                    currentScheduleTime = entry[1]
-                    break
-
-            if self.__currentProgramGuid != currentScheduleTime.program_guid:
-                self.__currentProgramGuid = currentScheduleTime.program_guid
-                self.__comfortMin = currentScheduleTime.program.comfort_min
-                self.__comfortMax = currentScheduleTime.program.comfort_max
-                eventBus.fireEvent(SettingsChangedEvent())
+                program = scheduleTime.program
+                if program.guid not in programs:
+                    programs[program.guid] = {
+                        'guid': program.guid,
+                        'name': program.name,
+                        'comfortMin': program.comfort_min,
+                        'comfortMax': program.comfort_max,
+                        'overrides': PriceOverrideTable(
+                            (override.price, override.comfort_min,
+                             override.comfort_max)
+                            for override in program.overrides),
+                    }
+                transitions.append((
+                    scheduleTime.minute + 60 *
+                    (scheduleTime.hour + 24 * scheduleDay.day),
+                    programs[program.guid]))
+        self.__schedule = WeeklySchedule(transitions)
+
+    def __scheduleChanged(self, event: ScheduleChangedEvent):
+        self.__compileSchedule()
+        self.__checkSchedule()
+
+    def __checkSchedule(self):
+        ''' Applies the program the schedule says should be running, if it
+        has changed, and sets the timer for the next transition '''
+        eventBus = self._getService(EventBus)
+
+        # With nothing scheduled, the program only changes when the
+        # schedule does
+        if not len(self.__schedule):
+            self.__checkScheduleInvoker.disable()
+            return
+
+        localNow = datetime.fromtimestamp(eventBus.now, self.__localTimeZone)
+        minute = WeeklySchedule.minuteOfWeek(localNow)
+        program = self.__schedule.at(minute)
+        current = self.__currentProgram
+        self.__currentProgram = program
+
+        # Only a switch to a different program applies its targets.  A
+        # recompiled schedule rebuilds every program, so the same one is
+        # just adopted to keep its price overrides current
+        if current is None or current['guid'] != program['guid']:
+            self.__comfortMin = program['comfortMin']
+            self.__comfortMax = program['comfortMax']
+            eventBus.fireEvent(SettingsChangedEvent())
+
+        # Wake at the next transition, checking early for it is harmless
+        delay = self.__schedule.secondsUntilNext(
+            eventBus.now, self.__localTimeZone)
+        if delay is None:
+            delay = self.SCHEDULE_CHECK_INTERVAL
+        self.__checkScheduleInvoker.reset(frequency=max(
+            1.0, min(delay, self.SCHEDULE_CHECK_INTERVAL)))
 
     def __powerPriceChanged(self, event: PowerPriceChangedEvent):
-        """ Based on a new power price searches the price overrides to
-        determine whether the min/max values need updating and if so,
-        applies the new settings.  Returs True if new settings were applied,
-        False otherwise """
-        ormManagementService = self._getService(OrmManagementService)
+        """ Based on a new power price looks up the current program's price
+        overrides to determine whether the min/max values need updating
+        and if so, applies the new settings """
         eventBus = self._getService(EventBus)
 
         # Here we're simply assuming that price average resets every 15
@@ -167,33 +230,32 @@ class ThermostatService(ServiceConsumer):
         priceWindow = int(eventBus.now/900)
         if self.__priceWindow != priceWindow:
             self.__priceWindow = priceWindow
-            self.__priceWindowHistory = list()
-
-        self.__priceWindowHistory.append(event.price)
-        priceHistoryLength = len(self.__priceWindowHistory)
-        priceAverage = sum(self.__priceWindowHistory)/priceHistoryLength
-
-        if self.__currentProgramGuid is not None:
-            priceOverrides = \
-                ormManagementService.session.query(OrmPriceOverride). \
-                filter_by(program_guid=self.__currentProgramGuid). \
-                order_by(desc(OrmPriceOverride.price))
-            for priceOverride in priceOverrides:
-                if priceAverage >= priceOverride.price:
-                    if self.__lastOverridePrice != priceOverride.price:
-                        self.__lastOverridePrice = priceOverride.price
-                        self.__isInPriceOverride = True
-                        if priceOverride.comfort_min is not None:
-                            self.__comfortMin = priceOverride.comfort_min
-                        if priceOverride.comfort_max is not None:
-                            self.__comfortMax = priceOverride.comfort_max
-                        eventBus.fireEvent(SettingsChangedEvent())
-                    return
+            self.__priceWindowTotal = 0.0
+            self.__priceWindowCount = 0
+
+        self.__priceWindowTotal += event.price
+        self.__priceWindowCount += 1
+        priceAverage = self.__priceWindowTotal / self.__priceWindowCount
+
+        if self.__currentProgram is not None:
+            priceOverride = \
+                self.__currentProgram['overrides'].lookup(priceAverage)
+            if priceOverride is not None:
+                price, comfortMin, comfortMax = priceOverride
+                if self.__lastOverridePrice != price:
+                    self.__lastOverridePrice = price
+                    self.__isInPriceOverride = True
+                    if comfortMin is not None:
+                        self.__comfortMin = comfortMin
+                    if comfortMax is not None:
+                        self.__comfortMax = comfortMax
+                    eventBus.fireEvent(SettingsChangedEvent())
+                return
 
             if self.__lastOverridePrice is not None:
                 self.__lastOverridePrice = None
                 self.__isInPriceOverride = False
-                self.__currentProgramGuid = None
+                self.__currentProgram = None
                 self.__checkSchedule()
 
     def __sensorDataChanged(self, event: SensorDataChangedEvent):
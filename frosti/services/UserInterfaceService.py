@@ -1,16 +1,14 @@
-from frosti.core.orm import OrmGriddyUpdate
+from frosti.core.orm import OrmPriceRollup
 from frosti.core.Event import Event
-import qrcode
-import smbus
 
 from enum import Enum
-from PIL import ImageFont, ImageDraw, Image
 from time import sleep
 from datetime import datetime, timedelta
+from typing import TYPE_CHECKING
 
 from frosti.logging import log
 from frosti.core import ServiceConsumer, ServiceProvider, EventBus, \
-    ThermostatMode
+    ThermostatMode, CoalescePolicy, EventFilter
 from frosti.services.ThermostatService import ThermostatService
 from frosti.services.EnvironmentSamplingService \
     import EnvironmentSamplingService
@@ -19,6 +17,11 @@ from frosti.core.events import ThermostatStateChangedEvent, \
     SensorDataChangedEvent, PowerPriceChangedEvent, SettingsChangedEvent
 from frosti.core.Event import Event
 
+# PIL is imported when the display starts, so it is only needed here to
+# name the type drawn on
+if TYPE_CHECKING:
+    from PIL import ImageDraw
+
 
 # sudo apt-get install liblcms1-dev libopenjp2-7 libtiff5 -y
 # sudo apt-get install libjpeg-dev zlib1g-dev libfreetype6-dev
@@ -32,6 +35,10 @@ class HardwareButton(Enum):
 
 
 class ScreenInvalidatedEvent(Event):
+    coalescePolicy = CoalescePolicy.LATEST
+    journaled = False
+    __slots__ = ()
+
     def __init__(self, screen):
         super().__init__(data={
             'screen': screen,
@@ -52,14 +59,13 @@ class Screen(ServiceConsumer):
     def buttonPressed(self, button: HardwareButton):
         raise NotImplementedError()
 
-    def redraw(self, draw: ImageDraw.Draw):
+    def redraw(self, draw: 'ImageDraw.Draw'):
         raise NotImplementedError()
 
     def invalidate(self):
         if self.isActive:
             eventBus = self._getService(EventBus)
-            eventBus.fireEvent(
-                ScreenInvalidatedEvent(self), immediately=True)
+            eventBus.fireEvent(ScreenInvalidatedEvent(self))
 
 
 class OptionsScreen(Screen):
@@ -89,7 +95,7 @@ class OptionsScreen(Screen):
         else:
             raise RuntimeError(f"Unknown button: {button}")
 
-    def redraw(self, draw: ImageDraw.Draw):
+    def redraw(self, draw: 'ImageDraw.Draw'):
 
         def getMetrics(text, font):
             ascent, descent = font.getmetrics()
@@ -138,11 +144,14 @@ class HomeScreen(Screen):
 
         eventBus = self._getService(EventBus)
         eventBus.installEventHandler(
-            SensorDataChangedEvent, self._sensorDataChanged)
+            SensorDataChangedEvent, self._sensorDataChanged,
+            eventFilter=EventFilter.deadband(temperature=0.25, humidity=0.5))
         eventBus.installEventHandler(
-            ThermostatStateChangedEvent, self._stateChanged)
+            ThermostatStateChangedEvent, self._stateChanged,
+            eventFilter=EventFilter.changed('state'))
         eventBus.installEventHandler(
-            PowerPriceChangedEvent, self._powerPriceChanged)
+            PowerPriceChangedEvent, self._powerPriceChanged,
+            eventFilter=EventFilter.changed('price'))
         eventBus.installEventHandler(
             SettingsChangedEvent, self._settingsChanged)
 
@@ -160,37 +169,26 @@ class HomeScreen(Screen):
             raise RuntimeError(f"Unknown button: {button}")
 
     def _sensorDataChanged(self, event: SensorDataChangedEvent):
-        needsRedraw = False
-
-        if abs(self._lastTemperature-event.temperature) > 0.25:
-            log.debug(f"Temperature changed {self._lastTemperature} "
-                      f"-> {event.temperature}")
-            self._lastTemperature = event.temperature
-            needsRedraw = True
-
-        if abs(self._lastHumidity-event.humidity) > 0.5:
-            log.debug(f"Humidity changed {self._lastHumidity} "
-                      f"-> {event.humidity}")
-            self._lastHumidity = event.humidity
-            needsRedraw = True
-
-        if needsRedraw:
-            self.invalidate()
+        # Only called once temperature or humidity leave their deadband
+        log.debug(f"Sensor data changed {self._lastTemperature}, "
+                  f"{self._lastHumidity} -> {event.temperature}, "
+                  f"{event.humidity}")
+        self._lastTemperature = event.temperature
+        self._lastHumidity = event.humidity
+        self.invalidate()
 
     def _settingsChanged(self, event: SettingsChangedEvent):
         self.invalidate()
 
     def _stateChanged(self, event: ThermostatStateChangedEvent):
-        if self._lastState != event.state:
-            self._lastState = event.state
-            self.invalidate()
+        self._lastState = event.state
+        self.invalidate()
 
     def _powerPriceChanged(self, event: PowerPriceChangedEvent):
-        if self._lastPrice != event.price:
-            self._lastPrice = event.price
-            self.invalidate()
+        self._lastPrice = event.price
+        self.invalidate()
 
-    def redraw(self, draw: ImageDraw.Draw):
+    def redraw(self, draw: 'ImageDraw.Draw'):
         # https://pillow.readthedocs.io/en/stable/handbook/text-anchors.html
         # Draw a bounding box that I'm expecting resembles the inset for
         # the rectangle port in the case
@@ -198,6 +196,8 @@ class HomeScreen(Screen):
         # NOTE that I had a heck of a time getting the align='*' features to
         # work until I forced the RPi to upgrade Pillow, which seems to
         # default to v5.x but v8.x works for me
+        from PIL import ImageFont
+
         pad = 2
         fontName = 'Hack-Bold.ttf'
         thermostatService = self._getService(ThermostatService)
@@ -319,7 +319,8 @@ class HomeScreen(Screen):
         ormManagementService = self._getService(OrmManagementService)
         minutesInChart = 6*60
         minutesInSample = 15
-        now = datetime.now().astimezone()
+        eventBus = self._getService(EventBus)
+        now = datetime.fromtimestamp(eventBus.now).astimezone()
         earliestTime = now - timedelta(minutes=minutesInChart)
 
         vPad = 8
@@ -330,22 +331,19 @@ class HomeScreen(Screen):
             [minX, minY, maxX, maxY], outline=0, fill=255, width=3)
         minX, maxX = minX+2, maxX-2
 
+        # The 15 minute price rollups already hold each bin's range
         priceList = list(
-            (a.time, a.price) for a in ormManagementService.session
-            .query(OrmGriddyUpdate).order_by(OrmGriddyUpdate.time)
-            .filter(OrmGriddyUpdate.time > earliestTime)
-            .filter(OrmGriddyUpdate.time <= now))
+            (a.time, a.low, a.high) for a in ormManagementService.session
+            .query(OrmPriceRollup).order_by(OrmPriceRollup.time)
+            .filter(OrmPriceRollup.resolution == minutesInSample*60)
+            .filter(OrmPriceRollup.time > earliestTime)
+            .filter(OrmPriceRollup.time <= now))
         if len(priceList):
             totalSamples = minutesInChart // minutesInSample
             priceRangeList = [(None, None)] * totalSamples
-            for time, price in priceList:
+            for time, minPrice, maxPrice in priceList:
                 timeSpan = now.timestamp() - time.timestamp()
                 timeBin = int(timeSpan // (minutesInSample*60))
-                minPrice, maxPrice = priceRangeList[timeBin]
-                minPrice = price if minPrice is None else minPrice
-                minPrice = min(minPrice, price)
-                maxPrice = price if maxPrice is None else maxPrice
-                maxPrice = max(maxPrice, price)
                 priceRangeList[timeBin] = (minPrice, maxPrice)
 
             absMinPrice = min(a[0] for a in priceRangeList if a[0] is not None)
@@ -377,6 +375,10 @@ class UserInterfaceService(ServiceConsumer):
     """
 
     def __init__(self, width, height):
+        # Pillow is only loaded once a user interface is built, keeping it
+        # off the path to starting the thermostat
+        from PIL import ImageDraw, Image
+
         self.image = Image.new('1', (width, height), 255)
         self.draw = ImageDraw.Draw(self.image)
 
@@ -417,6 +419,8 @@ class UserInterfaceService(ServiceConsumer):
         self._currentScreen.redraw(self.draw)
 
     def _drawQrCode(self):
+        import qrcode
+
         qr = qrcode.QRCode(
             version=1, error_correction=qrcode.constants.ERROR_CORRECT_L,
             box_size=3, border=4,
@@ -0,0 +1,74 @@
+from math import sin, pi
+
+from frosti.core import EventBus, ServiceProvider, ThermostatState
+from frosti.services import EnvironmentSamplingService, \
+    RelayManagementService
+
+
+class SimulatedEnvironmentSamplingService(EnvironmentSamplingService):
+    """ Reads temperature from a simple model of a house: indoors drifts
+    toward a daily outdoor swing and is pushed down or up while the cooling
+    or heating relay is closed.  The model only advances when read, using
+    event bus time """
+
+    # Seconds for indoors to close 63% of the gap to outdoors, unassisted
+    TIME_CONSTANT = 4 * 3600.0
+    # Degrees per second moved by the running equipment
+    COOLING_RATE = 6.0 / 3600.0
+    HEATING_RATE = 8.0 / 3600.0
+
+    def __init__(
+            self, outdoorMean: float = 85.0, outdoorSwing: float = 10.0,
+            indoorStart: float = 76.0):
+        """ Creates a new SimulatedEnvironmentSamplingService
+
+        outdoorMean: float
+            Average outdoor temperature over the day
+        outdoorSwing: float
+            Degrees above and below the mean at the hottest and coldest
+            time of day, 4PM and 4AM UTC
+        indoorStart: float
+            Indoor temperature when the simulation starts
+        """
+        self.__outdoorMean = outdoorMean
+        self.__outdoorSwing = outdoorSwing
+        self.__indoor = indoorStart
+        self.__lastUpdate = None
+
+    def setServiceProvider(self, provider: ServiceProvider):
+        # The base class takes its first sample straight away
+        self.__lastUpdate = provider.getService(EventBus).now
+        super().setServiceProvider(provider)
+
+    def outdoorTemperature(self, now: float):
+        """ Modelled outdoor temperature at a given time """
+        phase = 2 * pi * ((now % 86400.0) / 86400.0 - 10.0 / 24.0)
+        return self.__outdoorMean + self.__outdoorSwing * sin(phase)
+
+    def __update(self):
+        eventBus = self._getService(EventBus)
+        relayManagementService = self._getService(RelayManagementService)
+        now = eventBus.now
+        elapsed = now - self.__lastUpdate
+        if elapsed <= 0:
+            return
+        self.__lastUpdate = now
+
+        outdoor = self.outdoorTemperature(now)
+        change = (outdoor - self.__indoor) * \
+            min(1.0, elapsed / self.TIME_CONSTANT)
+        if not relayManagementService.isRelayOpen(ThermostatState.COOLING):
+            change -= self.COOLING_RATE * elapsed
+        if not relayManagementService.isRelayOpen(ThermostatState.HEATING):
+            change += self.HEATING_RATE * elapsed
+        self.__indoor += change
+
+    def _getRawTemperature(self):
+        self.__update()
+        return self.__indoor
+
+    def _getRawPressure(self):
+        return 1013.25
+
+    def _getRawHumidity(self):
+        return 50.0 - (self.__indoor - 72.0)
@@ -0,0 +1,54 @@
+from math import exp
+from random import Random
+
+from frosti.core import ServiceConsumer, ServiceProvider, EventBus
+from frosti.core.events import PowerPriceChangedEvent
+
+
+class SimulatedPriceService(ServiceConsumer):
+    """ Stands in for GoGriddyPriceCheckService, firing a
+    PowerPriceChangedEvent every UPDATE_INTERVAL seconds of event bus time.
+    Prices follow a daily curve peaking in the late afternoon, with the
+    occasional spike lasting a few updates """
+
+    UPDATE_INTERVAL = 300.0
+
+    def __init__(self, seed: int = 0, spikeChance: float = 0.01):
+        """ Creates a new SimulatedPriceService
+
+        seed: int
+            Seed for the spikes, so runs are repeatable
+        spikeChance: float
+            Chance of a spike starting on any update
+        """
+        self.__random = Random(seed)
+        self.__spikeChance = spikeChance
+        self.__spikeUpdates = 0
+        self.__spikePrice = 0.0
+
+    def setServiceProvider(self, provider: ServiceProvider):
+        super().setServiceProvider(provider)
+
+        eventBus = self._getService(EventBus)
+        eventBus.installTimer(
+            frequency=self.UPDATE_INTERVAL, handler=self.__updatePrice)
+
+    def price(self, now: float):
+        """ Price in $/kW*h, before any spike, at a given time """
+        hour = (now % 86400.0) / 3600.0
+        return 0.025 + 0.06 * exp(-((hour - 21.0) / 2.5) ** 2)
+
+    def __updatePrice(self):
+        eventBus = self._getService(EventBus)
+        price = self.price(eventBus.now)
+
+        if self.__spikeUpdates:
+            self.__spikeUpdates -= 1
+            price = self.__spikePrice
+        elif self.__random.random() < self.__spikeChance:
+            self.__spikeUpdates = self.__random.randint(1, 6)
+            self.__spikePrice = self.__random.uniform(0.15, 2.0)
+            price = self.__spikePrice
+
+        eventBus.fireEvent(PowerPriceChangedEvent(
+            price=price, nextUpdate=self.UPDATE_INTERVAL))
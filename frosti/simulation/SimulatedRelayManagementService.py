@@ -0,0 +1,36 @@
+from frosti.core import EventBus, ThermostatState
+from frosti.services import RelayManagementService
+
+
+class SimulatedRelayManagementService(RelayManagementService):
+    """ Keeps relay state in memory instead of driving hardware, adding up
+    how long each relay has been closed in event bus time """
+
+    def __init__(self):
+        self.__closedSince = {a: None for a in ThermostatState}
+        self.__closedSeconds = {a: 0.0 for a in ThermostatState}
+        super().__init__()
+
+    def openRelay(self, state: ThermostatState):
+        closedSince = self.__closedSince[state]
+        if closedSince is not None:
+            eventBus = self._getService(EventBus)
+            self.__closedSeconds[state] += eventBus.now - closedSince
+            self.__closedSince[state] = None
+
+    def closeRelay(self, state: ThermostatState):
+        if self.__closedSince[state] is None:
+            eventBus = self._getService(EventBus)
+            self.__closedSince[state] = eventBus.now
+
+    def isRelayOpen(self, state: ThermostatState):
+        return self.__closedSince[state] is None
+
+    def closedSeconds(self, state: ThermostatState):
+        """ Total seconds the relay for a state has been closed """
+        closedSeconds = self.__closedSeconds[state]
+        closedSince = self.__closedSince[state]
+        if closedSince is not None:
+            eventBus = self._getService(EventBus)
+            closedSeconds += eventBus.now - closedSince
+        return closedSeconds
@@ -0,0 +1,131 @@
+from time import process_time
+
+from .SimulatedRelayManagementService import SimulatedRelayManagementService
+from .SimulatedEnvironmentSamplingService \
+    import SimulatedEnvironmentSamplingService
+from .SimulatedPriceService import SimulatedPriceService
+from frosti.core import EventBus, ServiceProvider, ThermostatMode, \
+    ThermostatState
+from frosti.core.events import ThermostatStateChangedEvent
+from frosti.services import OrmManagementService, ApiDataBrokerService, \
+    ThermostatService, OrmStateCaptureService, RelayManagementService, \
+    EnvironmentSamplingService
+
+
+class SimulationDriver(ServiceProvider):
+    """ Runs the thermostat services against simulated relays, sensors and
+    prices on a virtual clock.  Rather than waiting, the event bus moves
+    straight from one timer deadline to the next, so schedule changes,
+    price updates and fan runouts for a week happen in seconds """
+
+    DAY = 86400.0
+
+    def __init__(
+            self, configData: dict, start: float,
+            mode: ThermostatMode = ThermostatMode.AUTO,
+            capture: bool = False, seed: int = 0):
+        """ Creates a new SimulationDriver, installing every service
+
+        configData: dict
+            Configuration in the layout of etc/frosti.yaml
+        start: float
+            Time, in seconds since the epoch, the simulation starts at
+        mode: ThermostatMode
+            Mode the thermostat is left in
+        capture: bool
+            True to also run OrmStateCaptureService
+        seed: int
+            Seed for the simulated price spikes
+        """
+        super().__init__()
+
+        self.__eventBus = EventBus(now=start)
+        self.installService(EventBus, self.__eventBus)
+
+        self.__relayManagementService = SimulatedRelayManagementService()
+        self.installService(
+            RelayManagementService, self.__relayManagementService)
+        self.__relayManagementService.setServiceProvider(self)
+
+        ormManagementService = OrmManagementService(isTestInstance=True)
+        ormManagementService.setServiceProvider(self)
+        self.installService(OrmManagementService, ormManagementService)
+
+        apiDataBrokerService = ApiDataBrokerService()
+        apiDataBrokerService.setServiceProvider(self)
+        apiDataBrokerService.setConfig(configData['config'])
+        apiDataBrokerService.setPrograms(configData['programs'])
+        apiDataBrokerService.setSchedules(configData['schedules'])
+
+        self.__thermostatService = ThermostatService()
+        self.__thermostatService.setServiceProvider(self)
+        self.installService(ThermostatService, self.__thermostatService)
+
+        self.__ormStateCaptureService = None
+        if capture:
+            self.__ormStateCaptureService = OrmStateCaptureService()
+            self.__ormStateCaptureService.setServiceProvider(self)
+            self.installService(
+                OrmStateCaptureService, self.__ormStateCaptureService)
+
+        environmentSamplingService = SimulatedEnvironmentSamplingService()
+        self.installService(
+            EnvironmentSamplingService, environmentSamplingService)
+        environmentSamplingService.setServiceProvider(self)
+
+        priceService = SimulatedPriceService(seed=seed)
+        priceService.setServiceProvider(self)
+
+        self.__stateChanges = 0
+        self.__eventBus.installEventHandler(
+            ThermostatStateChangedEvent, self.__thermostatStateChanged)
+        self.__thermostatService.mode = mode
+
+    def __thermostatStateChanged(self, event: ThermostatStateChangedEvent):
+        self.__stateChanges += 1
+
+    def run(self, days: float):
+        """ Simulates some number of days, returning a report of the CPU
+        time and work done for each one """
+        eventBus = self.__eventBus
+        relayManagementService = self.__relayManagementService
+        dayReports = list()
+        start = eventBus.now
+
+        for day in range(int(days)):
+            metrics = eventBus.metrics
+            eventsDispatched = metrics['eventsDispatched']
+            timersFired = metrics['timersFired']
+            stateChanges = self.__stateChanges
+            closedSeconds = {
+                state: relayManagementService.closedSeconds(state)
+                for state in ThermostatState}
+
+            cpuStart = process_time()
+            eventBus.advanceTo(start + (day + 1) * self.DAY)
+            cpuSeconds = process_time() - cpuStart
+
+            metrics = eventBus.metrics
+            dayReports.append({
+                'cpuSeconds': cpuSeconds,
+                'eventsDispatched':
+                    metrics['eventsDispatched'] - eventsDispatched,
+                'timersFired': metrics['timersFired'] - timersFired,
+                'stateChanges': self.__stateChanges - stateChanges,
+                'relaySeconds': {
+                    str(state): relayManagementService.closedSeconds(state) -
+                    closedSeconds[state]
+                    for state in ThermostatState
+                    if ThermostatState.OFF != state},
+            })
+
+        if self.__ormStateCaptureService is not None:
+            self.__ormStateCaptureService.close()
+        eventBus.shutdownWorkers()
+        cpuSeconds = sum(a['cpuSeconds'] for a in dayReports)
+        return {
+            'days': len(dayReports),
+            'cpuSeconds': cpuSeconds,
+            'cpuSecondsPerDay': cpuSeconds / max(1, len(dayReports)),
+            'dayReports': dayReports,
+        }
@@ -0,0 +1,13 @@
+# This file is necessary for the tests written in this folder to
+# successfully import logic from frosti
+
+"""
+Stand-ins for the hardware and outside services, driven entirely by event
+bus time, so the thermostat can be run faster than real time
+"""
+
+from .SimulatedRelayManagementService import SimulatedRelayManagementService
+from .SimulatedEnvironmentSamplingService \
+    import SimulatedEnvironmentSamplingService
+from .SimulatedPriceService import SimulatedPriceService
+from .SimulationDriver import SimulationDriver
@@ -0,0 +1,133 @@
+#!/usr/bin/python3
+
+from datetime import datetime, timezone
+import argparse
+
+from frosti.services import OrmManagementService, OrmStateCaptureService
+from frosti.core import ServiceProvider, EventBus, HistoryRollup
+from frosti.core.orm import OrmSensorReading, OrmGriddyUpdate, \
+    OrmThermostatState
+from frosti.logging import log, handleException, setupLogging
+
+# Raw rows read between writes of the rollups built from them
+CHUNK_SIZE = 50000
+
+
+class RollupBackfiller(ServiceProvider):
+    """ Rebuilds the rollup tables from raw history over a span of time,
+    replacing whatever rollups were there.  The span is widened to whole
+    hours so every bucket in it is rebuilt from all of its rows """
+
+    def __init__(self, isTestInstance: bool):
+        super().__init__()
+
+        self.installService(EventBus, EventBus())
+        self.__ormManagementService = OrmManagementService(
+            isTestInstance=isTestInstance)
+        self.__ormManagementService.setServiceProvider(self)
+        self.__session = self.__ormManagementService.session
+        self.__rollup = HistoryRollup()
+        self.__pending = 0
+
+    def exec(self, start: datetime, end: datetime):
+        hour = max(HistoryRollup.RESOLUTIONS)
+        if start is None:
+            start = min(filter(None, (
+                self.__session.query(entityClass.time)
+                .order_by(entityClass.time).limit(1).scalar()
+                for entityClass in (
+                    OrmSensorReading, OrmGriddyUpdate, OrmThermostatState))),
+                default=None)
+            if start is None:
+                log.info("No history to roll up")
+                return
+        if end is None:
+            end = datetime.now(timezone.utc)
+        startTime = start.timestamp() // hour * hour
+        endTime = end.timestamp() // hour * hour
+        if endTime <= startTime:
+            log.info("Nothing to roll up before the current hour")
+            return
+        start = datetime.fromtimestamp(startTime, timezone.utc)
+        end = datetime.fromtimestamp(endTime, timezone.utc)
+        log.info(f"Rolling up history from {start} to {end}")
+
+        for entityClass in OrmStateCaptureService.ROLLUPS:
+            self.__session.query(entityClass) \
+                .filter(entityClass.time >= start, entityClass.time < end) \
+                .delete(synchronize_session=False)
+
+        for row in self.__rows(OrmSensorReading, start, end):
+            if row.temperature is not None and row.humidity is not None:
+                self.__rollup.addSensorReading(
+                    row.time.timestamp(), row.temperature, row.humidity)
+            self.__counted()
+        for row in self.__rows(OrmGriddyUpdate, start, end):
+            self.__rollup.addPrice(row.time.timestamp(), row.price)
+            self.__counted()
+
+        # Duty cycles carry on from the state in effect when the span
+        # starts, and stop at its end
+        previous = self.__session.query(OrmThermostatState) \
+            .filter(OrmThermostatState.time < start) \
+            .order_by(OrmThermostatState.time.desc()).first()
+        if previous is not None:
+            self.__addState(startTime, previous.state)
+        for row in self.__rows(OrmThermostatState, start, end):
+            self.__addState(row.time.timestamp(), row.state)
+            self.__counted()
+        self.__rollup.advance(endTime)
+
+        self.__writeRollups()
+        self.__session.commit()
+        log.info(f"Rolled up history from {start} to {end}")
+
+    def __rows(self, entityClass, start: datetime, end: datetime):
+        return self.__session.query(entityClass) \
+            .filter(entityClass.time >= start, entityClass.time < end) \
+            .order_by(entityClass.time) \
+            .yield_per(CHUNK_SIZE)
+
+    def __addState(self, time: float, state: int):
+        self.__rollup.addState(
+            time, cooling=state & OrmThermostatState.COOLING,
+            heating=state & OrmThermostatState.HEATING,
+            fan=state & OrmThermostatState.FAN)
+
+    def __counted(self):
+        """ Writes the rollups built so far every CHUNK_SIZE rows, where
+        they are merged with the next chunk's, to bound memory """
+        self.__pending += 1
+        if self.__pending >= CHUNK_SIZE:
+            self.__writeRollups()
+
+    def __writeRollups(self):
+        drained = self.__rollup.drain()
+        for entityClass, rows in zip(OrmStateCaptureService.ROLLUPS, drained):
+            if rows:
+                self.__session.execute(
+                    OrmStateCaptureService.rollupInsert(entityClass), rows)
+        self.__pending = 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='FROSTI rollup backfill tool')
+    parser.add_argument(
+        '--start', default=None, type=datetime.fromisoformat,
+        help='Start of the history to roll up, ISO format (default: oldest)')
+    parser.add_argument(
+        '--end', default=None, type=datetime.fromisoformat,
+        help='End of the history to roll up, ISO format (default: now)')
+    parser.add_argument(
+        '--test', default=False, action='store_true',
+        help='Use the test database')
+    args = parser.parse_args()
+
+    setupLogging()
+
+    try:
+        backfiller = RollupBackfiller(args.test)
+        backfiller.exec(args.start, args.end)
+    except:
+        handleException("Failed backfilling rollups")
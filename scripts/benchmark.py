@@ -0,0 +1,317 @@
+#!/usr/bin/python3
+
+import argparse
+import json
+import platform
+import sys
+import tracemalloc
+from datetime import datetime
+from subprocess import run
+from threading import Thread, Event as ThreadingEvent
+from math import sin, pi
+from random import Random
+from time import perf_counter
+
+from frosti.core import Event, EventBus, EventFilter
+from frosti.core.events import SensorDataChangedEvent, PowerPriceChangedEvent
+
+
+class BenchmarkEvent(Event):
+    """ Plain event with no coalescing, so every fired event is dispatched """
+
+    def __init__(self, sent: float = 0.0):
+        super().__init__('BenchmarkEvent', {'sent': sent})
+
+
+class Benchmark:
+    """ Micro-benchmarks for the frosti.core event loop.  Measurements of the
+    loop itself drive processEvents() with virtual time so results do not
+    depend on how long the machine takes to sleep, while the cross-thread
+    measurements run a real exec() loop on a background thread.
+
+    Every result is a flat dict of numbers so runs from different commits
+    can be compared with --compare """
+
+    def __init__(self, args):
+        self.args = args
+
+    def __percentiles(self, samples: list):
+        """ Summarizes latency samples in seconds as microseconds """
+        samples = sorted(samples)
+        count = len(samples)
+        return {
+            'count': count,
+            'mean_us': 1e6 * sum(samples) / count,
+            'p50_us': 1e6 * samples[int(0.50 * (count - 1))],
+            'p95_us': 1e6 * samples[int(0.95 * (count - 1))],
+            'p99_us': 1e6 * samples[int(0.99 * (count - 1))],
+            'max_us': 1e6 * samples[-1],
+        }
+
+    def __startLoop(self):
+        """ Runs exec() for a new EventBus on a background thread """
+        eventBus = EventBus()
+        thread = Thread(target=eventBus.exec, name='benchmark loop')
+        thread.start()
+        return eventBus, thread
+
+    def dispatchThroughput(self, fanOut: int):
+        """ Events dispatched per second through processEvents() with
+        fanOut trivial handlers installed for the event type """
+        eventBus = EventBus(now=1.0, queueLimit=None)
+        for _ in range(fanOut):
+            eventBus.installEventHandler(BenchmarkEvent, lambda e: None)
+
+        eventCount = self.args.events
+        events = [BenchmarkEvent() for _ in range(eventCount)]
+        start = perf_counter()
+        for event in events:
+            eventBus.fireEvent(event)
+        eventBus.processEvents(2.0)
+        elapsed = perf_counter() - start
+        return {
+            'events_per_sec': eventCount / elapsed,
+            'handler_calls_per_sec': eventCount * fanOut / elapsed,
+        }
+
+    def crossThreadLatency(self):
+        """ Time from fireEvent() on another thread until the handler runs
+        on a sleeping main loop """
+        eventBus, thread = self.__startLoop()
+        samples = list()
+        received = ThreadingEvent()
+
+        def handler(event: BenchmarkEvent):
+            samples.append(perf_counter() - event.data['sent'])
+            received.set()
+
+        eventBus.safeInvoke(
+            eventBus.installEventHandler, BenchmarkEvent, handler)
+        for _ in range(self.args.samples):
+            received.clear()
+            eventBus.fireEvent(BenchmarkEvent(perf_counter()))
+            received.wait()
+
+        eventBus.stop()
+        thread.join()
+        return self.__percentiles(samples)
+
+    def safeInvokeRoundTrip(self):
+        """ Time for safeInvoke() of a trivial call to return from another
+        thread """
+        eventBus, thread = self.__startLoop()
+        samples = list()
+        for _ in range(self.args.samples):
+            start = perf_counter()
+            eventBus.safeInvoke(lambda: None)
+            samples.append(perf_counter() - start)
+
+        eventBus.stop()
+        thread.join()
+        return self.__percentiles(samples)
+
+    def timerScaling(self, timerCount: int):
+        """ Average cost of one processEvents() call with timerCount timers
+        installed, where one recurring timer is due on every call and the
+        rest are idle, in microseconds """
+        eventBus = EventBus(now=1.0)
+        for i in range(timerCount - 1):
+            eventBus.installTimer(3600.0 + i, handler=lambda: None)
+        eventBus.installTimer(1.0, handler=lambda: None)
+
+        now = 1.0
+        eventBus.processEvents(now)
+        start = perf_counter()
+        for _ in range(self.args.iterations):
+            now += 1.0
+            eventBus.processEvents(now)
+        return {
+            'us_per_loop':
+                1e6 * (perf_counter() - start) / self.args.iterations,
+        }
+
+    def eventCost(self):
+        """ Cost of building the events fired most often and reading every
+        property the handlers read, in nanoseconds per operation """
+        count = self.args.events
+
+        start = perf_counter()
+        for _ in range(count):
+            SensorDataChangedEvent(72.5, 1013.2, 45.0)
+        sensorConstruct = perf_counter() - start
+
+        event = SensorDataChangedEvent(72.5, 1013.2, 45.0)
+        start = perf_counter()
+        for _ in range(count):
+            event.temperature
+            event.pressure
+            event.humidity
+        sensorAccess = perf_counter() - start
+
+        start = perf_counter()
+        for _ in range(count):
+            PowerPriceChangedEvent(2.5, 300.0)
+        priceConstruct = perf_counter() - start
+
+        event = PowerPriceChangedEvent(2.5, 300.0)
+        start = perf_counter()
+        for _ in range(count):
+            event.price
+            event.nextUpdate
+        priceAccess = perf_counter() - start
+
+        return {
+            'sensor_construct_ns': 1e9 * sensorConstruct / count,
+            'sensor_access_ns': 1e9 * sensorAccess / (3 * count),
+            'price_construct_ns': 1e9 * priceConstruct / count,
+            'price_access_ns': 1e9 * priceAccess / (2 * count),
+        }
+
+    def eventAllocation(self):
+        """ Memory allocated to build one SensorDataChangedEvent and have
+        five handlers read all of its properties, and how much of it is
+        still held by each event kept, in bytes """
+        count = 1000
+        events = list()
+        tracemalloc.start()
+        try:
+            start, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            for _ in range(count):
+                event = SensorDataChangedEvent(72.5, 1013.2, 45.0)
+                for _ in range(5):
+                    event.temperature
+                    event.pressure
+                    event.humidity
+                events.append(event)
+            retained, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'sensor_retained_bytes': (retained - start) / count,
+            'sensor_peak_bytes': (peak - start) / count,
+        }
+
+    def filterSavings(self):
+        """ Handler calls made for a simulated day of 5 second sensor
+        samples, a slow daily swing plus sensor noise, through the same
+        deadband HomeScreen subscribes with """
+        eventBus = EventBus(now=1.0)
+        calls = [0]
+
+        def handler(event: SensorDataChangedEvent):
+            calls[0] += 1
+
+        eventBus.installEventHandler(
+            SensorDataChangedEvent, handler,
+            eventFilter=EventFilter.deadband(temperature=0.25, humidity=0.5))
+
+        random = Random(0)
+        sampleCount = 24 * 3600 // 5
+        for i in range(sampleCount):
+            phase = 2 * pi * i / sampleCount
+            eventBus.fireEvent(SensorDataChangedEvent(
+                72.0 + 3.0 * sin(phase) + random.gauss(0, 0.05),
+                1013.2,
+                45.0 + 5.0 * sin(phase) + random.gauss(0, 0.2)))
+            eventBus.processEvents(1.0 + 5 * i)
+
+        return {
+            'samples': sampleCount,
+            'handler_calls': calls[0],
+            'calls_saved': eventBus.metrics['filteredCalls'],
+        }
+
+    def __gitCommit(self):
+        try:
+            result = run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                capture_output=True, text=True)
+            return result.stdout.strip() or None
+        except OSError:
+            return None
+
+    def collect(self):
+        """ Runs every benchmark, returning the results keyed by name """
+        results = dict()
+        for fanOut in self.args.fanout:
+            results[f"dispatch.fanout{fanOut}"] = \
+                self.dispatchThroughput(fanOut)
+        results['crossThreadFireEvent'] = self.crossThreadLatency()
+        results['safeInvoke'] = self.safeInvokeRoundTrip()
+        for timerCount in self.args.timers:
+            results[f"timers.{timerCount}"] = self.timerScaling(timerCount)
+        results['events'] = self.eventCost()
+        results['eventAllocation'] = self.eventAllocation()
+        results['filters'] = self.filterSavings()
+
+        return {
+            'commit': self.__gitCommit(),
+            'time': datetime.now().astimezone().isoformat(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'results': results,
+        }
+
+    def printResults(self, report: dict, baseline: dict = None):
+        """ Prints every result, with the change against the baseline
+        report's result of the same name if one is given """
+        baselineResults = (baseline or {}).get('results', {})
+        print(f"commit {report['commit']}, python {report['python']}")
+        if baseline is not None:
+            print(f"baseline commit {baseline.get('commit')}")
+        for name, values in report['results'].items():
+            for key, value in values.items():
+                line = f"{name + '.' + key:<40} {value:>14.2f}"
+                old = baselineResults.get(name, {}).get(key)
+                if old:
+                    line += f" {100.0 * (value - old) / old:>+9.1f}%"
+                print(line)
+
+    def exec(self):
+        report = self.collect()
+
+        baseline = None
+        if self.args.compare is not None:
+            with open(self.args.compare, 'r') as baselineFile:
+                baseline = json.load(baselineFile)
+
+        if '-' == self.args.json:
+            json.dump(report, sys.stdout, indent=2)
+            print()
+        else:
+            self.printResults(report, baseline)
+            if self.args.json is not None:
+                with open(self.args.json, 'w') as jsonFile:
+                    json.dump(report, jsonFile, indent=2)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='FROSTI core benchmarks')
+    parser.add_argument(
+        '--iterations', default=2000, type=int,
+        help='Number of processEvents() calls to time per timer measurement')
+    parser.add_argument(
+        '--timers', default=[10, 100, 1000, 5000, 10000], type=int,
+        nargs='+', help='Timer counts to measure loop cost at')
+    parser.add_argument(
+        '--fanout', default=[1, 5, 20], type=int, nargs='+',
+        help='Handler counts to measure dispatch throughput at')
+    parser.add_argument(
+        '--events', default=100000, type=int,
+        help='Number of events used for throughput and event cost')
+    parser.add_argument(
+        '--samples', default=2000, type=int,
+        help='Number of cross-thread round trips to time')
+    parser.add_argument(
+        '--json', metavar='PATH',
+        help="Also write the results as JSON to PATH, or only to stdout "
+        "if PATH is '-'")
+    parser.add_argument(
+        '--compare', metavar='PATH',
+        help='JSON results from an earlier run to show the change against')
+    args = parser.parse_args()
+
+    Benchmark(args).exec()
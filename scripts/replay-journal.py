@@ -0,0 +1,105 @@
+#!/usr/bin/python3
+
+import argparse
+import yaml
+from time import process_time
+
+from frosti.core import ServiceProvider, EventBus, EventJournal, \
+    EventReplayDriver
+from frosti.core.events import SensorDataChangedEvent, \
+    PowerPriceChangedEvent, ThermostatStateChangedEvent
+from frosti.services import OrmManagementService, ApiDataBrokerService, \
+    ThermostatService, OrmStateCaptureService, RelayManagementService
+from frosti.simulation import SimulatedRelayManagementService
+from frosti.logging import log, setupLogging
+
+
+class JournalReplayer(ServiceProvider):
+    """ Replays the sensor and price history in an event journal through a
+    ThermostatService and OrmStateCaptureService, without any hardware """
+
+    def __init__(self, args):
+        super().__init__()
+        self.__args = args
+
+    def dump(self):
+        for now, event in EventJournal.read(self.__args.journal):
+            print(f"{now:.3f} {event!r} {dict(event.data)}")
+
+    def exec(self):
+        records = EventJournal.read(self.__args.journal)
+        firstTime = next(records, (None, None))[0]
+        if firstTime is None:
+            raise RuntimeError(f"No events in {self.__args.journal}")
+
+        eventBus = EventBus(now=firstTime)
+        self.installService(EventBus, eventBus)
+
+        relayManagementService = SimulatedRelayManagementService()
+        self.installService(RelayManagementService, relayManagementService)
+        relayManagementService.setServiceProvider(self)
+
+        ormManagementService = OrmManagementService(isTestInstance=True)
+        ormManagementService.setServiceProvider(self)
+        self.installService(OrmManagementService, ormManagementService)
+        if self.__args.capture:
+            ormStateCaptureService = OrmStateCaptureService()
+            ormStateCaptureService.setServiceProvider(self)
+
+        with open(self.__args.config) as configFile:
+            configData = yaml.load(configFile, Loader=yaml.FullLoader)
+        apiDataBrokerService = ApiDataBrokerService()
+        apiDataBrokerService.setServiceProvider(self)
+        apiDataBrokerService.setConfig(configData['config'])
+        apiDataBrokerService.setPrograms(configData['programs'])
+        apiDataBrokerService.setSchedules(configData['schedules'])
+
+        thermostatService = ThermostatService()
+        thermostatService.setServiceProvider(self)
+        self.installService(ThermostatService, thermostatService)
+
+        eventBus.installEventHandler(
+            ThermostatStateChangedEvent,
+            lambda e: log.info(f"{eventBus.now:.0f}: thermostat {e.state}"))
+
+        replayDriver = EventReplayDriver(
+            eventBus, self.__args.journal,
+            eventTypes=[SensorDataChangedEvent, PowerPriceChangedEvent],
+            speed=self.__args.speed)
+        start = process_time()
+        eventCount = replayDriver.run()
+        if self.__args.capture:
+            ormStateCaptureService.close()
+        eventBus.shutdownWorkers()
+        log.info(
+            f"Replayed {eventCount} events covering "
+            f"{eventBus.now - firstTime:.0f}s in "
+            f"{process_time() - start:.2f}s of CPU")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Replay a FROSTI event journal')
+    parser.add_argument(
+        'journal', help='Journal directory written by --journal')
+    parser.add_argument(
+        '--config', default='etc/frosti.yaml',
+        help='Configuration to run the thermostat with')
+    parser.add_argument(
+        '--speed', default=None, type=float,
+        help='Replay at this multiple of real time, default is full speed')
+    parser.add_argument(
+        '--capture', default=False, action='store_true',
+        help='Also record thermostat state to the test database, as '
+        'OrmStateCaptureService would have in the field')
+    parser.add_argument(
+        '--dump', default=False, action='store_true',
+        help='Print the journal instead of replaying it')
+    args = parser.parse_args()
+
+    setupLogging()
+    replayer = JournalReplayer(args)
+    if args.dump:
+        replayer.dump()
+    else:
+        replayer.exec()
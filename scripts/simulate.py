@@ -0,0 +1,64 @@
+#!/usr/bin/python3
+
+import argparse
+import json
+import sys
+import yaml
+from time import mktime, strptime
+
+from frosti.core import ThermostatMode
+from frosti.simulation import SimulationDriver
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Run FROSTI on a virtual clock against simulated '
+        'hardware and power prices')
+    parser.add_argument(
+        '--days', default=7, type=int,
+        help='Number of days to simulate')
+    parser.add_argument(
+        '--start', default='2021-07-05 00:00',
+        help='Local time to start at, as YYYY-MM-DD HH:MM')
+    parser.add_argument(
+        '--config', default='etc/frosti.yaml',
+        help='Configuration to run the thermostat with')
+    parser.add_argument(
+        '--mode', default='AUTO', choices=[str(a) for a in ThermostatMode],
+        help='Thermostat mode to run in')
+    parser.add_argument(
+        '--capture', default=False, action='store_true',
+        help='Also record thermostat state to the test database')
+    parser.add_argument(
+        '--seed', default=0, type=int,
+        help='Seed for simulated power price spikes')
+    parser.add_argument(
+        '--json', default=False, action='store_true',
+        help='Print the report as JSON')
+    args = parser.parse_args()
+
+    with open(args.config) as configFile:
+        configData = yaml.load(configFile, Loader=yaml.FullLoader)
+
+    driver = SimulationDriver(
+        configData, mktime(strptime(args.start, '%Y-%m-%d %H:%M')),
+        mode=ThermostatMode[args.mode], capture=args.capture,
+        seed=args.seed)
+    report = driver.run(args.days)
+
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print(f"{'day':>4} {'cpu s':>8} {'events':>8} {'timers':>8} "
+              f"{'changes':>8} {'cool h':>7} {'heat h':>7} {'fan h':>7}")
+        for day, dayReport in enumerate(report['dayReports']):
+            relaySeconds = dayReport['relaySeconds']
+            print(f"{day:>4} {dayReport['cpuSeconds']:>8.3f} "
+                  f"{dayReport['eventsDispatched']:>8} "
+                  f"{dayReport['timersFired']:>8} "
+                  f"{dayReport['stateChanges']:>8} "
+                  f"{relaySeconds['COOLING'] / 3600:>7.2f} "
+                  f"{relaySeconds['HEATING'] / 3600:>7.2f} "
+                  f"{relaySeconds['FAN'] / 3600:>7.2f}")
+        print(f"{report['cpuSecondsPerDay']:.3f}s of CPU per simulated day")
@@ -3,8 +3,9 @@
 from sqlalchemy import text
 import argparse
 
-from frosti.services import OrmManagementService
+from frosti.services import OrmManagementService, OrmStateCaptureService
 from frosti.core import ServiceProvider, EventBus
+from frosti.core.orm import OrmThermostatState
 from frosti.logging import handleException, setupLogging
 
 
@@ -35,18 +36,41 @@ class DatabaseUpgrader(ServiceProvider):
         # This establishes the new schema in 'public'
         ormManagementService.setServiceProvider(self)
 
+        # History is partitioned by month, so make sure every month being
+        # copied over has its partition
+        query = text(
+            "SELECT min(time) FROM ("
+            "    SELECT min(time) AS time FROM frosti_old.thermostat_state "
+            "    UNION SELECT min(time) FROM frosti_old.thermostat_targets "
+            "    UNION SELECT min(time) FROM frosti_old.griddy_update "
+            "    UNION SELECT min(time) FROM frosti_old.sensor_reading"
+            ") earliest")
+        earliest = session.connection().execute(query).scalar()
+        if earliest is not None:
+            eventBus = self.getService(EventBus)
+            ormManagementService.ensurePartitions(
+                earliest.timestamp(), eventBus.now)
+
         query = text(
             "INSERT INTO version_info (time, major, minor) "
-            "VALUES (now(), 1, 1)")
+            "VALUES (now(), 1, 3)")
         result = session.connection().execute(query)
 
+        # Separate fan, cooling and heating columns are packed into the
+        # bits of one state column
         query = text(
-            "INSERT INTO thermostat_state("
-            "    time, fan, cooling, heating) "
+            "INSERT INTO hvac_state("
+            "    time, state) "
             "SELECT "
-            "    time, fan, cooling, heating "
+            "    time, "
+            "    (CASE WHEN fan > 0 THEN :fan ELSE 0 END) | "
+            "    (CASE WHEN cooling > 0 THEN :cooling ELSE 0 END) | "
+            "    (CASE WHEN heating > 0 THEN :heating ELSE 0 END) "
             "FROM frosti_old.thermostat_state")
-        result = session.connection().execute(query)
+        result = session.connection().execute(query, {
+            'fan': OrmThermostatState.FAN,
+            'cooling': OrmThermostatState.COOLING,
+            'heating': OrmThermostatState.HEATING})
 
         query = text(
             "INSERT INTO thermostat_targets("
@@ -72,6 +96,20 @@ class DatabaseUpgrader(ServiceProvider):
             "FROM frosti_old.sensor_reading")
         result = session.connection().execute(query)
 
+        # Rollups are kept if the old schema had them, otherwise they can
+        # be rebuilt with backfill-rollups.py
+        for entityClass in OrmStateCaptureService.ROLLUPS:
+            tableName = entityClass.__tablename__
+            query = text(f"SELECT to_regclass('frosti_old.{tableName}')")
+            if session.connection().execute(query).scalar() is None:
+                continue
+            columnList = ', '.join(
+                column.name for column in entityClass.__table__.columns)
+            query = text(
+                f"INSERT INTO {tableName}({columnList}) "
+                f"SELECT {columnList} FROM frosti_old.{tableName}")
+            result = session.connection().execute(query)
+
         session.commit()
 
         if finalize:
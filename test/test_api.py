@@ -197,6 +197,22 @@ class Test_ApiDataBroker(unittest.TestCase):
         data = req.json()
         self.assertFalse('away' in data)
 
+    def test_programs_stable(self):
+        """ Writing programs again keeps their GUIDs and only changes what
+        differs """
+        before = self.apiDataBroker.getPrograms()
+        programs = yaml.load(yamlText, Loader=yaml.FullLoader)['programs']
+        programs['home']['comfortMin'] = 71.0
+        programs['home']['priceOverrides'].pop()
+        self.apiDataBroker.setPrograms(programs)
+
+        after = self.apiDataBroker.getPrograms()
+        for name, program in before.items():
+            self.assertEqual(after[name]['guid'], program['guid'])
+        self.assertEqual(after['home']['comfortMin'], 71.0)
+        self.assertEqual(len(after['home']['priceOverrides']), 1)
+        self.assertEqual(after['away'], before['away'])
+
     def test_programs_get_2(self):
         req = requests.get(API_URL + '/api/v1/programs/doesnotexist')
         self.assertEqual(req.status_code, 404)
@@ -1,8 +1,17 @@
 import unittest
-from threading import Timer
-from time import time
+import asyncio
+from threading import Thread, Timer, current_thread
+from time import time, sleep
+from concurrent.futures import TimeoutError
+from shutil import rmtree
+from tempfile import mkdtemp
 
-from frosti.core import Event, EventBus, ServiceConsumer, ServiceProvider
+from frosti.core import Event, EventBus, ServiceConsumer, ServiceProvider, \
+    CoalescePolicy, AsyncEventBus, LatencyHistogram, ExecutionTarget, \
+    EventPriority, OverflowPolicy, EventFilter, EventJournal, \
+    EventReplayDriver, EventBusProfiler
+from frosti.core.events import SensorDataChangedEvent, \
+    PowerPriceChangedEvent, ConfigChangedEvent
 
 
 class Test_EventBus(unittest.TestCase):
@@ -15,6 +24,34 @@ class Test_EventBus(unittest.TestCase):
         def test(self):
             return super().data['test']
 
+    class LatestEvent(Event):
+        coalescePolicy = CoalescePolicy.LATEST
+
+        def __init__(self, test: int):
+            super().__init__('LatestEvent', {'test': test})
+
+    class MergeEvent(Event):
+        coalescePolicy = CoalescePolicy.MERGE
+
+        def __init__(self, values: list):
+            super().__init__('MergeEvent', {'values': values})
+
+        def merge(self, event):
+            return Test_EventBus.MergeEvent(
+                self._data['values'] + event._data['values'])
+
+    class ControlEvent(Event):
+        priority = EventPriority.CONTROL
+
+        def __init__(self, test: int):
+            super().__init__('ControlEvent', {'test': test})
+
+    class TelemetryEvent(Event):
+        priority = EventPriority.TELEMETRY
+
+        def __init__(self, test: int):
+            super().__init__('TelemetryEvent', {'test': test})
+
     class DummyServiceConsumer(ServiceConsumer):
         def __init__(self):
             self.eventCount = 0
@@ -99,3 +136,731 @@ class Test_EventBus(unittest.TestCase):
         self.eventBus.processEvents(now=self.eventBus.now + 7000)
         self.assertEqual(self.eventHandler.eventCount, 1)
         self.assertFalse(handler.isQueued)
+
+    def test_oneShotSelfReset(self):
+        """ A oneShot timer whose handler resets it stays armed, firing
+        again at the new frequency """
+        fired = list()
+
+        def handler():
+            fired.append(self.eventBus.now)
+            if len(fired) < 3:
+                timer.reset(frequency=5.0)
+
+        timer = self.eventBus.installTimer(10.0, handler=handler, oneShot=True)
+        for now in (100.0, 110.0, 115.0, 120.0, 200.0):
+            self.eventBus.processEvents(now=now)
+        self.assertEqual(fired, [110.0, 115.0, 120.0])
+        self.assertFalse(timer.isQueued)
+
+    def test_timerEarlyFire(self):
+        """ Timers within the tolerance of their deadline fire early, and
+        recurring timers count from the time they actually fired """
+        self.eventBus.installTimer(10.0, handler=self.timerHandler)
+        self.eventBus.processEvents(now=100.0)
+
+        self.eventBus.processEvents(now=109.7)
+        self.assertEqual(self.eventHandler.eventCount, 0)
+        self.eventBus.processEvents(now=109.9)
+        self.assertEqual(self.eventHandler.eventCount, 1)
+        self.eventBus.processEvents(now=119.7)
+        self.assertEqual(self.eventHandler.eventCount, 1)
+        self.eventBus.processEvents(now=119.85)
+        self.assertEqual(self.eventHandler.eventCount, 2)
+
+    def test_timerReset(self):
+        """ A reset restarts the countdown from the next processEvents call
+        and can change the frequency """
+        timer = self.eventBus.installTimer(10.0, handler=self.timerHandler)
+        self.eventBus.processEvents(now=100.0)
+        self.eventBus.processEvents(now=105.0)
+        timer.reset(frequency=20.0)
+        self.eventBus.processEvents(now=108.0)
+        self.eventBus.processEvents(now=125.0)
+        self.assertEqual(self.eventHandler.eventCount, 0)
+        self.eventBus.processEvents(now=128.0)
+        self.assertEqual(self.eventHandler.eventCount, 1)
+
+    def test_timerDisableAndRemove(self):
+        """ Disabled and removed timers never fire until reset """
+        timer1 = self.eventBus.installTimer(10.0, handler=self.timerHandler)
+        timer2 = self.eventBus.installTimer(10.0, handler=self.timerCallback)
+        self.eventBus.processEvents(now=100.0)
+        timer1.disable()
+        self.eventBus.removeTimer(timer2)
+        self.assertFalse(timer1.isQueued)
+        self.assertFalse(timer2.isQueued)
+        self.eventBus.processEvents(now=200.0)
+        self.eventBus.processEvents(now=300.0)
+        self.assertEqual(self.eventHandler.eventCount, 0)
+
+        timer1.reset()
+        self.eventBus.processEvents(now=300.0)
+        self.eventBus.processEvents(now=310.0)
+        self.assertEqual(self.eventHandler.eventCount, 1)
+
+    def test_timerOrdering(self):
+        """ Timers due in the same pass fire in deadline order, each at most
+        once, and the returned timeout tracks the earliest deadline """
+        fired = list()
+        for frequency in [30.0, 10.0, 20.0, 0.1]:
+            self.eventBus.installTimer(
+                frequency, handler=lambda f=frequency: fired.append(f))
+        self.assertAlmostEqual(self.eventBus.processEvents(now=100.0), 0.1)
+        self.assertEqual(fired, [0.1])
+
+        timeout = self.eventBus.processEvents(now=100.5)
+        self.assertEqual(fired, [0.1, 0.1])
+        self.assertAlmostEqual(timeout, 0.1)
+        self.eventBus.processEvents(now=140.0)
+        self.assertEqual(fired, [0.1, 0.1, 0.1, 10.0, 20.0, 30.0])
+
+    def test_manyTimers(self):
+        """ Thousands of timers still fire exactly as scheduled """
+        fired = list()
+        for i in range(5000):
+            timer = self.eventBus.installTimer(
+                1.0 + i, handler=lambda i=i: fired.append(i), oneShot=True)
+            if i % 2:
+                self.eventBus.removeTimer(timer)
+        self.eventBus.processEvents(now=100.0)
+        self.eventBus.processEvents(now=200.0)
+        self.assertEqual(fired, list(range(0, 100, 2)))
+
+    def test_ticklessTimeout(self):
+        """ Tickless buses wait as long as it takes for the next deadline,
+        or indefinitely when nothing is scheduled """
+        eventBus = EventBus(now=1, tickless=True)
+        self.assertIsNone(eventBus.processEvents(now=100.0))
+        eventBus.installTimer(3600.0, handler=self.timerHandler)
+        self.assertEqual(eventBus.processEvents(now=100.0), 3600.0)
+        self.assertEqual(
+            self.eventBus.processEvents(now=100.0), EventBus.MAX_TIMEOUT)
+
+    def test_ticklessEquivalence(self):
+        """ Driving a bus by the timeouts it returns fires exactly the same
+        timers at exactly the same times whether or not it is tickless,
+        while the tickless bus needs fewer passes to get there """
+
+        def simulate(eventBus: EventBus):
+            fired, now, passes = list(), 100.0, 0
+            for frequency, oneShot in [(90.0, False), (45.0, True),
+                                       (600.0, False), (3600.0, False)]:
+                eventBus.installTimer(
+                    frequency, oneShot=oneShot,
+                    handler=lambda f=frequency: fired.append((f, now)))
+            while now < 100.0 + 7200.0:
+                timeout = eventBus.processEvents(now)
+                now += timeout
+                passes += 1
+            return fired, passes
+
+        ticked, tickedPasses = simulate(EventBus(now=1))
+        tickless, ticklessPasses = simulate(EventBus(now=1, tickless=True))
+        self.assertEqual(ticked, tickless)
+        self.assertLess(ticklessPasses, tickedPasses)
+
+        eventBus = EventBus(now=1, tickless=True)
+        fired, now = list(), 100.0
+        eventBus.installTimer(3600.0, handler=lambda: fired.append(now))
+        eventBus.processEvents(now)
+        now += eventBus.processEvents(now)
+        eventBus.processEvents(now)
+        self.assertEqual(fired, [3700.0])
+
+    def test_ticklessExec(self):
+        """ A tickless exec() sleeps until the timer or cross-thread event
+        that needs it, and accounts for the time it spent idle """
+        eventBus = EventBus(tickless=True)
+        eventBus.installEventHandler(
+            Test_EventBus.DummyEvent, lambda event: None)
+        eventBus.installTimer(0.6, handler=lambda: None, oneShot=True)
+        timer = Timer(
+            0.1, lambda: eventBus.fireEvent(Test_EventBus.DummyEvent(1)))
+        timer.start()
+
+        start = time()
+        eventBus.exec(3)
+        end = time()
+        metrics = eventBus.metrics
+        self.assertEqual(metrics['eventsDispatched'], 1)
+        self.assertEqual(metrics['timersFired'], 1)
+        self.assertEqual(metrics['wakeups'], 2)
+        self.assertEqual(metrics['spuriousWakeups'], 0)
+        self.assertGreater(metrics['idleTime'], 0.5)
+        self.assertGreater(10.0, end - start)
+
+    def test_coalesceLatest(self):
+        """ Queued events of a latest-wins type collapse into one dispatch
+        of the newest event, keeping the place of the first in line """
+        received = list()
+        self.eventBus.installEventHandler(
+            Test_EventBus.LatestEvent, lambda e: received.append(e.data))
+        self.eventBus.installEventHandler(
+            Test_EventBus.DummyEvent, lambda e: received.append(e.data))
+        self.eventBus.fireEvent(Test_EventBus.LatestEvent(1))
+        self.eventBus.fireEvent(Test_EventBus.DummyEvent(2))
+        for i in range(3, 7):
+            self.eventBus.fireEvent(Test_EventBus.LatestEvent(i))
+        self.assertEqual(self.eventBus.metrics['queueDepth'], 2)
+
+        self.eventBus.processEvents()
+        self.assertEqual(received, [{'test': 6}, {'test': 2}])
+        self.assertEqual(self.eventBus.metrics['eventsCoalesced'], 4)
+        self.assertEqual(self.eventBus.metrics['queueDepth'], 0)
+
+        self.eventBus.fireEvent(Test_EventBus.LatestEvent(7))
+        self.eventBus.processEvents()
+        self.assertEqual(received[-1], {'test': 7})
+
+    def test_coalesceMerge(self):
+        """ Merged events combine their contents into one dispatch """
+        received = list()
+        self.eventBus.installEventHandler(
+            Test_EventBus.MergeEvent, lambda e: received.append(e.data))
+        for i in range(3):
+            self.eventBus.fireEvent(Test_EventBus.MergeEvent([i]))
+        self.eventBus.processEvents()
+        self.assertEqual(received, [{'values': [0, 1, 2]}])
+
+    def test_configChangedMerge(self):
+        """ Queued config changes reach handlers once, with every changed
+        name """
+        received = list()
+        self.eventBus.installEventHandler(
+            ConfigChangedEvent, lambda e: received.append(e))
+        self.eventBus.fireEvent(ConfigChangedEvent({'thermostat.delta'}))
+        self.eventBus.fireEvent(ConfigChangedEvent(
+            {'environment.temperature.scale', 'thermostat.delta'}))
+        self.eventBus.processEvents()
+
+        self.assertEqual(len(received), 1)
+        self.assertEqual(received[0].names, frozenset(
+            {'thermostat.delta', 'environment.temperature.scale'}))
+        self.assertTrue(received[0].changed('environment.', 'ui.'))
+        self.assertFalse(received[0].changed('capture.'))
+
+    def test_configChangedPriority(self):
+        """ Config changes reach handlers ahead of queued telemetry """
+        received = list()
+        self.eventBus.installEventHandler(
+            ConfigChangedEvent, lambda e: received.append('config'))
+        self.eventBus.installEventHandler(
+            PowerPriceChangedEvent, lambda e: received.append('price'))
+        for i in range(3):
+            self.eventBus.fireEvent(PowerPriceChangedEvent(0.1 * i, 300))
+        self.eventBus.fireEvent(ConfigChangedEvent({'thermostat.delta'}))
+        self.eventBus.processEvents()
+
+        self.assertEqual(received[0], 'config')
+
+    def test_coalesceOverrides(self):
+        """ Policies can be installed per bus or given per call, and the
+        default keeps every event """
+        received = list()
+        self.eventBus.installEventHandler(
+            Test_EventBus.DummyEvent, lambda e: received.append(e.test),
+            coalesce=CoalescePolicy.LATEST)
+        with self.assertRaises(RuntimeError):
+            self.eventBus.installEventHandler(
+                Test_EventBus.DummyEvent, lambda e: None,
+                coalesce=CoalescePolicy.MERGE)
+        self.eventBus.fireEvent(Test_EventBus.DummyEvent(1))
+        self.eventBus.fireEvent(Test_EventBus.DummyEvent(2))
+        self.eventBus.fireEvent(
+            Test_EventBus.LatestEvent(3), coalesce=CoalescePolicy.KEEP_ALL)
+        self.eventBus.fireEvent(
+            Test_EventBus.LatestEvent(4), coalesce=CoalescePolicy.KEEP_ALL)
+        self.eventBus.processEvents()
+        self.assertEqual(received, [2])
+        self.assertEqual(self.eventHandler.eventCount, 1)
+        self.assertEqual(self.eventBus.metrics['eventsCoalesced'], 1)
+
+    def test_safeInvokeAsync(self):
+        """ Invoked calls complete their future once the loop runs them,
+        passing along either the return value or the exception """
+        def fail():
+            raise ValueError('failed')
+
+        future = self.eventBus.safeInvokeAsync(lambda a, b: a + b, 1, b=2)
+        failure = self.eventBus.safeInvokeAsync(fail)
+        self.assertFalse(future.done())
+        self.eventBus.processEvents()
+        self.assertEqual(future.result(0), 3)
+        with self.assertRaises(ValueError):
+            failure.result(0)
+        self.assertEqual(
+            self.eventBus.metrics['safeInvokeLatency']['count'], 2)
+
+    def test_safeInvokeDeadline(self):
+        """ Calls the loop doesn't start before their deadline are never
+        made, whether or not anyone is waiting on them """
+        called = list()
+        future = self.eventBus.safeInvokeAsync(
+            lambda: called.append(1), deadline=0.01)
+        with self.assertRaises(TimeoutError):
+            self.eventBus.safeInvoke(lambda: called.append(2), deadline=0.05)
+        sleep(0.01)
+        self.eventBus.processEvents()
+        with self.assertRaises(TimeoutError):
+            future.result(0)
+        self.assertEqual(called, [])
+        self.assertEqual(self.eventBus.metrics['safeInvokeExpired'], 2)
+
+    def test_profiling(self):
+        """ Profiling is off by default, and once enabled counts and times
+        every handler, timer and event type, flagging slow calls """
+        self.eventBus.fireEvent(Test_EventBus.DummyEvent(1))
+        self.eventBus.processEvents()
+        self.assertIsNone(self.eventBus.profile)
+
+        def slowHandler(event):
+            sleep(0.02)
+
+        self.eventBus.enableProfiling(threshold=0.01)
+        self.eventBus.installEventHandler(
+            Test_EventBus.DummyEvent, slowHandler)
+        self.eventBus.installTimer(1.0, handler=self.timerHandler)
+        self.eventBus.processEvents(now=100.0)
+        self.eventBus.processEvents(now=101.0)
+        self.eventBus.fireEvent(Test_EventBus.DummyEvent(2))
+        self.eventBus.processEvents(now=101.5)
+
+        profile = self.eventBus.metrics['profile']
+        handlers = {
+            name.split('.')[-1]: stats
+            for name, stats in profile['handlers'].items()}
+        self.assertEqual(handlers['__processDummyEvent']['count'], 2)
+        self.assertEqual(handlers['__processDummyEvent']['slowCalls'], 0)
+        self.assertEqual(handlers['slowHandler']['count'], 2)
+        self.assertEqual(handlers['slowHandler']['slowCalls'], 2)
+        self.assertGreater(handlers['slowHandler']['max'], 0.01)
+        self.assertEqual(profile['events']['DummyEvent']['count'], 2)
+        self.assertEqual(len(profile['timers']), 1)
+
+        self.eventBus.disableProfiling()
+        self.assertIsNone(self.eventBus.profile)
+
+    def test_latencyHistogram(self):
+        histogram = LatencyHistogram()
+        for i in range(100):
+            histogram.record(0.001 * (i + 1))
+        self.assertEqual(histogram.count, 100)
+        self.assertAlmostEqual(histogram.mean, 0.0505)
+        self.assertEqual(histogram.max, 0.1)
+        self.assertLessEqual(histogram.percentile(0.5), 0.1)
+        self.assertGreaterEqual(histogram.percentile(0.5), 0.05)
+        self.assertEqual(histogram.percentile(1.0), 0.1)
+        self.assertEqual(sum(histogram.asDict()['buckets'].values()), 100)
+
+    def test_profileReadConcurrently(self):
+        """ Profiles can be read from another thread while entries are
+        being added and recorded """
+        profiler = EventBusProfiler(threshold=10.0)
+        eventTypes = [type(f"Event{i}", (), {}) for i in range(2000)]
+
+        def record():
+            for eventType in eventTypes:
+                for _ in range(5):
+                    profiler.recordEvent(eventType, 0.001)
+
+        writer = Thread(target=record)
+        writer.start()
+        while writer.is_alive():
+            profile = profiler.asDict()
+        writer.join()
+
+        profile = profiler.asDict()
+        self.assertEqual(len(profile['events']), len(eventTypes))
+        self.assertTrue(all(
+            summary['count'] == 5 for summary in profile['events'].values()))
+
+    def test_eventImmutable(self):
+        """ Event data is read through a view rather than a copy, and
+        the events fired by the thermostat carry no per-instance dict """
+        event = SensorDataChangedEvent(72, 1013.2, '45.5')
+        self.assertEqual(event.temperature, 72.0)
+        self.assertEqual(event.humidity, 45.5)
+        self.assertEqual(repr(event), 'SensorDataChangedEvent')
+        self.assertEqual(event.data['pressure'], 1013.2)
+        with self.assertRaises(TypeError):
+            event.data['pressure'] = 0.0
+        with self.assertRaises(AttributeError):
+            event.extra = 0.0
+        self.assertFalse(hasattr(PowerPriceChangedEvent(1.0, 300), '__dict__'))
+
+    def test_sensorDataMissing(self):
+        """ A reading the sensor did not give stays None """
+        event = SensorDataChangedEvent(None, 1013, None)
+        self.assertIsNone(event.temperature)
+        self.assertIsNone(event.humidity)
+        self.assertEqual(event.pressure, 1013.0)
+
+    def test_eventFilters(self):
+        """ Filtered subscriptions only see the events their filter
+        accepts, and the bus counts the calls saved """
+        received = {'deadband': [], 'changed': [], 'predicate': []}
+        self.eventBus.installEventHandler(
+            SensorDataChangedEvent,
+            lambda e: received['deadband'].append(e.temperature),
+            eventFilter=EventFilter.deadband(temperature=0.25, humidity=0.5))
+        self.eventBus.installEventHandler(
+            SensorDataChangedEvent,
+            lambda e: received['changed'].append(e.temperature),
+            eventFilter=EventFilter.changed('temperature'))
+        self.eventBus.installEventHandler(
+            SensorDataChangedEvent,
+            lambda e: received['predicate'].append(e.temperature),
+            eventFilter=EventFilter.predicate(lambda e: e.humidity > 50))
+
+        samples = [
+            (72.0, 45.0), (72.0, 45.0), (72.2, 45.4), (72.3, 45.4),
+            (72.3, 51.0), (71.9, 51.2)]
+        for temperature, humidity in samples:
+            self.eventBus.fireEvent(
+                SensorDataChangedEvent(temperature, 1013.2, humidity),
+                immediately=True)
+
+        self.assertEqual(received['deadband'], [72.0, 72.3, 72.3, 71.9])
+        self.assertEqual(received['changed'], [72.0, 72.2, 72.3, 71.9])
+        self.assertEqual(received['predicate'], [72.3, 71.9])
+        self.assertEqual(self.eventBus.metrics['filteredCalls'], 2 + 2 + 4)
+
+    def test_priorityOrder(self):
+        """ Queued events dispatch by priority class, then in order """
+        received = list()
+        for eventType in (Test_EventBus.ControlEvent, Test_EventBus.DummyEvent,
+                          Test_EventBus.TelemetryEvent):
+            self.eventBus.installEventHandler(
+                eventType,
+                lambda e: received.append((e.priority, e.data['test'])))
+
+        self.eventBus.fireEvent(Test_EventBus.TelemetryEvent(1))
+        self.eventBus.fireEvent(Test_EventBus.DummyEvent(2))
+        self.eventBus.fireEvent(Test_EventBus.ControlEvent(3))
+        self.eventBus.fireEvent(Test_EventBus.TelemetryEvent(4))
+        self.eventBus.fireEvent(Test_EventBus.ControlEvent(5))
+
+        metrics = self.eventBus.metrics
+        self.assertEqual(metrics['queueDepthByPriority'], {
+            'CONTROL': 2, 'UI': 1, 'TELEMETRY': 2})
+        self.eventBus.processEvents(now=101.0)
+        self.assertEqual(received, [
+            (EventPriority.CONTROL, 3), (EventPriority.CONTROL, 5),
+            (EventPriority.UI, 2), (EventPriority.TELEMETRY, 1),
+            (EventPriority.TELEMETRY, 4)])
+        metrics = self.eventBus.metrics
+        self.assertEqual(metrics['queueDepth'], 0)
+        self.assertEqual(metrics['queueDepthPeakByPriority']['CONTROL'], 2)
+
+    def test_priorityStarvation(self):
+        """ A steady stream of control events cannot hold telemetry back
+        for more than STARVATION_LIMIT dispatches """
+        received = list()
+
+        def controlHandler(event: Test_EventBus.ControlEvent):
+            received.append('control')
+            if event.data['test'] > 0:
+                self.eventBus.fireEvent(
+                    Test_EventBus.ControlEvent(event.data['test'] - 1))
+
+        self.eventBus.installEventHandler(
+            Test_EventBus.ControlEvent, controlHandler)
+        self.eventBus.installEventHandler(
+            Test_EventBus.TelemetryEvent,
+            lambda e: received.append('telemetry'))
+
+        self.eventBus.fireEvent(Test_EventBus.TelemetryEvent(1))
+        self.eventBus.fireEvent(Test_EventBus.ControlEvent(20))
+        self.eventBus.processEvents(now=101.0)
+        self.assertEqual(received.index('telemetry'), 8)
+        self.assertEqual(len(received), 22)
+        self.assertEqual(self.eventBus.metrics['starvationPromotions'], 1)
+
+    def __fillQueue(self, overflow: OverflowPolicy):
+        """ Returns a bus with room for three events, holding telemetry 1
+        and dummy events 2 and 3, along with the list its handlers fill """
+        received = list()
+        eventBus = EventBus(now=1, queueLimit=3)
+        eventBus.setOverflowPolicy(Test_EventBus.DummyEvent, overflow)
+        for eventType in (Test_EventBus.DummyEvent,
+                          Test_EventBus.TelemetryEvent):
+            eventBus.installEventHandler(
+                eventType, lambda e: received.append(e.data['test']))
+        eventBus.fireEvent(Test_EventBus.TelemetryEvent(1))
+        eventBus.fireEvent(Test_EventBus.DummyEvent(2))
+        eventBus.fireEvent(Test_EventBus.DummyEvent(3))
+        return eventBus, received
+
+    def test_overflowPolicies(self):
+        """ Events fired into a full queue are handled by the overflow
+        policy of their type """
+        expected = {
+            OverflowPolicy.DROP_OLDEST: [2, 3, 4],
+            OverflowPolicy.DROP_NEWEST: [2, 3, 1],
+            OverflowPolicy.COALESCE: [2, 4, 1],
+        }
+        for overflow, values in expected.items():
+            eventBus, received = self.__fillQueue(overflow)
+            eventBus.fireEvent(Test_EventBus.DummyEvent(4))
+            self.assertEqual(len(eventBus.metrics['eventsDropped']), 1)
+            eventBus.processEvents(now=101.0)
+            self.assertEqual(received, values, f"{overflow}")
+            self.assertEqual(eventBus.metrics['queueOverflows'], 1)
+
+        # Nothing queued is less important than a control event, so a
+        # full queue of them drops the newest
+        eventBus = EventBus(now=1, queueLimit=1)
+        eventBus.fireEvent(Test_EventBus.ControlEvent(1))
+        eventBus.fireEvent(Test_EventBus.DummyEvent(2))
+        self.assertEqual(
+            eventBus.metrics['eventsDropped'], {'DummyEvent': 1})
+
+    def test_overflowBlock(self):
+        """ Blocking events wait for room when fired from another thread
+        and are let in over the limit by the thread dispatching them """
+        eventBus, received = self.__fillQueue(OverflowPolicy.BLOCK)
+        eventBus.processEvents(now=101.0)
+        for i in range(4, 7):
+            eventBus.fireEvent(Test_EventBus.DummyEvent(i))
+        self.assertEqual(eventBus.metrics['queueDepth'], 3)
+
+        eventBus.fireEvent(Test_EventBus.DummyEvent(7))
+        self.assertEqual(eventBus.metrics['queueDepth'], 4)
+        self.assertEqual(eventBus.metrics['eventsDropped'], {})
+
+        def fromThread():
+            eventBus.fireEvent(Test_EventBus.DummyEvent(8))
+            received.append('fired')
+
+        thread = Thread(target=fromThread)
+        thread.start()
+        sleep(0.1)
+        self.assertNotIn('fired', received)
+        eventBus.processEvents(now=102.0)
+        thread.join()
+        eventBus.processEvents(now=103.0)
+        self.assertEqual(received[:7], [2, 3, 1, 4, 5, 6, 7])
+        self.assertEqual(set(received[7:]), {'fired', 8})
+
+    def test_poolTarget(self):
+        """ Pool handlers run off the main loop, and exceptions they raise
+        are handled on the worker """
+        threads = list()
+
+        def poolHandler(event: Test_EventBus.DummyEvent):
+            threads.append(current_thread())
+            if event.test < 0:
+                raise RuntimeError('Expected exception')
+
+        self.eventBus.installEventHandler(
+            Test_EventBus.DummyEvent, poolHandler,
+            target=ExecutionTarget.POOL)
+        for i in (-1, 1, 2):
+            self.eventBus.fireEvent(Test_EventBus.DummyEvent(i))
+        self.eventBus.processEvents(now=101.0)
+        self.eventBus.shutdownWorkers()
+
+        self.assertEqual(self.eventHandler.eventCount, 3)
+        self.assertEqual(len(threads), 3)
+        self.assertNotIn(current_thread(), threads)
+        self.assertEqual(self.eventBus.metrics['offloadedCalls'], 3)
+
+    def test_serialTarget(self):
+        """ Handlers sharing a serial worker see events in the order they
+        were fired, all on the same thread """
+        received = list()
+        threads = set()
+
+        def slowHandler(event: Test_EventBus.DummyEvent):
+            sleep(0.001 * (event.test % 3))
+            threads.add(current_thread())
+            received.append(('slow', event.test))
+
+        def fastHandler(event: Test_EventBus.LatestEvent):
+            threads.add(current_thread())
+            received.append(('fast', event.data['test']))
+
+        self.eventBus.installEventHandler(
+            Test_EventBus.DummyEvent, slowHandler,
+            target=ExecutionTarget.SERIAL, worker='lane')
+        self.eventBus.installEventHandler(
+            Test_EventBus.LatestEvent, fastHandler,
+            target=ExecutionTarget.SERIAL, worker='lane')
+        expected = list()
+        for i in range(10):
+            self.eventBus.fireEvent(Test_EventBus.DummyEvent(i))
+            self.eventBus.processEvents(now=101.0 + i)
+            self.eventBus.fireEvent(Test_EventBus.LatestEvent(i))
+            self.eventBus.processEvents(now=101.5 + i)
+            expected += [('slow', i), ('fast', i)]
+        self.eventBus.shutdownWorkers()
+
+        self.assertEqual(received, expected)
+        self.assertEqual(len(threads), 1)
+        self.assertNotIn(current_thread(), threads)
+
+    def test_execShutsDownWorkers(self):
+        """ Stopping the bus waits for work already handed to workers """
+        received = list()
+
+        def serialHandler(event: Test_EventBus.DummyEvent):
+            sleep(0.05)
+            received.append(event.test)
+
+        self.eventBus.installEventHandler(
+            Test_EventBus.DummyEvent, serialHandler,
+            target=ExecutionTarget.SERIAL)
+        self.eventBus.installTimer(
+            0.0, handler=self.eventBus.stop, oneShot=True)
+        self.eventBus.fireEvent(Test_EventBus.DummyEvent(7))
+        self.eventBus.exec()
+        self.assertEqual(received, [7])
+
+
+class Test_AsyncEventBus(unittest.TestCase):
+
+    def setup_method(self, method):
+        self.eventBus = AsyncEventBus(now=1)
+        self.received = list()
+
+    def test_virtualTime(self):
+        """ Coroutine handlers and timers run as tasks when driven by
+        processEvents() with an injected time """
+
+        async def eventHandler(event: Test_EventBus.DummyEvent):
+            await asyncio.sleep(0)
+            self.received.append(('event', event.test, self.eventBus.now))
+
+        async def timerHandler():
+            self.received.append(('timer', None, self.eventBus.now))
+
+        async def driver():
+            self.eventBus.installEventHandler(
+                Test_EventBus.DummyEvent, eventHandler)
+            self.eventBus.installEventHandler(
+                Test_EventBus.DummyEvent,
+                lambda e: self.received.append(('sync', e.test, None)))
+            self.eventBus.installTimer(10.0, handler=timerHandler)
+            self.eventBus.processEvents(100.0)
+            self.eventBus.fireEvent(Test_EventBus.DummyEvent(1))
+            self.eventBus.processEvents(105.0)
+            await self.eventBus.join()
+            self.eventBus.processEvents(110.0)
+            await self.eventBus.join()
+
+        asyncio.run(driver())
+        self.assertEqual(self.received, [
+            ('sync', 1, None), ('event', 1, 105.0), ('timer', None, 110.0)])
+
+    def test_run(self):
+        """ The asyncio loop sleeps until its timer deadline or an event
+        from another thread, and safeInvoke() works across threads """
+        self.eventBus.installEventHandler(
+            Test_EventBus.DummyEvent, lambda e: self.received.append(e.test))
+
+        async def timerHandler():
+            self.received.append('timer')
+            self.eventBus.stop()
+
+        self.eventBus.installTimer(0.5, handler=timerHandler)
+
+        def fromThread():
+            self.eventBus.fireEvent(Test_EventBus.DummyEvent(2))
+            self.received.append(
+                self.eventBus.safeInvoke(lambda a: a * 2, 21))
+
+        Timer(0.1, fromThread).start()
+        start = time()
+        self.eventBus.exec()
+        end = time()
+        self.assertEqual(self.received, [2, 42, 'timer'])
+        self.assertGreater(end - start, 0.3)
+        self.assertGreater(10.0, end - start)
+
+    def test_queueLimit(self):
+        """ The queue limit is passed on to the EventBus, so overflow
+        policies apply as they would there """
+        eventBus = AsyncEventBus(now=1, queueLimit=1)
+        eventBus.setOverflowPolicy(
+            Test_EventBus.DummyEvent, OverflowPolicy.DROP_NEWEST)
+        eventBus.fireEvent(Test_EventBus.DummyEvent(1))
+        eventBus.fireEvent(Test_EventBus.DummyEvent(2))
+        self.assertEqual(eventBus.metrics['queueLimit'], 1)
+        self.assertEqual(
+            eventBus.metrics['eventsDropped'], {'DummyEvent': 1})
+
+
+class Test_EventJournal(unittest.TestCase):
+
+    def setup_method(self, method):
+        self.directory = mkdtemp()
+
+    def teardown_method(self, method):
+        rmtree(self.directory)
+
+    def test_recordAndRead(self):
+        """ Dispatched events come back from the journal with their bus
+        time, across segments, leaving out events that cannot be replayed """
+        eventBus = EventBus(now=1)
+        journal = EventJournal(self.directory, segmentSize=256)
+        eventBus.enableJournal(journal)
+        eventBus.safeInvokeAsync(lambda: None)
+        for i in range(20):
+            eventBus.fireEvent(SensorDataChangedEvent(70 + i, 1013.2, 45))
+            eventBus.processEvents(now=100.0 + i)
+        eventBus.fireEvent(PowerPriceChangedEvent(1.5, 300), immediately=True)
+        journal.flush()
+        self.assertIs(eventBus.disableJournal(), journal)
+        journal.close()
+
+        self.assertEqual(journal.recordCount, 21)
+        self.assertGreater(len(EventJournal.segments(self.directory)), 1)
+        records = list(EventJournal.read(self.directory))
+        self.assertEqual(
+            [(now, event.temperature) for now, event in records[:-1]],
+            [(100.0 + i, 70.0 + i) for i in range(20)])
+        now, event = records[-1]
+        self.assertIsInstance(event, PowerPriceChangedEvent)
+        self.assertEqual(
+            (now, event.price, event.nextUpdate), (119.0, 1.5, 300))
+
+    def test_segmentRotation(self):
+        """ Only the newest segments are kept """
+        journal = EventJournal(
+            self.directory, segmentSize=64, segmentCount=3)
+        for i in range(50):
+            journal.record(float(i), Test_EventBus.DummyEvent(i))
+            journal.flush()
+        journal.close()
+
+        self.assertEqual(len(EventJournal.segments(self.directory)), 3)
+        values = [e.test for _, e in EventJournal.read(self.directory)]
+        self.assertEqual(values, list(range(50))[-len(values):])
+
+    def test_replay(self):
+        """ Replaying moves the bus through the recorded times, firing its
+        timers on the way """
+        journal = EventJournal(self.directory)
+        for now in (100.0, 130.0, 200.0):
+            journal.record(now, Test_EventBus.DummyEvent(int(now)))
+        journal.record(150.0, PowerPriceChangedEvent(1.5, 300))
+        journal.close()
+
+        eventBus = EventBus(now=100.0)
+        received = list()
+        eventBus.installEventHandler(
+            Test_EventBus.DummyEvent,
+            lambda e: received.append(('event', e.test, eventBus.now)))
+        eventBus.installEventHandler(
+            PowerPriceChangedEvent, lambda e: received.append(('price',)))
+        eventBus.installTimer(
+            40.0, lambda: received.append(('timer', eventBus.now)))
+
+        replayDriver = EventReplayDriver(
+            eventBus, self.directory,
+            eventTypes=[Test_EventBus.DummyEvent])
+        self.assertEqual(replayDriver.run(), 3)
+        self.assertEqual(received, [
+            ('event', 100, 100.0), ('event', 130, 130.0),
+            ('timer', 140.0), ('timer', 180.0), ('event', 200, 200.0)])
@@ -0,0 +1,78 @@
+import unittest
+from datetime import datetime, timezone
+
+from frosti.core import HistoryRollup
+
+
+def bucket(time: float):
+    return datetime.fromtimestamp(time, timezone.utc)
+
+
+class Test_HistoryRollup(unittest.TestCase):
+
+    def setup_method(self, method):
+        self.rollup = HistoryRollup()
+
+    def test_sensorReadings(self):
+        """ Readings are summarized into every resolution's bucket, and
+        drain() starts afresh """
+        self.rollup.addSensorReading(3600, 70.0, 40.0)
+        self.rollup.addSensorReading(3630, 72.0, 44.0)
+        self.rollup.addSensorReading(3660, 74.0, 42.0)
+        sensorRows, priceRows, dutyCycleRows = self.rollup.drain()
+        self.assertEqual(priceRows, [])
+        self.assertEqual(dutyCycleRows, [])
+
+        rows = {(row['resolution'], row['time']): row for row in sensorRows}
+        self.assertEqual(set(rows), {
+            (60, bucket(3600)), (60, bucket(3660)),
+            (900, bucket(3600)), (3600, bucket(3600))})
+        self.assertEqual(rows[(60, bucket(3600))], {
+            'resolution': 60, 'time': bucket(3600), 'samples': 2,
+            'temperature_min': 70.0, 'temperature_max': 72.0,
+            'temperature_avg': 71.0, 'humidity_min': 40.0,
+            'humidity_max': 44.0, 'humidity_avg': 42.0})
+        self.assertEqual(rows[(3600, bucket(3600))]['samples'], 3)
+        self.assertEqual(rows[(3600, bucket(3600))]['temperature_avg'], 72.0)
+
+        self.assertEqual(self.rollup.drain(), ([], [], []))
+
+    def test_prices(self):
+        """ Open and close go by time, even for prices out of order """
+        for time, price in ((960, 0.03), (901, 0.02), (1799, 0.05),
+                            (1200, 0.01)):
+            self.rollup.addPrice(time, price)
+        _, priceRows, _ = self.rollup.drain()
+        row = next(row for row in priceRows if row['resolution'] == 900)
+        self.assertEqual(row['time'], bucket(900))
+        self.assertEqual(
+            (row['open'], row['high'], row['low'], row['close']),
+            (0.02, 0.05, 0.01, 0.05))
+        self.assertEqual(row['samples'], 4)
+        self.assertAlmostEqual(row['average'], 0.0275)
+        self.assertEqual(
+            (row['open_time'], row['close_time']), (bucket(901), bucket(1799)))
+
+    def test_dutyCycles(self):
+        """ Time spent in a state is split across the buckets it spans,
+        credited up to advance(), and nothing is kept while off """
+        self.rollup.addState(0, cooling=False, heating=False, fan=False)
+        self.rollup.addState(30, cooling=True, heating=False, fan=False)
+        self.rollup.addState(150, cooling=False, heating=False, fan=True)
+        self.rollup.advance(170)
+        _, _, dutyCycleRows = self.rollup.drain()
+        rows = {(row['resolution'], row['time']):
+                (row['cooling'], row['heating'], row['fan'])
+                for row in dutyCycleRows}
+        self.assertEqual(rows, {
+            (60, bucket(0)): (30, 0, 0),
+            (60, bucket(60)): (60, 0, 0),
+            (60, bucket(120)): (30, 0, 20),
+            (900, bucket(0)): (120, 0, 20),
+            (3600, bucket(0)): (120, 0, 20)})
+
+        self.rollup.addState(200, cooling=False, heating=False, fan=False)
+        self.rollup.advance(4000)
+        _, _, dutyCycleRows = self.rollup.drain()
+        self.assertEqual(
+            sorted(row['fan'] for row in dutyCycleRows), [10, 20, 30, 30])
@@ -0,0 +1,120 @@
+import unittest
+from datetime import datetime
+from random import Random
+
+from pytz import timezone, utc
+
+from frosti.core import WeeklySchedule, PriceOverrideTable
+
+
+class Test_WeeklySchedule(unittest.TestCase):
+
+    def setup_method(self, method):
+        # Sunday 20:00, then weekdays (Monday is day 1) at 08:00 and 17:00
+        transitions = [(20 * 60, 'overnight')]
+        for day in range(1, 6):
+            transitions.append((60 * (8 + 24 * day), 'away'))
+            transitions.append((60 * (17 + 24 * day), 'home'))
+        self.schedule = WeeklySchedule(transitions)
+        self.chicago = timezone('America/Chicago')
+
+    def test_lookup(self):
+        """ The value in effect is the last at or before the minute, and
+        the week carries in the last transition of the week before """
+        self.assertEqual(len(self.schedule), 11)
+        self.assertEqual(self.schedule.at(0), 'home')
+        self.assertEqual(self.schedule.at(20 * 60), 'overnight')
+        self.assertEqual(self.schedule.at(60 * (8 + 24) - 0.5), 'overnight')
+        self.assertEqual(self.schedule.at(60 * (8 + 24)), 'away')
+        self.assertEqual(self.schedule.at(60 * (12 + 24 * 6)), 'home')
+        self.assertIsNone(WeeklySchedule().at(0))
+
+    def test_nextTransition(self):
+        """ The next transition wraps into the following week """
+        self.assertEqual(self.schedule.nextTransition(0), 20 * 60)
+        self.assertEqual(self.schedule.nextTransition(20 * 60), 60 * 32)
+        self.assertEqual(
+            self.schedule.nextTransition(60 * (18 + 24 * 5)),
+            20 * 60 + WeeklySchedule.MINUTES_PER_WEEK)
+        self.assertIsNone(WeeklySchedule().nextTransition(0))
+
+    def test_minuteOfWeek(self):
+        """ Weeks start at midnight on Sunday """
+        monday = datetime(2019, 1, 7, 8, 30, 30)
+        self.assertEqual(
+            WeeklySchedule.minuteOfWeek(monday), 0.5 + 30 + 60 * (8 + 24))
+        self.assertEqual(
+            WeeklySchedule.startOfWeek(monday), datetime(2019, 1, 6))
+
+    def test_secondsUntilNext(self):
+        """ Seconds until the next transition on a normal day, and across
+        both DST changes """
+        def seconds(*utcTime):
+            now = datetime(*utcTime, tzinfo=utc).timestamp()
+            return self.schedule.secondsUntilNext(now, self.chicago)
+
+        # Monday 07:59:30 CST
+        self.assertEqual(seconds(2019, 1, 7, 13, 59, 30), 30)
+        # Sunday 10 March 2019 01:00 CST, the clocks going forward at 02:00
+        # so 20:00 CDT is an hour sooner than by standard time
+        self.assertEqual(seconds(2019, 3, 10, 7, 0), 18 * 3600)
+        # Sunday 3 November 2019 00:00 CDT, the clocks going back at 02:00
+        self.assertEqual(seconds(2019, 11, 3, 5, 0), 21 * 3600)
+        self.assertIsNone(WeeklySchedule().secondsUntilNext(0.0, utc))
+
+    def test_ambiguousTime(self):
+        """ A transition in the hour that happens twice is caught the first
+        time round """
+        schedule = WeeklySchedule([(90, 'early'), (600, 'late')])
+        # Sunday 3 November 2019 01:00 CDT, before the first 01:30
+        now = datetime(2019, 11, 3, 6, 0, tzinfo=utc).timestamp()
+        self.assertEqual(schedule.secondsUntilNext(now, self.chicago), 1800)
+
+
+class Test_PriceOverrideTable(unittest.TestCase):
+
+    @staticmethod
+    def scan(overrides, price):
+        """ The lookup the table replaces, the first override from the
+        highest price down whose threshold the price reaches """
+        for override in sorted(overrides, key=lambda a: a[0], reverse=True):
+            if price >= override[0]:
+                return override
+        return None
+
+    def test_lookup(self):
+        """ Thresholds are inclusive and the highest one reached wins """
+        table = PriceOverrideTable([
+            (1.00, None, 88.0), (0.25, None, 76.0), (0.50, 60.0, 78.0)])
+        self.assertEqual(len(table), 3)
+        self.assertIsNone(table.lookup(0.10))
+        self.assertEqual(table.lookup(0.25), (0.25, None, 76.0))
+        self.assertEqual(table.lookup(0.75), (0.50, 60.0, 78.0))
+        self.assertEqual(table.lookup(9.00), (1.00, None, 88.0))
+        self.assertIsNone(PriceOverrideTable().lookup(1.0))
+
+    def test_matchesScan(self):
+        """ Lookups agree with scanning every override for any prices """
+        random = Random(20)
+        for _ in range(200):
+            overrides = [
+                (round(random.uniform(0.0, 2.0), 2), None,
+                 random.choice([None, 80.0, 88.0]))
+                for _ in range(random.randint(0, 6))]
+            overrides = list({a[0]: a for a in overrides}.values())
+            table = PriceOverrideTable(overrides)
+            for _ in range(20):
+                price = round(random.uniform(-0.5, 2.5), 2)
+                self.assertEqual(
+                    table.lookup(price),
+                    Test_PriceOverrideTable.scan(overrides, price))
+
+    def test_equality(self):
+        """ Tables compiled from the same overrides compare equal, so
+        recompiling an unchanged program does not reapply it """
+        overrides = [(0.5, None, 80.0), (1.0, None, 88.0)]
+        self.assertEqual(
+            PriceOverrideTable(overrides),
+            PriceOverrideTable(reversed(overrides)))
+        self.assertNotEqual(
+            PriceOverrideTable(overrides), PriceOverrideTable(overrides[:1]))
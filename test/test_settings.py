@@ -1,11 +1,18 @@
+import gzip
 import unittest
 import yaml
+from datetime import datetime, timezone
+from sqlalchemy import text
+from os import path
+from tempfile import TemporaryDirectory
 from time import mktime, strptime
 
 from frosti.core import EventBus, ServiceProvider
-from frosti.core.events import PowerPriceChangedEvent
+from frosti.core.events import PowerPriceChangedEvent, ConfigChangedEvent
+from frosti.core.orm import OrmGriddyUpdate, OrmThermostatState, \
+    OrmThermostatTargets, OrmConfig
 from frosti.services import OrmManagementService, ThermostatService, \
-    ApiDataBrokerService
+    ApiDataBrokerService, OrmStateCaptureService
 
 yamlText = """
 config:
@@ -125,6 +132,27 @@ class Test_Settings(unittest.TestCase):
         self.assertEqual(self.thermostat.comfortMin, 64.0)
         self.assertEqual(self.thermostat.comfortMax, 78.0)
 
+    def test_targets_captured_on_loop(self):
+        """ Targets are read when their event is handled on the main loop,
+        so a row keeps them even if they change before it is written """
+        time = self.timeChanged(0, 4, 0) + 1
+        recorded = datetime.fromtimestamp(time, timezone.utc)
+        session = self.ormManagementService.session
+        session.query(OrmThermostatTargets) \
+            .filter(OrmThermostatTargets.time == recorded).delete()
+        session.commit()
+
+        stateCapture = OrmStateCaptureService()
+        stateCapture.setServiceProvider(self.serviceProvider)
+        self.thermostat.comfortMax = 90.0
+        self.eventBus.processEvents(time)
+        self.thermostat.comfortMax = 91.0
+        stateCapture.close()
+
+        row = session.query(OrmThermostatTargets) \
+            .filter(OrmThermostatTargets.time == recorded).one()
+        self.assertEqual(row.comfort_max, 90.0)
+
     def test_price1(self):
         time = self.timeChanged(0, 4, 0)
         self.eventBus.fireEvent(PowerPriceChangedEvent(0.75, 300))
@@ -166,3 +194,79 @@ class Test_Settings(unittest.TestCase):
         self.assertEqual(self.thermostat.currentProgramName, 'away')
         self.assertEqual(self.thermostat.comfortMin, 64.0)
         self.assertEqual(self.thermostat.comfortMax, 78.0)
+
+    def test_history_retention(self):
+        """ Months past a table's retention are archived, then dropped """
+        now = datetime(2019, 6, 15, tzinfo=timezone.utc)
+        expired = datetime(2019, 3, 10, tzinfo=timezone.utc)
+        session = self.ormManagementService.session
+        self.ormManagementService.ensurePartitions(
+            expired.timestamp(), now.timestamp())
+        session.query(OrmGriddyUpdate) \
+            .filter(OrmGriddyUpdate.time == expired).delete()
+        session.add(OrmGriddyUpdate(time=expired, price=0.125))
+        session.commit()
+
+        with TemporaryDirectory() as directory:
+            configData = yaml.load(yamlText, Loader=yaml.FullLoader)
+            configData['config']['history.archiveDirectory'] = directory
+            configData['config']['history.retention.griddy_update'] = 2
+            self.apiDataBroker.setConfig(configData['config'])
+
+            archives = self.ormManagementService.maintainHistory(
+                now.timestamp())
+            archive = path.join(directory, 'griddy_update_y2019m03.csv.gz')
+            self.assertIn(archive, archives)
+            self.assertNotIn(
+                path.join(directory, 'griddy_update_y2019m04.csv.gz'),
+                archives)
+            with gzip.open(archive, 'rt') as archiveFile:
+                self.assertIn('0.125', archiveFile.read())
+
+        self.assertEqual(session.query(OrmGriddyUpdate)
+                         .filter(OrmGriddyUpdate.time == expired).count(), 0)
+
+    def test_thermostat_state_view(self):
+        """ The view decodes the packed state into the old flag columns """
+        time = datetime(2019, 1, 1, 14, 1, tzinfo=timezone.utc)
+        session = self.ormManagementService.session
+        session.query(OrmThermostatState) \
+            .filter(OrmThermostatState.time == time).delete()
+        session.add(OrmThermostatState(
+            time=time,
+            state=OrmThermostatState.COOLING | OrmThermostatState.FAN))
+        session.commit()
+
+        row = session.execute(text(
+            "SELECT fan, cooling, heating FROM thermostat_state "
+            "WHERE time = :time"), {'time': time}).one()
+        self.assertEqual(tuple(row), (1, 1, 0))
+
+    def test_config_unchanged_across_restart(self):
+        """ The same config applied at every start writes nothing, and the
+        database version it lacks is kept """
+        configData = yaml.load(yamlText, Loader=yaml.FullLoader)
+        self.apiDataBroker.setConfig(configData['config'])
+
+        serviceProvider = ServiceProvider()
+        eventBus = EventBus()
+        serviceProvider.installService(EventBus, eventBus)
+        ormManagementService = OrmManagementService(isTestInstance=True)
+        ormManagementService.setServiceProvider(serviceProvider)
+        serviceProvider.installService(
+            OrmManagementService, ormManagementService)
+        apiDataBroker = ApiDataBrokerService()
+        apiDataBroker.setServiceProvider(serviceProvider)
+
+        changes = list()
+        eventBus.installEventHandler(ConfigChangedEvent, changes.append)
+        session = ormManagementService.session
+        before = {
+            entry.name: entry.value for entry in session.query(OrmConfig)}
+        apiDataBroker.setConfig(configData['config'])
+        eventBus.processEvents()
+
+        self.assertEqual(changes, [])
+        self.assertEqual(before, {
+            entry.name: entry.value for entry in session.query(OrmConfig)})
+        self.assertIn('db.version', before)
@@ -0,0 +1,77 @@
+import unittest
+import yaml
+from time import mktime, strptime
+
+from frosti.core import ThermostatMode
+from frosti.services import OrmStateCaptureService
+from frosti.simulation import SimulationDriver
+
+
+yamlText = """
+config:
+    thermostat.delta: 1.0
+    thermostat.fanRunoutDuration: 30
+    thermostat.timezone: "America/Chicago"
+    environment.temperature.translate: 0.0
+    environment.temperature.scale: 1.0
+    environment.humidity.translate: 0.0
+    environment.humidity.scale: 1.0
+    environment.pressure.translate: 0.0
+    environment.pressure.scale: 1.0
+    capture.batchSize: 50
+    capture.maxLossWindow: 120
+
+programs:
+    home: { comfortMin: 70, comfortMax: 76 }
+    away: { comfortMin: 68, comfortMax: 82 }
+schedules:
+    every day:
+        days: [0, 1, 2, 3, 4, 5, 6]
+        times:
+            - { hour: 8, minute: 0, program: away }
+            - { hour: 17, minute: 0, program: home }
+"""
+
+
+class Test_Simulation(unittest.TestCase):
+
+    def test_twoDays(self):
+        """ Two simulated days run on the virtual clock, with the house
+        cooled through the hot part of each day """
+        start = mktime(strptime('07/05/21 00:00:00', '%m/%d/%y %H:%M:%S'))
+        driver = SimulationDriver(
+            yaml.load(yamlText, Loader=yaml.FullLoader), start,
+            mode=ThermostatMode.COOL)
+        report = driver.run(2)
+
+        self.assertEqual(report['days'], 2)
+        for dayReport in report['dayReports']:
+            self.assertGreater(dayReport['stateChanges'], 0)
+            self.assertGreater(dayReport['relaySeconds']['COOLING'], 0)
+            self.assertEqual(dayReport['relaySeconds']['HEATING'], 0)
+            # Sensors about every 5s, prices every 5 minutes and the
+            # schedule every minute
+            self.assertGreater(dayReport['timersFired'], 17000 + 288 + 1440)
+        self.assertGreater(report['cpuSecondsPerDay'], 0)
+
+    def test_captureBatches(self):
+        """ Captured history is written in batches no bigger than the batch
+        size and no older than the loss window, with nothing left over
+        once the run is done """
+        start = mktime(strptime('07/06/21 00:00:00', '%m/%d/%y %H:%M:%S'))
+        driver = SimulationDriver(
+            yaml.load(yamlText, Loader=yaml.FullLoader), start,
+            mode=ThermostatMode.COOL, capture=True)
+        driver.run(1)
+
+        metrics = driver.getService(OrmStateCaptureService).metrics
+        self.assertEqual(metrics['buffered'], 0)
+        self.assertEqual(metrics['rowsFailed'], 0)
+        # A sensor reading every 5s fills a batch of 50 in about 250s, so
+        # the 120s window is what sends most of them
+        self.assertGreater(metrics['rowsWritten'], 17000)
+        self.assertLessEqual(metrics['batchRows']['max'], 50)
+        self.assertLess(metrics['batchRows']['mean'], 30)
+        self.assertGreaterEqual(
+            metrics['batches'], metrics['rowsWritten'] / 50)
+        self.assertEqual(metrics['flushLatency']['count'], metrics['batches'])
@@ -0,0 +1,75 @@
+import unittest
+from os import path
+from tempfile import TemporaryDirectory
+
+from frosti.core import TelemetrySpool
+
+
+class Test_TelemetrySpool(unittest.TestCase):
+
+    def setup_method(self, method):
+        self.directory = TemporaryDirectory()
+        self.tables = list()
+
+    def teardown_method(self, method):
+        self.directory.cleanup()
+
+    def write(self, tables):
+        self.tables.append(tables)
+
+    def test_replay(self):
+        """ Rows come back grouped by table, oldest segment first, and the
+        spool is empty once they have been written """
+        spool = TelemetrySpool(self.directory.name, segmentSize=1)
+        spool.append('sensor_reading', [{'time': 1, 'temperature': 70.0}])
+        spool.append('griddy_update', [{'time': 1, 'price': 0.02}])
+        spool.append('sensor_reading', [{'time': 2, 'temperature': None}])
+        self.assertEqual(len(spool), 3)
+
+        self.assertEqual(spool.replay(self.write), 3)
+        self.assertEqual(self.tables, [
+            {'sensor_reading': [{'time': 1, 'temperature': 70.0}]},
+            {'griddy_update': [{'time': 1, 'price': 0.02}]},
+            {'sensor_reading': [{'time': 2, 'temperature': None}]}])
+        self.assertEqual(len(spool), 0)
+        self.assertEqual(spool.byteCount, 0)
+
+    def test_failedReplay(self):
+        """ A segment stays spooled until it has been written, and rows
+        left by an earlier run are picked up, ignoring a record cut short """
+        spool = TelemetrySpool(self.directory.name)
+        spool.append('sensor_reading', [{'time': 1}, {'time': 2}])
+
+        def fail(tables):
+            raise ConnectionError('database unreachable')
+
+        with self.assertRaises(ConnectionError):
+            spool.replay(fail)
+        with open(spool.segments()[0], 'ab') as segmentFile:
+            segmentFile.write(b'\x10\x00')
+
+        spool = TelemetrySpool(self.directory.name)
+        spool.append('sensor_reading', [{'time': 3}])
+        self.assertEqual(len(spool), 2)
+        self.assertEqual(spool.replay(self.write), 3)
+        self.assertEqual(self.tables, [
+            {'sensor_reading': [{'time': 1}, {'time': 2}]},
+            {'sensor_reading': [{'time': 3}]}])
+
+    def test_limits(self):
+        """ The oldest segments are dropped to stay under maxBytes, and a
+        rejected segment is set aside rather than replayed """
+        spool = TelemetrySpool(
+            self.directory.name, segmentSize=1, maxBytes=300)
+        for time in range(10):
+            spool.append('griddy_update', [{'time': time, 'price': 0.02}])
+        self.assertGreater(spool.droppedSegments, 0)
+        self.assertLessEqual(len(spool), 10 - spool.droppedSegments)
+
+        rejected = spool.segments()[0]
+        spool.reject(rejected)
+        self.assertTrue(path.exists(rejected + TelemetrySpool.REJECTED_SUFFIX))
+        spool.replay(self.write)
+        self.assertEqual(
+            [tables['griddy_update'][0]['time'] for tables in self.tables],
+            list(range(10 - len(self.tables), 10)))
@@ -0,0 +1,171 @@
+import unittest
+from threading import current_thread
+from time import sleep
+
+from frosti.core import ServiceStartup, ExecutionTarget, ImportProfiler
+
+
+class Test_ServiceStartup(unittest.TestCase):
+
+    def setup_method(self, method):
+        self.startup = ServiceStartup()
+        self.calls = list()
+
+    def phase(self, name, duration=0.0):
+        def method():
+            sleep(duration)
+            self.calls.append((name, current_thread().name))
+        return method
+
+    def test_dependencyOrder(self):
+        """ Phases only start once their dependencies have finished """
+        self.startup.addPhase('c', self.phase('c'), dependencies=['a', 'b'])
+        self.startup.addPhase('a', self.phase('a', 0.05))
+        self.startup.addPhase('b', self.phase('b'), dependencies=['a'])
+        self.startup.run()
+
+        self.assertEqual([name for name, _ in self.calls], ['a', 'b', 'c'])
+
+    def test_concurrentPhases(self):
+        """ Independent pool phases overlap, so the boot takes about as
+        long as the slowest of them """
+        for name in ('a', 'b', 'c'):
+            self.startup.addPhase(name, self.phase(name, 0.2))
+        report = self.startup.run()
+
+        self.assertLess(report['total'], 0.5)
+        for phase in report['phases'].values():
+            self.assertGreaterEqual(phase['duration'], 0.2)
+            self.assertLess(phase['start'], 0.1)
+
+    def test_mainPhases(self):
+        """ MAIN phases run on the thread calling run(), in the order they
+        were added when several are ready """
+        self.startup.addPhase('build', self.phase('build', 0.05))
+        self.startup.addPhase(
+            'second', self.phase('second'), dependencies=['build'],
+            target=ExecutionTarget.MAIN)
+        self.startup.addPhase(
+            'first', self.phase('first'), target=ExecutionTarget.MAIN)
+        self.startup.run()
+
+        threads = dict(self.calls)
+        self.assertEqual(threads['first'], current_thread().name)
+        self.assertEqual(threads['second'], current_thread().name)
+        self.assertNotEqual(threads['build'], current_thread().name)
+
+    def test_report(self):
+        """ The report times each phase and follows the critical path back
+        from the last phase to finish """
+        self.startup.addPhase('slow', self.phase('slow', 0.1))
+        self.startup.addPhase('fast', self.phase('fast'))
+        self.startup.addPhase(
+            'wire', self.phase('wire'), dependencies=['slow', 'fast'],
+            target=ExecutionTarget.MAIN)
+        report = self.startup.run()
+
+        self.assertEqual(report, self.startup.report)
+        self.assertEqual(report['ready'], report['total'])
+        self.assertEqual(report['criticalPath'], ['slow', 'wire'])
+        self.assertEqual(report['phases']['wire']['target'], 'MAIN')
+        self.assertEqual(
+            report['phases']['wire']['dependencies'], ['slow', 'fast'])
+        self.assertGreaterEqual(
+            report['phases']['wire']['start'],
+            report['phases']['slow']['start'] +
+            report['phases']['slow']['duration'])
+        self.startup.logReport()
+
+    def test_background(self):
+        """ run() returns once the phases asked for are up, the rest
+        finishing in the background with MAIN phases handed to invoke """
+        invoked = list()
+
+        def invoke(method, *args):
+            invoked.append(current_thread().name)
+            return method(*args)
+
+        startup = ServiceStartup(invoke=invoke)
+        startup.addPhase('control', self.phase('control'))
+        startup.addPhase(
+            'wire', self.phase('wire'), dependencies=['control'],
+            target=ExecutionTarget.MAIN)
+        startup.addPhase('display', self.phase('display', 0.2))
+        startup.addPhase(
+            'userInterface', self.phase('userInterface'),
+            dependencies=['display', 'wire'], target=ExecutionTarget.MAIN)
+
+        report = startup.run(until=['wire'])
+        self.assertIsNone(report['total'])
+        self.assertLess(report['ready'], 0.15)
+        self.assertEqual(
+            [name for name, _ in self.calls], ['control', 'wire'])
+        self.assertEqual(invoked, [])
+
+        for _ in range(50):
+            if startup.report['total'] is not None:
+                break
+            sleep(0.02)
+        self.assertGreaterEqual(startup.report['total'], 0.2)
+        self.assertEqual(
+            [name for name, _ in self.calls][2:],
+            ['display', 'userInterface'])
+        self.assertEqual(invoked, ['ServiceStartup'])
+
+    def test_failure(self):
+        """ A failing phase stops anything depending on it from starting
+        and is raised from run() """
+        def fail():
+            raise ValueError('no hardware')
+
+        self.startup.addPhase('hardware', fail)
+        self.startup.addPhase(
+            'relays', self.phase('relays'), dependencies=['hardware'])
+
+        with self.assertRaises(RuntimeError) as context:
+            self.startup.run()
+        self.assertIsInstance(context.exception.__cause__, ValueError)
+        self.assertEqual(self.calls, [])
+        self.assertIsNone(
+            self.startup.report['phases']['relays']['duration'])
+
+    def test_badDependencies(self):
+        """ Unknown dependencies and cycles are refused before anything
+        runs """
+        self.startup.addPhase('a', self.phase('a'), dependencies=['missing'])
+        with self.assertRaises(RuntimeError):
+            self.startup.run()
+
+        startup = ServiceStartup()
+        startup.addPhase('a', self.phase('a'), dependencies=['b'])
+        startup.addPhase('b', self.phase('b'), dependencies=['a'])
+        with self.assertRaises(RuntimeError):
+            startup.run()
+        with self.assertRaises(RuntimeError):
+            startup.addPhase('a', self.phase('a'))
+        self.assertEqual(self.calls, [])
+
+
+class Test_ImportProfiler(unittest.TestCase):
+
+    def test_parse(self):
+        """ Reads python -X importtime output, nesting given by indent """
+        output = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       150 |        150 |     json.decoder\n"
+            "import time:       300 |        450 |   json\n"
+            "unrelated line\n")
+        self.assertEqual(ImportProfiler.parse(output), [
+            ('json.decoder', 150e-6, 150e-6, 2),
+            ('json', 300e-6, 450e-6, 1)])
+
+    def test_profile(self):
+        """ Each module is profiled in a fresh interpreter, so one already
+        imported here still shows its full cost """
+        report = ImportProfiler(['unittest', 'missing.module']).profile()
+
+        self.assertIsNone(report['unittest']['error'])
+        self.assertGreater(report['unittest']['total'], 0.0)
+        self.assertIn('unittest', report['unittest']['packages'])
+        self.assertIn('ModuleNotFoundError', report['missing.module']['error'])
+        self.assertTrue(ImportProfiler.formatReport(report))
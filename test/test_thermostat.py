@@ -1,13 +1,17 @@
 import unittest
 import yaml
+from datetime import datetime, timezone
 from time import mktime, strptime
+from uuid import uuid4
 
 from frosti.core import EventBus, ServiceConsumer, ServiceProvider, \
     ThermostatState, ThermostatMode
 from frosti.services import ThermostatService, RelayManagementService, \
     OrmManagementService, ApiDataBrokerService
 from frosti.core.events import ThermostatStateChangedEvent, \
-    SensorDataChangedEvent
+    SensorDataChangedEvent, SettingsChangedEvent, ScheduleChangedEvent
+from frosti.core.orm import OrmProgram, OrmSchedule, OrmScheduleDay, \
+    OrmScheduleTime
 
 
 yamlText = """
@@ -408,3 +412,112 @@ class Test_Thermostat(unittest.TestCase):
         self.assertNextTemperature(50, 5, ThermostatState.FAN)
         self.assertNextTemperature(50, 10, ThermostatState.FAN)
         self.assertNextTemperature(50, 100, ThermostatState.OFF)
+
+    def test_configChanged(self):
+        """ Config changed through the API applies without a restart """
+        self.thermostat.mode = ThermostatMode.COOL
+
+        self.apiDataBroker.setConfig({'thermostat.delta': '3.0'}, patch=True)
+        self.eventBus.processEvents()
+        self.assertEqual(
+            self.ormManagementService.getConfigFloat('thermostat.delta'), 3.0)
+        self.assertNextTemperature(76.5, 5, ThermostatState.OFF)
+
+        self.apiDataBroker.setConfig({'thermostat.delta': '1.0'}, patch=True)
+        self.eventBus.processEvents()
+        self.assertNextTemperature(76.5, 5, ThermostatState.COOLING)
+
+
+class Test_ThermostatSchedule(unittest.TestCase):
+    """ Drives the schedule through its timer alone, with config and the
+    schedule served from memory rather than the database """
+
+    class MemoryOrmManagementService(OrmManagementService):
+
+        def __init__(self, config: dict, scheduleDays: list):
+            self.__config = config
+            self.__scheduleDays = scheduleDays
+
+        @property
+        def session(self):
+            return self
+
+        def query(self, entityClass):
+            return self
+
+        def options(self, *options):
+            return list(self.__scheduleDays)
+
+        def getConfigString(self, name: str, default: str = None):
+            return self.__config.get(name, default)
+
+        def getConfigInt(self, name: str, default: str = None):
+            return int(self.getConfigString(name, default))
+
+        def getConfigFloat(self, name: str, default: str = None):
+            return float(self.getConfigString(name, default))
+
+    def setup_method(self, method):
+        self.programs = programs = {
+            name: OrmProgram(
+                guid=uuid4(), name=name, comfort_min=comfortMin,
+                comfort_max=comfortMax)
+            for name, comfortMin, comfortMax in (
+                ('away', 64.0, 82.0), ('home', 70.0, 76.0),
+                ('overnight', 68.0, 72.0))}
+        # Day 1 of the week starting on Sunday, so Monday
+        schedule = OrmSchedule(guid=uuid4(), name='monday', times=[
+            OrmScheduleTime(hour=hour, minute=0, program=programs[name])
+            for hour, name in ((8, 'away'), (17, 'home'), (20, 'overnight'))])
+        scheduleDays = [OrmScheduleDay(day=1, schedule=schedule)]
+
+        # Monday 07:00 UTC
+        start = datetime(2019, 1, 7, 7, 0, tzinfo=timezone.utc).timestamp()
+        self.serviceProvider = ServiceProvider()
+        self.eventBus = EventBus(now=start)
+        self.serviceProvider.installService(EventBus, self.eventBus)
+        self.serviceProvider.installService(
+            OrmManagementService,
+            Test_ThermostatSchedule.MemoryOrmManagementService({
+                'thermostat.delta': '1.0',
+                'thermostat.fanRunoutDuration': '30',
+                'thermostat.timezone': 'UTC',
+            }, scheduleDays))
+        self.thermostat = ThermostatService()
+        self.thermostat.setServiceProvider(self.serviceProvider)
+
+    def test_transitions(self):
+        """ Each transition of the day takes effect on its minute """
+        changes = [(self.eventBus.now, self.thermostat.currentProgramName)]
+        for minute in range(15 * 60):
+            self.eventBus.processEvents(now=self.eventBus.now + 60)
+            name = self.thermostat.currentProgramName
+            if name != changes[-1][1]:
+                changes.append((self.eventBus.now, name))
+
+        self.assertEqual(
+            [(datetime.fromtimestamp(time, timezone.utc).hour, name)
+             for time, name in changes],
+            [(7, 'overnight'), (8, 'away'), (17, 'home'),
+             (20, 'overnight')])
+        self.assertEqual(self.thermostat.comfortMin, 68.0)
+        self.assertEqual(self.thermostat.comfortMax, 72.0)
+
+    def test_scheduleRecompiled(self):
+        """ Rebuilding the schedule, even with the current program edited,
+        is not a switch to another program, so the targets a user set are
+        kept and nothing fires """
+        self.eventBus.processEvents(now=self.eventBus.now + 60)
+        self.thermostat.comfortMax = 99.0
+        self.eventBus.processEvents(now=self.eventBus.now + 60)
+
+        settingsChanged = list()
+        self.eventBus.installEventHandler(
+            SettingsChangedEvent, settingsChanged.append)
+        self.programs['overnight'].comfort_max = 73.0
+        self.eventBus.fireEvent(ScheduleChangedEvent())
+        self.eventBus.processEvents(now=self.eventBus.now + 60)
+
+        self.assertEqual(settingsChanged, [])
+        self.assertEqual(self.thermostat.currentProgramName, 'overnight')
+        self.assertEqual(self.thermostat.comfortMax, 99.0)